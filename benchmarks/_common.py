@@ -0,0 +1,113 @@
+"""
+Shared setup for the benchmark scripts.
+
+Benchmarks run against the configured database. Seeded rows are written
+inside a transaction that is rolled back, so nothing is left behind.
+"""
+import os
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.error import URLError
+from urllib.request import urlopen
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'home.settings')
+    import django
+    django.setup()
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+    import cloudinary
+    import helpers
+    helpers.cloudinary_init()
+    if not cloudinary.config().cloud_name:
+        cloudinary.config(cloud_name="bench-cloud", api_key="bench", api_secret="bench")
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def seeded_catalog(courses=50, lessons_per_course=10):
+    """Yields the seeded published courses, rolled back afterwards."""
+    from django.db import transaction
+    from courses.catalog import bump_catalog_version
+    from courses.models import Course, Lesson, PublishStatus
+
+    try:
+        with transaction.atomic():
+            course_objs = Course.objects.bulk_create([
+                Course(
+                    title=f"Benchmark Course {i}",
+                    public_id=f"benchmark-course-{i}",
+                    description="A benchmark course. " * 20,
+                    image=f"image/upload/v1/courses/benchmark-course-{i}.jpg",
+                    status=PublishStatus.PUBLISHED,
+                    access="any",
+                )
+                for i in range(courses)
+            ])
+            Lesson.objects.bulk_create([
+                Lesson(
+                    course=course,
+                    title=f"Lesson {j}",
+                    public_id=f"{course.public_id}-lesson-{j}",
+                    description="A benchmark lesson. " * 10,
+                    video=f"video/private/v1/courses/{course.public_id}/lessons/{j}.mp4",
+                    status=PublishStatus.PUBLISHED,
+                    order=j,
+                )
+                for course in course_objs
+                for j in range(lessons_per_course)
+            ])
+            bump_catalog_version()
+            yield course_objs
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def wait_until_healthy(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urlopen(f"{base_url}/healthz", timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (URLError, OSError):
+            time.sleep(0.2)
+    return False
+
+
+def timeit(func, repeat=20):
+    """Returns per-call (wall seconds, cpu seconds) lists."""
+    wall, cpu = [], []
+    for _ in range(repeat):
+        w0, c0 = time.perf_counter(), time.process_time()
+        func()
+        wall.append(time.perf_counter() - w0)
+        cpu.append(time.process_time() - c0)
+    return wall, cpu
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(int(round(pct / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def summarize(values):
+    return {
+        "mean_ms": statistics.mean(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
@@ -0,0 +1,74 @@
+"""
+Per-card memory of the course list: the model instance calls card.html
+used to make on every render against the precomputed slotted cards.
+
+    python benchmarks/card_memory.py --courses 10000
+
+Reports, per card, the transient memory of one render (tracemalloc peak
+minus the rendered output, first render and warm) and what the cards keep
+alive between requests. 10k cards take a few minutes under tracemalloc.
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+
+from _common import seeded_catalog, setup_django
+
+# what the card template evaluated per model instance before courses.cards
+MODEL_CARD = (
+    "{% for object in objects %}{% with image=object.get_responsive_thumbnail %}"
+    "{{ image.src }}{{ image.srcset }}{% endwith %}{{ object.get_absolute_url }}"
+    "{{ object.is_coming_soon }}{{ object.placeholder }}{{ object.title }}"
+    "{{ object.description|truncatewords:20 }}{{ object.lesson_count }}{% endfor %}"
+)
+SLOTTED_CARD = (
+    "{% for object in objects %}{% with image=object.image %}"
+    "{{ image.src }}{{ image.srcset }}{% endwith %}{{ object.path }}"
+    "{{ object.is_coming_soon }}{{ object.placeholder }}{{ object.title }}"
+    "{{ object.excerpt }}{{ object.lesson_count }}{% endfor %}"
+)
+
+
+def measure(func):
+    """(bytes allocated at peak, bytes still held afterwards)"""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, current, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=10_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.template import Context, Template
+    from courses import cards, services
+    from courses.catalog import get_catalog
+
+    model_template = Template(MODEL_CARD)
+    card_template = Template(SLOTTED_CARD)
+
+    with seeded_catalog(args.courses, lessons_per_course=0):
+        courses = [services.course_from_row(row) for row in get_catalog().courses]
+        n = len(courses)
+        print(f"{n:,} cards")
+
+        for label in ("first render", "warm render"):
+            peak, _, html = measure(lambda: model_template.render(Context({"objects": courses})))
+            print(f"model instances  {label:<12}  {(peak - sys.getsizeof(html)) / n:>8,.0f} B/card transient")
+
+        peak, held, built = measure(lambda: services.get_course_cards())
+        print(f"slotted cards    build         {peak / n:>8,.0f} B/card peak  {held / n:>6,.0f} B/card held")
+        peak, _, html = measure(lambda: card_template.render(Context({"objects": built})))
+        print(f"slotted cards    warm render   {(peak - sys.getsizeof(html)) / n:>8,.0f} B/card transient")
+        print(f"sizeof Card {cards.Card.__basicsize__} B, model instance __dict__ "
+              f"{courses[0].__dict__.__sizeof__()} B + fields")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Throughput of the JSON catalog API against the HTML views it replaces for
+scrapers, plus the serializer on its own (orjson when installed, else json).
+
+    python benchmarks/catalog_api.py --courses 200 --repeat 200
+"""
+import argparse
+import json
+
+from _common import seeded_catalog, setup_django, summarize, timeit
+
+
+def report(name, wall, size):
+    stats = summarize(wall)
+    rps = 1000 / stats["mean_ms"] if stats["mean_ms"] else float("inf")
+    print(
+        f"{name:<34} {rps:>8.0f} req/s  p50 {stats['p50_ms']:.3f} ms"
+        f"  p99 {stats['p99_ms']:.3f} ms  {size:>9,} bytes"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--lessons", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from courses import api
+
+    client = Client()
+    print(f"serializer: {'orjson' if api.orjson is not None else 'json'}")
+    with seeded_catalog(args.courses, args.lessons) as courses:
+        course_id = courses[0].public_id
+        paths = [
+            ("html /courses/", "/courses/", {}),
+            ("api  /api/courses/?limit=100", "/api/courses/?limit=100", {}),
+            ("api  ...?fields=id,title", "/api/courses/?limit=100&fields=id,title", {}),
+            ("html /courses/<id>/", f"/courses/{course_id}/", {}),
+            ("api  /api/courses/<id>/lessons/", f"/api/courses/{course_id}/lessons/", {}),
+        ]
+        for name, path, headers in paths:
+            response = client.get(path, **headers)
+            wall, _ = timeit(lambda: client.get(path, **headers), repeat=args.repeat)
+            report(name, wall, len(response.content))
+            if path.startswith("/api/"):
+                etag = response["ETag"]
+                wall, _ = timeit(lambda: client.get(path, HTTP_IF_NONE_MATCH=etag), repeat=args.repeat)
+                report(f"{name} (304)", wall, 0)
+
+        payload = api.get_course_page(fields=tuple(api.COURSE_FIELDS), limit=api.API_MAX_LIMIT)
+        for name, dump in (
+            ("api.dumps", lambda: api.dumps(payload)),
+            ("json.dumps", lambda: json.dumps(payload).encode()),
+        ):
+            wall, _ = timeit(dump, repeat=args.repeat)
+            report(f"serialize {name}", wall, len(dump()))
+
+
+if __name__ == "__main__":
+    main()
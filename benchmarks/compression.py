@@ -0,0 +1,48 @@
+"""
+Bytes and CPU per request for course_list_view and course_detail_view,
+uncompressed and with each available encoding.
+
+    python benchmarks/compression.py --courses 50 --repeat 20
+"""
+import argparse
+
+from _common import seeded_catalog, setup_django, summarize, timeit
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--lessons", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from home.middleware import get_encoders
+
+    encoders = get_encoders()
+    client = Client()
+    with seeded_catalog(args.courses, args.lessons) as courses:
+        paths = {
+            "course_list_view": "/courses/",
+            "course_detail_view": f"/courses/{courses[0].public_id}/",
+        }
+        for name, path in paths.items():
+            body = client.get(path).content
+            _, render_cpu = timeit(lambda: client.get(path), repeat=args.repeat)
+            render = summarize(render_cpu)
+            print(f"{name} ({path})")
+            print(f"  identity  {len(body):>9,} bytes  render cpu {render['mean_ms']:.2f} ms")
+            for encoding, compress in encoders.items():
+                compressed = compress(body)
+                _, cpu = timeit(lambda: compress(body), repeat=args.repeat)
+                stats = summarize(cpu)
+                ratio = len(compressed) / len(body)
+                print(
+                    f"  {encoding:<8}  {len(compressed):>9,} bytes  ({ratio:.1%})"
+                    f"  compress cpu {stats['mean_ms']:.2f} ms (p99 {stats['p99_ms']:.2f} ms)"
+                )
+
+
+if __name__ == "__main__":
+    main()
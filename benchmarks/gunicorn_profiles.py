@@ -0,0 +1,88 @@
+"""
+Throughput and latency of the main views under each gunicorn profile.
+
+Starts gunicorn with each GUNICORN_PROFILE in turn on a local port, waits
+for /healthz, then fires concurrent requests at every path.
+
+    python benchmarks/gunicorn_profiles.py --path /courses/ \\
+        --path /courses/<course-id>/ --requests 500 --concurrency 32
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from _common import BASE_DIR, summarize, wait_until_healthy
+
+
+def fetch(url):
+    start = time.perf_counter()
+    try:
+        with urlopen(url, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except (HTTPError, URLError, OSError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def load(url, requests, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(fetch, [url] * requests))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, _ in results]
+    errors = sum(1 for _, ok in results if not ok)
+    return requests / elapsed, summarize(latencies), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", action="append", dest="profiles",
+                        help="profiles to compare (default: sync, gthread, uvicorn)")
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    profiles = args.profiles or ["sync", "gthread", "uvicorn"]
+    paths = args.paths or ["/courses/", "/healthz"]
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    for profile in profiles:
+        env = {
+            **os.environ,
+            "GUNICORN_PROFILE": profile,
+            "GUNICORN_BIND": f"127.0.0.1:{args.port}",
+            "GUNICORN_ACCESSLOG": "",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+            cwd=BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not wait_until_healthy(base_url):
+                print(f"{profile}: server did not become healthy, skipped")
+                continue
+            print(f"{profile}")
+            for path in paths:
+                load(f"{base_url}{path}", min(args.requests, 20), args.concurrency)  # warm up
+                throughput, latency, errors = load(f"{base_url}{path}", args.requests, args.concurrency)
+                print(
+                    f"  {path:<40} {throughput:8.1f} req/s  p50 {latency['p50_ms']:7.1f} ms"
+                    f"  p99 {latency['p99_ms']:7.1f} ms  errors {errors}"
+                )
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
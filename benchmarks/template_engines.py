@@ -0,0 +1,86 @@
+"""
+Rendering the course card list with the Django template engine against
+the Jinja2 one (templates/jinja2, COURSES_JINJA2_TEMPLATES); the page
+around it is a Django template either way.
+
+    python benchmarks/template_engines.py --courses 200 --repeat 200
+
+"fresh engine" is the first render in a new worker: Django compiles the
+templates, Jinja2 either compiles them or loads the bytecode an earlier
+worker left in JINJA2_BYTECODE_CACHE_DIR.
+"""
+import argparse
+import tempfile
+
+from _common import seeded_catalog, setup_django, summarize, timeit
+
+
+def report(name, wall, size):
+    stats = summarize(wall)
+    print(
+        f"{name:<34} mean {stats['mean_ms']:>8.3f} ms  p50 {stats['p50_ms']:.3f} ms"
+        f"  p99 {stats['p99_ms']:.3f} ms  {size:>9,} bytes"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.template.backends.django import DjangoTemplates
+    from django.template.backends.jinja2 import Jinja2
+    from courses import services
+    from courses.cache_tags import SHARED_CONTEXT
+    from courses.static_export import get_anonymous_request
+
+    django_params = next(
+        engine for engine in settings.TEMPLATES
+        if engine["BACKEND"] == "django.template.backends.django.DjangoTemplates"
+    )
+    bytecode_dir = tempfile.TemporaryDirectory()
+
+    def make_engine(name, bytecode_cache_dir=bytecode_dir.name):
+        # what django.template.engines does with a TEMPLATES entry
+        if name == "django":
+            backend, params = DjangoTemplates, django_params
+        else:
+            backend, params = Jinja2, settings.CATALOG_JINJA2_ENGINE
+            params = {**params, "OPTIONS": {**params["OPTIONS"], "bytecode_cache_dir": bytecode_cache_dir}}
+        params = {key: value for key, value in params.items() if key != "BACKEND"}
+        return backend({**params, "NAME": name})
+
+    with seeded_catalog(args.courses, lessons_per_course=0), bytecode_dir:
+        context = {"queryset": services.get_course_cards(), **SHARED_CONTEXT}
+        request = get_anonymous_request("/courses/")
+
+        def render(engine):
+            # the backends add request entries to the dict they are given
+            return engine.get_template("courses/snippets/list-display.html").render(dict(context), request)
+
+        print(f"{len(context['queryset']):,} course cards")
+        for name in ("django", "jinja2"):
+            engine = make_engine(name)
+            html = render(engine)
+            wall, _ = timeit(lambda: render(engine), repeat=args.repeat)
+            report(f"{name:<7} warm", wall, len(html))
+
+        def render_compiled():
+            with tempfile.TemporaryDirectory() as empty_dir:
+                return render(make_engine("jinja2", empty_dir))
+
+        fresh = (
+            ("django  fresh engine", lambda: render(make_engine("django"))),
+            ("jinja2  fresh engine, compile", render_compiled),
+            ("jinja2  fresh engine, bytecode", lambda: render(make_engine("jinja2"))),
+        )
+        for name, func in fresh:
+            wall, _ = timeit(func, repeat=max(args.repeat // 10, 5))
+            report(name, wall, len(func()))
+
+
+if __name__ == "__main__":
+    main()
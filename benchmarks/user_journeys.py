@@ -0,0 +1,386 @@
+"""
+Load test replaying learner journeys, the way a launch email brings them in:
+
+    /courses/ -> a course -> its first lesson, and behind the email gate
+    /hx/login/, POST /hx/login/, the OTP from the SMTP sink,
+    POST /hx/verify-otp/ -> then a few lessons (page, play and complete)
+
+    python benchmarks/user_journeys.py --users 500 --ramp-up 30
+
+Each learner is an asyncio task with its own cookies, arrivals are spread
+over --ramp-up seconds. By default it seeds a throwaway catalog (loadtest-*
+courses, --gated-share of them email-required), starts an
+emails.testing.SMTPSink and gunicorn (GUNICORN_PROFILE) pointed at it.
+Cloudinary is stubbed with dummy credentials: pages only build and sign
+Cloudinary urls locally, and the seeded rows skip the placeholder fetch.
+Seeded courses and the learners' emails are deleted afterwards.
+
+--base-url runs the journeys against a server you started yourself, with
+its own catalog and nothing seeded or deleted. Start it with
+EMAIL_HOST=127.0.0.1 EMAIL_PORT=<--smtp-port> EMAIL_USE_TLS=False
+EMAIL_HOST_USER= so the OTPs reach the sink.
+
+Reports requests, throughput, latency percentiles and error rate per
+endpoint. "otp email" is the time from the login response to the message
+reaching the sink.
+"""
+import argparse
+import asyncio
+import email
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from email import policy
+from urllib.parse import urlencode, urlsplit
+
+from _common import BASE_DIR, percentile, setup_django, wait_until_healthy
+
+COURSE_PREFIX = "loadtest-course-"
+EMAIL_DOMAIN = "loadtest.example.com"
+# credentials nothing checks, urls are signed locally and never fetched
+STUB_CLOUDINARY = {
+    "CLOUDINARY_CLOUD_NAME": "loadtest",
+    "CLOUDINARY_PUBLIC_API_KEY": "loadtest",
+    "CLOUDINARY_SECRET_API_KEY": "loadtest",
+}
+REQUEST_TIMEOUT = 30
+
+COURSE_LINK = re.compile(r'href="(/courses/[\w-]+)/?"')
+LESSON_LINK = re.compile(r'href="(/courses/[\w-]+/lessons/[\w-]+)/?"')
+EMAIL_GATE = b'hx-get="/hx/login/"'
+OTP_PATTERN = re.compile(r"Code: (\d{6})")
+
+Result = namedtuple("Result", ["status", "headers", "body", "latency"])
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, latency, ok=True):
+        self.latencies[name].append(latency)
+        if not ok:
+            self.errors[name] += 1
+
+    def report(self, elapsed):
+        print(
+            f"{'endpoint':<28} {'requests':>8} {'req/s':>7} {'mean':>8} {'p50':>8}"
+            f" {'p95':>8} {'p99':>8} {'errors':>7}"
+        )
+        for name, latencies in self.latencies.items():
+            ms = [latency * 1000 for latency in latencies]
+            print(
+                f"{name:<28} {len(ms):>8} {len(ms) / elapsed:>7.1f} {statistics.mean(ms):>6.1f}ms"
+                f" {percentile(ms, 50):>6.1f}ms {percentile(ms, 95):>6.1f}ms {percentile(ms, 99):>6.1f}ms"
+                f" {self.errors[name] / len(ms):>7.1%}"
+            )
+
+
+class OTPInbox:
+    """Codes from the sink's messages, by recipient."""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.seen = 0
+        self.codes = {}
+
+    def read_new(self):
+        with self.sink.lock:
+            messages = self.sink.messages[self.seen:]
+            self.seen += len(messages)
+        for message in messages:
+            parsed = email.message_from_bytes(message.data, policy=policy.default)
+            part = parsed.get_body(("plain",))
+            match = OTP_PATTERN.search(part.get_content()) if part else None
+            if match:
+                for address in message.rcpt_tos:
+                    self.codes[address] = match.group(1)
+
+    async def wait(self, address, timeout=REQUEST_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.read_new()
+            if address in self.codes:
+                return self.codes.pop(address)
+            await asyncio.sleep(0.05)
+        return None
+
+
+class Learner:
+    """One browser: a cookie jar and plain HTTP/1.0 requests, one connection each."""
+
+    def __init__(self, base_url, stats, email_address):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.netloc = parts.netloc
+        self.stats = stats
+        self.email = email_address
+        self.cookies = {}
+
+    async def send(self, method, path, body=b"", headers=None):
+        headers = {"Host": self.netloc, "User-Agent": "user-journeys", **(headers or {})}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        if body:
+            headers["Content-Length"] = str(len(body))
+        request = "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(f"{method} {path} HTTP/1.0\r\n{request}\r\n".encode("latin-1") + body)
+            await writer.drain()
+            # HTTP/1.0: the server closes once the response is out
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = raw.partition(b"\r\n\r\n")
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        response_headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            response_headers.setdefault(name.strip().lower(), []).append(value.strip())
+        for cookie in response_headers.get("set-cookie", ()):
+            name, _, value = cookie.split(";", 1)[0].partition("=")
+            if value and "max-age=0" not in cookie.lower():
+                self.cookies[name] = value
+            else:
+                self.cookies.pop(name, None)
+        return int(status_line.split()[1]), response_headers, content
+
+    async def request(self, name, method, path, data=None, htmx=False, csrf=False, expect=200, check=None):
+        """Records the request under name, follows redirects like a browser; None on failure."""
+        headers = {}
+        body = b""
+        if data is not None:
+            body = urlencode(data).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if htmx:
+            headers["HX-Request"] = "true"
+        if csrf and "csrftoken" in self.cookies:
+            headers["X-CSRFToken"] = self.cookies["csrftoken"]
+        start = time.perf_counter()
+        try:
+            for _ in range(5):
+                status, response_headers, content = await asyncio.wait_for(
+                    self.send(method, path, body, headers), REQUEST_TIMEOUT
+                )
+                if status not in (301, 302) or method != "GET":
+                    break
+                path = urlsplit(response_headers["location"][0]).path
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError, KeyError):
+            self.stats.record(name(None) if callable(name) else name, time.perf_counter() - start, ok=False)
+            return None
+        result = Result(status, response_headers, content, time.perf_counter() - start)
+        ok = status == expect and (check is None or check(result))
+        self.stats.record(name(result) if callable(name) else name, result.latency, ok)
+        return result if ok else None
+
+
+def unique(values):
+    return list(dict.fromkeys(values))
+
+
+async def run_journey(learner, inbox, lessons_to_watch, think):
+    async def pause():
+        await asyncio.sleep(random.uniform(0, think))
+
+    listing = await learner.request("GET /courses/", "GET", "/courses/")
+    if listing is None:
+        return "failed"
+    course_paths = unique(COURSE_LINK.findall(listing.body.decode()))
+    if not course_paths:
+        return "no courses"
+    await pause()
+    course = await learner.request("GET /courses/<id>/", "GET", f"{random.choice(course_paths)}/")
+    if course is None:
+        return "failed"
+    lesson_paths = unique(LESSON_LINK.findall(course.body.decode()))
+    if not lesson_paths:
+        return "no lessons"
+    await pause()
+
+    def lesson_name(result):
+        # None when the request itself failed
+        return "GET lesson (email gate)" if result and EMAIL_GATE in result.body else "GET lesson"
+
+    first = await learner.request(lesson_name, "GET", f"{lesson_paths[0]}/")
+    if first is None:
+        return "failed"
+    gated = EMAIL_GATE in first.body
+    if gated:
+        if await learner.request("GET /hx/login/", "GET", "/hx/login/", htmx=True) is None:
+            return "failed"
+        await pause()
+        login = await learner.request(
+            "POST /hx/login/", "POST", "/hx/login/", {"email": learner.email},
+            htmx=True, csrf=True, check=lambda result: b'name="otp"' in result.body
+        )
+        if login is None:
+            return "failed"
+        sent = time.perf_counter()
+        otp = await inbox.wait(learner.email)
+        learner.stats.record("otp email", time.perf_counter() - sent, ok=otp is not None)
+        if otp is None:
+            return "failed"
+        await pause()
+        # answered with HX-Redirect back to the gated lesson
+        verify = await learner.request(
+            "POST /hx/verify-otp/", "POST", "/hx/verify-otp/", {"email": learner.email, "otp": otp},
+            htmx=True, csrf=True, check=lambda result: "hx-redirect" in result.headers
+        )
+        if verify is None:
+            return "failed"
+
+    for index, lesson_path in enumerate(lesson_paths[:lessons_to_watch]):
+        if index or gated:
+            if await learner.request(lesson_name, "GET", f"{lesson_path}/") is None:
+                return "failed"
+        await learner.request("POST lesson play", "POST", f"{lesson_path}/play/", expect=204)
+        await pause()
+        # progress is only kept for verified emails, anonymous pages carry no CSRF token
+        if gated:
+            await learner.request(
+                "POST lesson complete", "POST", f"{lesson_path}/complete/", csrf=True, expect=204
+            )
+    return "verified" if gated else "anonymous"
+
+
+async def run_load(base_url, inbox, args):
+    stats = Stats()
+    run_id = uuid.uuid4().hex[:8]
+    outcomes = defaultdict(int)
+
+    async def arrive(number):
+        await asyncio.sleep(number * args.ramp_up / args.users)
+        learner = Learner(base_url, stats, f"learner-{run_id}-{number}@{EMAIL_DOMAIN}")
+        outcomes[await run_journey(learner, inbox, args.lessons, args.think)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(arrive(number) for number in range(args.users)))
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{count} {outcome}" for outcome, count in outcomes.items())
+    print(f"{args.users} learners in {elapsed:.1f}s: {summary}")
+    stats.report(elapsed)
+
+
+@contextmanager
+def seeded_loadtest_catalog(courses, lessons_per_course, gated_share):
+    """Committed, the server runs in another process; deleted afterwards."""
+    from courses.catalog import bump_catalog_version
+    from courses.models import AccessRequirement, Course, Lesson, PublishStatus
+    from emails.models import Email, EmailVerificationEvent
+
+    def cleanup():
+        Course.objects.filter(public_id__startswith=COURSE_PREFIX).delete()
+        EmailVerificationEvent.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+        Email.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").delete()
+        bump_catalog_version()
+
+    # leftovers of an interrupted run
+    cleanup()
+    gated = round(courses * gated_share)
+    course_objs = Course.objects.bulk_create([
+        Course(
+            title=f"Load Test Course {i}",
+            public_id=f"{COURSE_PREFIX}{i}",
+            description="A load test course. " * 20,
+            image=f"image/upload/v1/courses/{COURSE_PREFIX}{i}.jpg",
+            status=PublishStatus.PUBLISHED,
+            access=AccessRequirement.EMAIL_REQUIRED if i < gated else AccessRequirement.ANYONE,
+        )
+        for i in range(courses)
+    ])
+    Lesson.objects.bulk_create([
+        Lesson(
+            course=course,
+            title=f"Lesson {j}",
+            public_id=f"{course.public_id}-lesson-{j}",
+            description="A load test lesson. " * 10,
+            video=f"video/private/v1/courses/{course.public_id}/lessons/{j}.mp4",
+            status=PublishStatus.PUBLISHED,
+            order=j,
+        )
+        for course in course_objs
+        for j in range(lessons_per_course)
+    ])
+    bump_catalog_version()
+    try:
+        yield course_objs
+    finally:
+        cleanup()
+
+
+def start_server(port, sink, profile):
+    env = {
+        **os.environ,
+        **STUB_CLOUDINARY,
+        "GUNICORN_PROFILE": profile,
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        "GUNICORN_ACCESSLOG": "",
+        "EMAIL_HOST": sink.host,
+        "EMAIL_PORT": str(sink.port),
+        "EMAIL_USE_TLS": "False",
+        # the sink doesn't do AUTH
+        "EMAIL_HOST_USER": "",
+        "EMAIL_HOST_PASSWORD": "",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ramp-up", type=float, default=10, help="seconds over which learners arrive")
+    parser.add_argument("--lessons", type=int, default=3, help="lessons each learner watches")
+    parser.add_argument("--think", type=float, default=1.0, help="max seconds between a learner's steps")
+    parser.add_argument("--base-url", help="an already running server, nothing is seeded")
+    parser.add_argument("--smtp-port", type=int, default=0, help="sink port, any free one by default")
+    parser.add_argument("--profile", default="gthread", help="GUNICORN_PROFILE of the started server")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--course-lessons", type=int, default=5)
+    parser.add_argument("--gated-share", type=float, default=0.8, help="share of email-required courses")
+    parser.add_argument("--seed", type=int, help="random seed, for repeatable course/lesson picks")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    sys.path.insert(0, str(BASE_DIR))
+    from emails.testing import SMTPSink
+
+    with SMTPSink(port=args.smtp_port) as sink:
+        inbox = OTPInbox(sink)
+        if args.base_url:
+            print(f"SMTP sink on {sink.host}:{sink.port}")
+            asyncio.run(run_load(args.base_url.rstrip("/"), inbox, args))
+            return
+
+        setup_django()
+        base_url = f"http://127.0.0.1:{args.port}"
+        with seeded_loadtest_catalog(args.courses, args.course_lessons, args.gated_share):
+            server = start_server(args.port, sink, args.profile)
+            try:
+                if not wait_until_healthy(base_url):
+                    print("server did not become healthy")
+                    return
+                asyncio.run(run_load(base_url, inbox, args))
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        print(f"{len(sink.messages)} email(s) over {sink.connections} SMTP connection(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Latency of magic-link verification (verify_token and the
+/verify-email/<uuid>/ view) against a large EmailVerificationEvent table.
+
+    python benchmarks/verify_token.py --rows 10000000 --repeat 200
+
+Seeding 10M rows takes a while; they are rolled back afterwards.
+"""
+import argparse
+import random
+import uuid
+
+from _common import setup_django, summarize, timeit
+
+BATCH_SIZE = 10_000
+
+
+class _Rollback(Exception):
+    pass
+
+
+def seed_events(rows, emails=1000):
+    from emails.models import Email, EmailVerificationEvent
+
+    email_objs = Email.objects.bulk_create([
+        Email(email=f"bench-{i}@example.com") for i in range(emails)
+    ])
+    tokens = []
+    for start in range(0, rows, BATCH_SIZE):
+        batch = [
+            EmailVerificationEvent(
+                parent=email_objs[i % emails],
+                email=email_objs[i % emails].email,
+                token=uuid.uuid1(),
+            )
+            for i in range(start, min(start + BATCH_SIZE, rows))
+        ]
+        EmailVerificationEvent.objects.bulk_create(batch)
+        # a sample of tokens to look up, spread over the table
+        tokens.append(batch[len(batch) // 2].token)
+        if start and start % 1_000_000 == 0:
+            print(f"  seeded {start:,} rows")
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, transaction
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from emails import services
+    from emails.models import EmailVerificationEvent
+
+    client = Client()
+    try:
+        with transaction.atomic():
+            print(f"seeding {args.rows:,} verification events")
+            tokens = seed_events(args.rows)
+
+            sample = random.choice(tokens)
+            with CaptureQueriesContext(connection) as queries:
+                services.verify_token(sample, max_attempts=args.repeat * 2)
+            print(f"verify_token: {len(queries)} queries on success")
+            plan = EmailVerificationEvent.objects.filter(token=sample).explain()
+            print(f"token lookup plan: {plan}")
+
+            wall, _ = timeit(
+                lambda: services.verify_token(random.choice(tokens), max_attempts=args.repeat * 2),
+                repeat=args.repeat
+            )
+            stats = summarize(wall)
+            print(f"verify_token          p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+
+            wall, _ = timeit(
+                lambda: client.get(f"/verify-email/{random.choice(tokens)}/"),
+                repeat=args.repeat
+            )
+            stats = summarize(wall)
+            print(f"/verify-email/<uuid>/ p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+
+            wall, _ = timeit(
+                lambda: client.get(f"/verify-email/{uuid.uuid4()}/"),
+                repeat=args.repeat
+            )
+            stats = summarize(wall)
+            print(f"unknown token         p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
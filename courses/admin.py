@@ -1,5 +1,8 @@
-from django.contrib import admin
-from .models import Course,Lesson
+from django.contrib import admin, messages
+from django.db.models import Count, Q
+from emails.campaigns import create_course_campaign
+from home.pagination import EstimatedCountPaginator
+from .models import Course, Lesson, PublishStatus
 from django.utils.html import format_html
 import helpers
 class lessonInline(admin.StackedInline):
@@ -28,20 +31,56 @@ class lessonInline(admin.StackedInline):
             obj, 
             field_name='video',
             as_html=True,
-            width=550
+            width=550,
+            delivery=obj.video_delivery
         )
         return video_embed_html
 
     display_video.short_description = "Current Video"
 
+class PrefixSearchMixin:
+    """
+    Matches the whole search term against the search_fields, as a prefix
+    for ^ fields and exactly for = fields, instead of the admin's match of
+    every word anywhere (icontains), which scans the whole table. On
+    PostgreSQL the title prefixes use the UPPER(title) pattern-ops indexes
+    (courses migration 0009), = fields their plain column index.
+    """
+    search_lookups = {'^': 'istartswith', '=': 'exact'}
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = Q()
+        for field_name in self.search_fields:
+            lookup = self.search_lookups[field_name[0]]
+            query |= Q(**{f"{field_name[1:]}__{lookup}": search_term})
+        # only forward foreign keys are searched, no duplicate rows
+        return queryset.filter(query), False
+
+class CloudinaryAdminMixin:
+    # the upload widgets need the SDK configured before the form validates
+    def get_form(self, request, obj=None, **kwargs):
+        helpers.cloudinary_init()
+        return super().get_form(request, obj, **kwargs)
+
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(PrefixSearchMixin, CloudinaryAdminMixin, admin.ModelAdmin):
     inlines = [lessonInline]
-    list_display = ['title', 'status', 'access']
+    list_display = ['title', 'status', 'access', 'display_lesson_count']
     list_filter = ['status', 'access']
+    # also what the lesson course autocomplete searches
+    search_fields = ['^title', '=public_id']
+    search_help_text = "Starts with the title, or the exact public id"
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fields = [ 'public_id','title', 'description', 'status', 'image', 'access', 'display_image']
     readonly_fields = [ 'public_id','display_image']
 
+    actions = ['announce_course']
+
     def display_image(self, obj, *args, **kwargs):
         url = helpers.get_cloudinary_image_object(
             obj, 
@@ -52,4 +91,59 @@ class CourseAdmin(admin.ModelAdmin):
 
     display_image.short_description = "Current Image"
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # lesson counts in the changelist query instead of one COUNT per row;
+        # the change form, autocomplete and delete pages don't show them
+        match = request.resolver_match
+        if match is not None and match.url_name == f"{self.opts.app_label}_{self.opts.model_name}_changelist":
+            queryset = queryset.annotate(admin_lesson_count=Count('lesson'))
+        return queryset
+
+    @admin.display(description="Lessons", ordering='admin_lesson_count')
+    def display_lesson_count(self, obj):
+        return obj.admin_lesson_count
+
+    @admin.action(description="Announce selected courses to the email list")
+    def announce_course(self, request, queryset):
+        # sent by `python manage.py send_campaigns`, not in the request
+        campaigns = [
+            create_course_campaign(course_obj)
+            for course_obj in queryset.filter(status=PublishStatus.PUBLISHED)
+        ]
+        skipped = queryset.count() - len(campaigns)
+        message = f"{len(campaigns)} campaign(s) queued."
+        if skipped:
+            message += f" {skipped} unpublished course(s) skipped."
+        self.message_user(request, message, messages.SUCCESS if campaigns else messages.WARNING)
+
 #admin.site.register(Course, CourseAdmin)
+
+
+@admin.register(Lesson)
+class LessonAdmin(PrefixSearchMixin, CloudinaryAdminMixin, admin.ModelAdmin):
+    list_display = ['title', 'course', 'status', 'order', 'view_count', 'play_count', 'updated']
+    list_filter = ['status', 'video_delivery']
+    list_select_related = ['course']
+    search_fields = ['^title', '=public_id', '^course__title']
+    search_help_text = "Starts with the lesson or course title, or the exact public id"
+    autocomplete_fields = ['course']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # served by the (course, order) index
+    ordering = ['course', 'order']
+    fields = [
+        'public_id', 'course', 'title', 'description', 'thumbnail', 'video',
+        'video_delivery', 'can_preview', 'status', 'order', 'display_image',
+    ]
+    readonly_fields = ['public_id', 'display_image']
+
+    def display_image(self, obj, *args, **kwargs):
+        url = helpers.get_cloudinary_image_object(
+            obj, 
+            field_name='thumbnail',
+            width=200
+        )
+        return format_html(f"<img src={url} />")
+
+    display_image.short_description = "Current Image"
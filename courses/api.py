@@ -0,0 +1,228 @@
+"""
+Read-only JSON API for published courses and lessons.
+
+Rows come from .values() querysets, never model instances, and only the
+columns behind the requested ?fields= are selected. Pages are keyset
+cursors over the list ordering, so deep pages cost the same as the first.
+The ETag is derived from the catalog version and the request, so a client
+revalidating an unchanged page gets its 304 before any query runs; rows
+are read from the primary, like load_catalog, so a lagging replica can't
+serve old rows under the new version's ETag.
+orjson is used for serialization when installed.
+"""
+import base64
+import binascii
+import hashlib
+import json
+from collections import namedtuple
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+import helpers
+from .catalog import get_catalog_version
+from .models import Course, Lesson, PublishStatus
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to json
+    orjson = None
+
+API_DEFAULT_LIMIT = 20
+API_MAX_LIMIT = 100
+THUMBNAIL_WIDTH = 382
+
+
+class APIError(ValueError):
+    """Bad query parameters, answered with a 400."""
+
+
+# columns selected from .values() and the function turning the row into the value
+APIField = namedtuple('APIField', ['columns', 'value'])
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _course_url(public_id):
+    return f"{settings.BASE_URL}/courses/{public_id}/"
+
+
+# (field, resource identity) -> url; build_url is most of the cost of a row
+_thumbnail_urls = {}
+THUMBNAIL_URL_CACHE_SIZE = 10_000
+
+
+def get_thumbnail_url(field_name, resource, format=None):
+    """Same url as Course/Lesson.get_thumbnail(), memoized per resource version."""
+    if not resource:
+        return None
+    key = (
+        field_name, format, resource.public_id, resource.format,
+        resource.version, resource.type, resource.resource_type,
+    )
+    url = _thumbnail_urls.get(key)
+    if url is None:
+        url = helpers.get_cloudinary_image_object(
+            SimpleNamespace(**{field_name: resource}),
+            field_name=field_name,
+            format=format,
+            width=THUMBNAIL_WIDTH
+        ) or None
+        if len(_thumbnail_urls) >= THUMBNAIL_URL_CACHE_SIZE:
+            _thumbnail_urls.clear()
+        _thumbnail_urls[key] = url
+    return url
+
+
+def _lesson_thumbnail(row):
+    # the thumbnail, else a frame of the video
+    if row['thumbnail']:
+        return get_thumbnail_url('thumbnail', row['thumbnail'], format='jpg')
+    return get_thumbnail_url('video', row['video'], format='jpg')
+
+
+COURSE_FIELDS = {
+    "id": APIField(('public_id',), lambda row: row['public_id']),
+    "title": APIField(('title',), lambda row: row['title']),
+    "description": APIField(('description',), lambda row: row['description']),
+    "access": APIField(('access',), lambda row: row['access']),
+    "url": APIField(('public_id',), lambda row: _course_url(row['public_id'])),
+    "thumbnail": APIField(('image',), lambda row: get_thumbnail_url('image', row['image'])),
+    "created": APIField(('timestamp',), lambda row: _isoformat(row['timestamp'])),
+    "updated": APIField(('updated',), lambda row: _isoformat(row['updated'])),
+}
+COURSE_DEFAULT_FIELDS = ("id", "title", "url", "thumbnail", "updated")
+
+LESSON_FIELDS = {
+    "id": APIField(('public_id',), lambda row: row['public_id']),
+    "course": APIField(('course__public_id',), lambda row: row['course__public_id']),
+    "title": APIField(('title',), lambda row: row['title']),
+    "description": APIField(('description',), lambda row: row['description']),
+    "status": APIField(('status',), lambda row: row['status']),
+    "order": APIField(('order',), lambda row: row['order']),
+    "can_preview": APIField(('can_preview',), lambda row: row['can_preview']),
+    "url": APIField(
+        ('course__public_id', 'public_id'),
+        lambda row: f"{_course_url(row['course__public_id'])}lessons/{row['public_id']}/"
+    ),
+    "thumbnail": APIField(('thumbnail', 'video'), _lesson_thumbnail),
+    "updated": APIField(('updated',), lambda row: _isoformat(row['updated'])),
+}
+LESSON_DEFAULT_FIELDS = ("id", "title", "status", "url", "thumbnail")
+
+
+def parse_fields(value, field_map, default):
+    if not value:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in field_map]
+    if unknown or not fields:
+        raise APIError(
+            f"Unknown field(s) {', '.join(unknown)}; choose from {', '.join(field_map)}"
+        )
+    return fields
+
+
+def parse_limit(value):
+    if not value:
+        return API_DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise APIError("limit must be an integer")
+    if not 1 <= limit <= API_MAX_LIMIT:
+        raise APIError(f"limit must be between 1 and {API_MAX_LIMIT}")
+    return limit
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value, length):
+    """The key values of the last row of the previous page, None for the first page."""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise APIError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != length or not all(isinstance(v, int) for v in values):
+        raise APIError("Invalid cursor")
+    return values
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def get_etag(full_path):
+    """Every catalog change bumps the version, so the version and the url name the body."""
+    return hashlib.md5(f"{get_catalog_version()}:{full_path}".encode()).hexdigest()
+
+
+def serialize_row(row, field_map, fields):
+    return {name: field_map[name].value(row) for name in fields}
+
+
+def get_page(queryset, field_map, fields, limit, key):
+    """One page of queryset, already ordered by key, plus the cursor of the next one."""
+    columns = set(key)
+    for name in fields:
+        columns.update(field_map[name].columns)
+    rows = list(queryset.values(*sorted(columns))[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][column] for column in key])
+    return {
+        "data": [serialize_row(row, field_map, fields) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def get_course_page(fields=COURSE_DEFAULT_FIELDS, cursor=None, limit=API_DEFAULT_LIMIT):
+    queryset = Course.objects.using(DEFAULT_DB_ALIAS).filter(status=PublishStatus.PUBLISHED)
+    after = decode_cursor(cursor, 1)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after[0])
+    return get_page(queryset.order_by('id'), COURSE_FIELDS, fields, limit, key=('id',))
+
+
+def get_course_item(course_id, fields=COURSE_DEFAULT_FIELDS):
+    columns = set()
+    for name in fields:
+        columns.update(COURSE_FIELDS[name].columns)
+    row = Course.objects.using(DEFAULT_DB_ALIAS).filter(
+        public_id=course_id,
+        status=PublishStatus.PUBLISHED
+    ).values(*sorted(columns)).first()
+    if row is None:
+        return None
+    return {"data": serialize_row(row, COURSE_FIELDS, fields)}
+
+
+def get_lesson_page(course_obj, fields=LESSON_DEFAULT_FIELDS, cursor=None, limit=API_DEFAULT_LIMIT):
+    queryset = Lesson.objects.using(DEFAULT_DB_ALIAS).filter(
+        course_id=course_obj.id,
+        status__in=[PublishStatus.PUBLISHED, PublishStatus.COMING_SOON]
+    )
+    after = decode_cursor(cursor, 2)
+    if after is not None:
+        order, last_id = after
+        queryset = queryset.filter(Q(order__gt=order) | Q(order=order, id__gt=last_id))
+    return get_page(
+        queryset.order_by('order', 'id'),
+        LESSON_FIELDS,
+        fields,
+        limit,
+        key=('order', 'id')
+    )
@@ -0,0 +1,112 @@
+"""
+Surrogate keys and proxy cache rules for the course and lesson pages.
+
+    catalog              the course list
+    course:<public_id>   the course page and every page of its lessons
+    lesson:<public_id>   the lesson page
+
+Pages are shared (public, s-maxage) only for visitors without a verified
+email, and never for lessons of email-required courses: those either show
+the gated video or set next_url in the session. Shared pages are rendered
+without a CSRF token, a token in a cached page would belong to whoever
+missed the cache; nothing on them posts except the anonymous play beacon.
+
+With STATIC_CATALOG_EXPORT_ON_SAVE the pages exported for nginx (see
+courses.static_export) are refreshed from the same hooks.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_vary_headers
+
+from home import proxy_cache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_KEY = "catalog"
+CATALOG_PATHS = ("/courses/", "/courses/?order=popular")
+# lesson pages embed cached signed video urls, keep them at the proxy only
+# briefly so a changed video or delivery mode shows up soon
+LESSON_MAX_S_MAXAGE = 30
+
+# merged into the context of shared pages; the Jinja2 backend sets
+# csrf_token after the context, so its templates check omit_csrf_token
+SHARED_CONTEXT = {"csrf_token": "", "omit_csrf_token": True}
+
+
+def course_key(public_id):
+    return f"course:{public_id}"
+
+
+def lesson_key(public_id):
+    return f"lesson:{public_id}"
+
+
+def is_shared_request(request):
+    return not request.session.get('email_id')
+
+
+def patch_catalog_response(request, response, keys, shared, s_maxage=None):
+    # the list view answers htmx with a partial
+    patch_vary_headers(response, ("HX-Request",))
+    if shared:
+        return proxy_cache.patch_proxy_cache(response, keys, s_maxage=s_maxage)
+    return proxy_cache.patch_private(response, keys)
+
+
+def export_static_pages():
+    """
+    Re-exports the static catalog pages once the transaction commits (after
+    the catalog version bump, so the export sees the new rows). Exports are
+    incremental, only the changed course pages and the list are rendered.
+    """
+    if not settings.STATIC_CATALOG_EXPORT_ON_SAVE:
+        return
+
+    def run():
+        from .static_export import export_static_catalog
+
+        try:
+            export_static_catalog()
+        except Exception:
+            # the next save or `manage.py export_static_catalog` catches up
+            logger.exception("static catalog export failed")
+
+    transaction.on_commit(run)
+
+
+def purge_course(course_obj):
+    export_static_pages()
+    if not proxy_cache.is_enabled():
+        return
+
+    def get_paths():
+        from .models import Lesson
+
+        lesson_ids = Lesson.objects.filter(course_id=course_obj.id).values_list('public_id', flat=True)
+        return (
+            *CATALOG_PATHS,
+            f"{course_obj.path}/",
+            *(f"{course_obj.path}/lessons/{lesson_id}/" for lesson_id in lesson_ids),
+        )
+    proxy_cache.purge((CATALOG_KEY, course_key(course_obj.public_id)), get_paths)
+
+
+def purge_lesson(lesson_obj):
+    export_static_pages()
+    if not proxy_cache.is_enabled():
+        return
+    # the course page lists the lesson, sibling lesson pages link to it
+    course_obj = lesson_obj.course
+
+    def get_paths():
+        from .models import Lesson
+
+        lesson_ids = Lesson.objects.filter(course_id=course_obj.id).values_list('public_id', flat=True)
+        return (
+            f"{course_obj.path}/",
+            f"{lesson_obj.path}/",
+            *(f"{course_obj.path}/lessons/{lesson_id}/" for lesson_id in lesson_ids),
+        )
+    proxy_cache.purge((course_key(course_obj.public_id), lesson_key(lesson_obj.public_id)), get_paths)
@@ -0,0 +1,145 @@
+"""
+Slotted view models for the course and lesson cards.
+
+A Card holds exactly what card.html prints: title, path, excerpt, srcset,
+placeholder, status and lesson count, all computed once per catalog
+version and shared by every request. Rendering a card is then attribute
+lookups only: no model methods, Cloudinary url building, srcset cache
+reads or truncatewords per card per request.
+
+Cards are built from the catalog snapshot rather than a second query, so
+list pages stay SQL-free and the rows aren't held twice.
+"""
+import threading
+from collections import namedtuple
+from types import SimpleNamespace
+
+from django.utils.text import Truncator
+
+import helpers
+from .catalog import get_catalog
+from .models import PublishStatus
+
+EXCERPT_WORDS = 20
+COURSE_IMAGE_WIDTH = 750
+LESSON_IMAGE_WIDTH = 382
+
+
+class Card:
+    __slots__ = ('id', 'title', 'path', 'excerpt', 'image', 'placeholder', 'status', 'lesson_count')
+
+    def __init__(self, id, title, path, excerpt, image, placeholder, status, lesson_count=0):
+        self.id = id
+        self.title = title
+        self.path = path
+        self.excerpt = excerpt
+        self.image = image
+        self.placeholder = placeholder
+        self.status = status
+        self.lesson_count = lesson_count
+
+    def __repr__(self):
+        return f"<Card {self.path}>"
+
+    @property
+    def is_coming_soon(self):
+        return self.status == PublishStatus.COMING_SOON
+
+    def get_absolute_url(self):
+        return self.path
+
+
+def get_excerpt(description):
+    # same output as the truncatewords filter
+    if not description:
+        return ""
+    return Truncator(description).words(EXCERPT_WORDS, truncate=" …")
+
+
+def get_srcset(field_name, resource, base_width, format=None):
+    """The get_responsive_thumbnail() dict for one Cloudinary field, None without an image."""
+    if not resource:
+        return None
+    return helpers.get_responsive_image_srcset(
+        SimpleNamespace(**{field_name: resource}),
+        field_name=field_name,
+        base_width=base_width,
+        format=format
+    )
+
+
+def build_course_card(course):
+    return Card(
+        id=course.id,
+        title=course.title,
+        path=course.path,
+        excerpt=get_excerpt(course.description),
+        image=get_srcset('image', course.image, COURSE_IMAGE_WIDTH),
+        placeholder=course.placeholder or "",
+        status=course.status,
+        lesson_count=course.lesson_count,
+    )
+
+
+def build_lesson_card(lesson):
+    if lesson.thumbnail:
+        image = get_srcset('thumbnail', lesson.thumbnail, LESSON_IMAGE_WIDTH)
+    else:
+        image = get_srcset('video', lesson.video, LESSON_IMAGE_WIDTH, format='jpg')
+    return Card(
+        id=lesson.id,
+        title=lesson.title,
+        path=lesson.path,
+        excerpt=get_excerpt(lesson.description),
+        image=image,
+        placeholder=lesson.placeholder or "",
+        status=lesson.status,
+    )
+
+
+# course cards by public_id, lesson card tuples by course public_id; filled
+# lazily so a request only pays for the cards it shows
+CatalogCards = namedtuple('CatalogCards', ['version', 'courses', 'lessons'])
+
+_cards = None
+_cards_lock = threading.Lock()
+
+
+def _get_cards():
+    global _cards
+    catalog = get_catalog()
+    cards = _cards
+    if cards is None or cards.version != catalog.version:
+        with _cards_lock:
+            if _cards is None or _cards.version != catalog.version:
+                _cards = CatalogCards(catalog.version, {}, {})
+            cards = _cards
+    return catalog, cards
+
+
+def get_course_cards(courses):
+    """Cards for catalog courses, in the order given."""
+    catalog, cards = _get_cards()
+    result = []
+    for course in courses:
+        card = cards.courses.get(course.public_id)
+        if card is None:
+            # build from this version's row, course may come from an older snapshot
+            entry = catalog.courses_by_id.get(course.public_id)
+            if entry is None:
+                continue
+            card = cards.courses[course.public_id] = build_course_card(entry.course)
+        result.append(card)
+    return tuple(result)
+
+
+def get_lesson_cards(course_obj):
+    catalog, cards = _get_cards()
+    lesson_cards = cards.lessons.get(course_obj.public_id)
+    if lesson_cards is None:
+        entry = catalog.courses_by_id.get(course_obj.public_id)
+        lessons = entry.lessons if entry is not None else ()
+        lesson_cards = cards.lessons[course_obj.public_id] = tuple(
+            build_lesson_card(lesson) for lesson in lessons
+        )
+    return lesson_cards
@@ -0,0 +1,140 @@
+"""
+Process-local, read-only snapshot of the published catalog.
+
+Each worker loads the snapshot lazily on first use and keeps it until the
+shared catalog version (stored in the cache) changes. Course/Lesson saves
+and deletes bump the version, so every worker reloads on its next request;
+with more than one worker process the default cache has to be a shared
+one (see check_shared_cache).
+
+The snapshot holds namedtuple rows, not model instances: every thread
+reads the same rows, and the services build fresh instances from them.
+"""
+import threading
+import uuid
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+CATALOG_VERSION_KEY = "courses:catalog:version"
+
+# the fields pages read, in model field order (Model.from_db needs it);
+# the lesson counters are written without a version bump, so they're left out
+COURSE_FIELDS = (
+    'id', 'title', 'public_id', 'description', 'timestamp', 'updated',
+    'image', 'placeholder', 'access', 'status',
+)
+LESSON_FIELDS = (
+    'id', 'course_id', 'public_id', 'title', 'description', 'thumbnail', 'video',
+    'video_delivery', 'placeholder', 'can_preview', 'status', 'timestamp',
+    'updated', 'order', 'progress_index',
+)
+CourseRow = namedtuple('CourseRow', COURSE_FIELDS + ('path', 'lesson_count'))
+LessonRow = namedtuple('LessonRow', LESSON_FIELDS + ('path',))
+
+CatalogCourse = namedtuple('CatalogCourse', ['course', 'lessons', 'lessons_by_id'])
+Catalog = namedtuple('Catalog', ['version', 'courses', 'courses_by_id'])
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def _set_new_catalog_version():
+    cache.set(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def bump_catalog_version():
+    _set_new_catalog_version()
+    # bump again once the write is visible to other workers, so a worker
+    # that reloaded mid-transaction doesn't keep the old rows
+    transaction.on_commit(_set_new_catalog_version)
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def check_shared_cache():
+    """
+    The version key lives in the default cache; a LocMemCache is per
+    process, so a bump would only reach the worker that saved.
+    """
+    if isinstance(caches['default'], LocMemCache):
+        raise ImproperlyConfigured(
+            "The catalog version needs a cache shared by every worker process, "
+            "set CACHE_BACKEND to a file, database, Redis or Memcached backend"
+        )
+
+
+def load_catalog(version=None):
+    # models import this module for bump_catalog_version
+    from .models import Course, Lesson, PublishStatus
+
+    # always from the primary: a lagging replica would freeze stale rows
+    # under the new version until the next catalog change
+    courses = list(
+        Course.objects.using(DEFAULT_DB_ALIAS).filter(
+            status=PublishStatus.PUBLISHED
+        ).order_by('id')
+    )
+    lessons_by_course = {course.id: [] for course in courses}
+    courses_by_pk = {course.id: course for course in courses}
+    lessons_qs = Lesson.objects.using(DEFAULT_DB_ALIAS).filter(
+        course__status=PublishStatus.PUBLISHED,
+        status__in=[PublishStatus.PUBLISHED, PublishStatus.COMING_SOON]
+    )
+    for lesson in lessons_qs:
+        if lesson.course_id not in courses_by_pk:
+            continue
+        # share the course instance so lesson.path never queries
+        lesson.course = courses_by_pk[lesson.course_id]
+        lessons_by_course[lesson.course_id].append(
+            LessonRow(*(getattr(lesson, name) for name in LESSON_FIELDS), path=lesson.path)
+        )
+
+    rows = []
+    entries = {}
+    for course in courses:
+        lessons = tuple(lessons_by_course[course.id])
+        row = CourseRow(
+            *(getattr(course, name) for name in COURSE_FIELDS),
+            path=course.path,
+            lesson_count=len(lessons),
+        )
+        rows.append(row)
+        entries[course.public_id] = CatalogCourse(
+            course=row,
+            lessons=lessons,
+            lessons_by_id=MappingProxyType({lesson.public_id: lesson for lesson in lessons}),
+        )
+    return Catalog(
+        version=version,
+        courses=tuple(rows),
+        courses_by_id=MappingProxyType(entries),
+    )
+
+
+def get_catalog():
+    global _catalog
+    version = get_catalog_version()
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = load_catalog(version=version)
+        return _catalog
+
+
+def clear_catalog():
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
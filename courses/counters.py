@@ -0,0 +1,167 @@
+"""
+Buffered lesson view/play counters.
+
+Requests only bump an in-process tally; a daemon thread in each worker
+flushes it every LESSON_COUNTER_FLUSH_SECONDS with one UPDATE ... CASE per
+batch of lessons, so hot lessons never take a row lock on the request path.
+Counts buffered in a worker that is killed hard are lost, which is fine
+for popularity numbers.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+COUNTER_FLUSH_BATCH_SIZE = 500
+POPULARITY_CACHE_KEY = "courses:popularity"
+POPULARITY_CACHE_TIMEOUT = 300
+
+logger = logging.getLogger(__name__)
+
+
+class LessonCounterBuffer:
+    def __init__(self):
+        self._views = Counter()
+        self._plays = Counter()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+
+    def record_view(self, lesson_id):
+        with self._lock:
+            self._views[lesson_id] += 1
+        self.ensure_flusher()
+
+    def record_play(self, lesson_id):
+        with self._lock:
+            self._plays[lesson_id] += 1
+        self.ensure_flusher()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._views), dict(self._plays)
+
+    def drain(self):
+        with self._lock:
+            views, plays = self._views, self._plays
+            self._views, self._plays = Counter(), Counter()
+        return views, plays
+
+    def flush(self):
+        """
+        Write the buffered counts, returns the number of lessons updated.
+        On a database error the counts go back into the buffer.
+        """
+        views, plays = self.drain()
+        if not views and not plays:
+            return 0
+        try:
+            return flush_lesson_counts(views, plays)
+        except Exception:
+            with self._lock:
+                self._views.update(views)
+                self._plays.update(plays)
+            raise
+
+    def ensure_flusher(self):
+        # started lazily so each (forked) worker gets its own thread
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            self._flusher = threading.Thread(
+                target=self._run_flusher,
+                name="lesson-counter-flusher",
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(settings.LESSON_COUNTER_FLUSH_SECONDS)
+            try:
+                self.flush()
+            except Exception:
+                # counts stay buffered and are retried on the next tick
+                logger.exception("Flushing lesson counters failed")
+            finally:
+                # no request cycle closes this thread's connection, drop it
+                # so a broken one isn't reused and an idle one isn't held
+                connection.close()
+
+
+def _counter_case(counts):
+    return Case(
+        *[When(pk=pk, then=Value(count)) for pk, count in counts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def flush_lesson_counts(views, plays):
+    from .models import Lesson
+
+    lesson_ids = sorted(set(views) | set(plays))
+    for start in range(0, len(lesson_ids), COUNTER_FLUSH_BATCH_SIZE):
+        batch = lesson_ids[start:start + COUNTER_FLUSH_BATCH_SIZE]
+        batch_views = {pk: views[pk] for pk in batch if views.get(pk)}
+        batch_plays = {pk: plays[pk] for pk in batch if plays.get(pk)}
+        updates = {}
+        if batch_views:
+            updates['view_count'] = F('view_count') + _counter_case(batch_views)
+        if batch_plays:
+            updates['play_count'] = F('play_count') + _counter_case(batch_plays)
+        # one statement per batch, in pk order so concurrent flushes from
+        # other workers lock rows in the same order; queryset update skips
+        # save(), so the catalog version is left alone
+        Lesson.objects.filter(pk__in=batch).update(**updates)
+    return len(lesson_ids)
+
+
+def get_course_popularity():
+    """
+    {course pk: total lesson views + plays}, cached for a few minutes since
+    it only orders the course list.
+    """
+    popularity = cache.get(POPULARITY_CACHE_KEY)
+    if popularity is not None:
+        return popularity
+    from .models import Lesson
+
+    rows = Lesson.objects.values('course_id').annotate(
+        total=Sum('view_count') + Sum('play_count')
+    ).values_list('course_id', 'total')
+    popularity = {course_id: total or 0 for course_id, total in rows}
+    cache.set(POPULARITY_CACHE_KEY, popularity, POPULARITY_CACHE_TIMEOUT)
+    return popularity
+
+
+lesson_counters = LessonCounterBuffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    # gunicorn max_requests restarts exit cleanly, keep their counts
+    views, plays = lesson_counters.pending()
+    if not views and not plays:
+        return
+    try:
+        lesson_counters.flush()
+    except DatabaseError as error:
+        # the database went away before the interpreter did
+        logger.warning(
+            "Lesson counters not flushed at exit, %s lessons' counts are lost: %s",
+            len(set(views) | set(plays)), error,
+        )
+    except Exception:
+        logger.exception("Flushing lesson counters at exit failed, the buffered counts are lost")
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.static_export import export_static_catalog
+
+
+class Command(BaseCommand):
+    help = "Render the anonymous course list and detail pages to files nginx serves directly"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=None,
+            help="Directory to write to (default STATIC_CATALOG_ROOT)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-render every page, e.g. after a template or static files change",
+        )
+
+    def handle(self, *args, **options):
+        root = options["output"] or settings.STATIC_CATALOG_ROOT
+        result = export_static_catalog(root=root, force=options["force"])
+        self.stdout.write(
+            f"{root}: {result.rendered} course page(s) rendered, {result.unchanged} unchanged, "
+            f"{result.removed} removed, list page {'rendered' if result.list_rendered else 'unchanged'}"
+        )
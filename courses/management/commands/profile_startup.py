@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+ImportNode = namedtuple('ImportNode', ['name', 'self_us', 'cumulative_us', 'children'])
+
+STARTUP_TARGETS = {
+    "wsgi": "import home.wsgi",
+    "setup": "import django; django.setup()",
+    "models": "import django; django.setup(); import courses.models, emails.models",
+}
+
+
+def parse_importtime(output):
+    """
+    Builds a tree from `python -X importtime` stderr. Children are printed
+    before their parent, two extra spaces of indent per level.
+    """
+    pending = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, _, fields = line.partition(":")
+        self_us, cumulative_us, name = fields.split("|", 2)
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        node = ImportNode(
+            name=name.strip(),
+            self_us=int(self_us),
+            cumulative_us=int(cumulative_us),
+            children=tuple(pending.pop(depth + 1, ())),
+        )
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+class Command(BaseCommand):
+    help = "Report the import-time breakdown of worker startup as a tree (python -X importtime)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", choices=STARTUP_TARGETS, default="wsgi")
+        parser.add_argument("--min-ms", type=float, default=2.0,
+                            help="hide imports cheaper than this (cumulative)")
+        parser.add_argument("--depth", type=int, default=4)
+        parser.add_argument("--top", type=int, default=15,
+                            help="how many top level imports to show")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "home.settings"
+        )}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_TARGETS[options["target"]]],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            self.stderr.write(result.stderr[-2000:])
+            return
+        roots = parse_importtime(result.stderr)
+        total_us = sum(node.cumulative_us for node in roots)
+        self.stdout.write(f"{options['target']}: {total_us / 1000:.1f} ms total import time")
+        roots = sorted(roots, key=lambda node: node.cumulative_us, reverse=True)
+        for node in roots[:options["top"]]:
+            self.write_node(node, 0, options["min_ms"] * 1000, options["depth"])
+
+    def write_node(self, node, level, min_us, max_depth):
+        if node.cumulative_us < min_us:
+            return
+        self.stdout.write(
+            f"{'  ' * level}{node.name}  {node.cumulative_us / 1000:.1f} ms"
+            f" (self {node.self_us / 1000:.1f} ms)"
+        )
+        if level + 1 >= max_depth:
+            return
+        for child in sorted(node.children, key=lambda child: child.cumulative_us, reverse=True):
+            self.write_node(child, level + 1, min_us, max_depth)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_alter_course_public_id_alter_lesson_public_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='video_delivery',
+            field=models.CharField(choices=[('progressive', 'Progressive download'), ('hls', 'Adaptive (HLS)'), ('dash', 'Adaptive (DASH)')], default='progressive', help_text='Adaptive streaming lets slow connections start at a low rendition.', max_length=12),
+        ),
+    ]
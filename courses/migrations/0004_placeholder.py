@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 16:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_lesson_video_delivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='placeholder',
+            field=models.TextField(blank=True, editable=False, null=True),
+        ),
+    ]
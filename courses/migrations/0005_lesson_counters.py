@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_placeholder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='play_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
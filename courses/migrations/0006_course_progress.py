@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_progress_indexes(apps, schema_editor):
+    Lesson = apps.get_model('courses', 'Lesson')
+    next_index = {}
+    for lesson in Lesson.objects.order_by('course_id', 'id').only('id', 'course_id'):
+        index = next_index.get(lesson.course_id, 0)
+        next_index[lesson.course_id] = index + 1
+        Lesson.objects.filter(pk=lesson.pk).update(progress_index=index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_lesson_counters'),
+        ('emails', '0003_emailverificationevent_otp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='progress_index',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(assign_progress_indexes, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='CourseProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed', models.BinaryField(default=b'')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='courses.course')),
+                ('email', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='emails.email')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('email', 'course'), name='unique_course_progress')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:28
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def renumber_duplicate_indexes(apps, schema_editor):
+    # lessons created at the same time could get the same index; the first
+    # keeps it, the others move past the course's highest one
+    Lesson = apps.get_model('courses', 'Lesson')
+    seen = set()
+    last_index = dict(
+        Lesson.objects.values_list('course_id').annotate(last=Max('progress_index')).order_by()
+    )
+    lessons = Lesson.objects.filter(progress_index__isnull=False).order_by('course_id', 'progress_index', 'id')
+    for lesson in lessons.only('id', 'course_id', 'progress_index'):
+        key = (lesson.course_id, lesson.progress_index)
+        if key not in seen:
+            seen.add(key)
+            continue
+        last_index[lesson.course_id] += 1
+        Lesson.objects.filter(pk=lesson.pk).update(progress_index=last_index[lesson.course_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_lesson_course_order_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicate_indexes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=models.UniqueConstraint(fields=('course', 'progress_index'), name='unique_lesson_progress_index'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:40
+
+from django.db import migrations
+
+# the admin's ^title search is an istartswith, which PostgreSQL runs as
+# UPPER(title::text) LIKE UPPER('term%'); only an index on that expression
+# with the pattern operator class can answer it outside the C collation.
+# Other backends have no operator classes, they keep scanning.
+TITLE_PREFIX_INDEXES = {
+    'course_title_upper_like_idx': 'courses_course',
+    'lesson_title_upper_like_idx': 'courses_lesson',
+}
+
+
+def create_title_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for name, table in TITLE_PREFIX_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} "
+            f"(UPPER({quote('title')}::text) text_pattern_ops)"
+        )
+
+
+def drop_title_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for name in TITLE_PREFIX_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {quote(name)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_lesson_progress_index_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_title_prefix_indexes, drop_title_prefix_indexes),
+    ]
@@ -1,9 +1,13 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 import helpers
+from .cache_tags import purge_course, purge_lesson
+from .catalog import bump_catalog_version
+from .placeholders import generate_placeholder_later
 from cloudinary.models import CloudinaryField
 from django.utils.text import slugify
 import uuid
-helpers.cloudinary_init()
 class AccessRequirement(models.TextChoices):
     ANYONE = "any", "Anyone"
     EMAIL_REQUIRED = "email", "Email required"
@@ -13,6 +17,11 @@ class PublishStatus(models.TextChoices):
     COMING_SOON = "soon", "Coming Soon"
     DRAFT = "draft", "Draft"
 
+class VideoDelivery(models.TextChoices):
+    PROGRESSIVE = "progressive", "Progressive download"
+    HLS = "hls", "Adaptive (HLS)"
+    DASH = "dash", "Adaptive (DASH)"
+
 def get_public_id_prefix(instance, *args, **kwargs):
     if hasattr(instance, 'path'):
         path = instance.path
@@ -50,6 +59,31 @@ def generate_public_id(instance, *args, **kwargs):
 
 
 
+def has_field_changed(instance, field_name):
+    field = instance._meta.get_field(field_name)
+    value = field.get_prep_value(getattr(instance, field_name))
+    if instance.pk is None:
+        return bool(value)
+    previous = instance.__class__.objects.filter(
+        pk=instance.pk
+    ).values_list(field_name, flat=True).first()
+    return field.get_prep_value(previous) != value
+
+
+def get_next_progress_index(course_id):
+    """
+    Call inside a transaction that also inserts the lesson: the course row
+    stays locked until it commits, so lessons created at the same time get
+    their indexes one after another. Read on the primary, a replica may not
+    have the last lesson yet.
+    """
+    Course.objects.using(DEFAULT_DB_ALIAS).select_for_update().filter(pk=course_id).values_list('pk').first()
+    last_index = Lesson.objects.using(DEFAULT_DB_ALIAS).filter(course_id=course_id).aggregate(
+        last_index=models.Max('progress_index')
+    )['last_index']
+    return 0 if last_index is None else last_index + 1
+
+
 def handle_upload(instance, filename):
     return f"{filename}"
 class Course(models.Model):
@@ -66,6 +100,9 @@ class Course(models.Model):
         display_name=get_display_name,
         tags=["course", "thumbnail"]
     )
+    # blur-up data uri, "" until generate_placeholder_later (or the
+    # generate_placeholders command) has fetched one
+    placeholder = models.TextField(blank=True, default="", editable=False)
     access = models.CharField(
         max_length=5,  
         choices=AccessRequirement.choices,
@@ -78,17 +115,37 @@ class Course(models.Model):
         )
     
 
+    def __str__(self):
+        return self.title
+
     @property
     def is_published(self):
         return self.status == PublishStatus.PUBLISHED
     
     def save(self, *args, **kwargs):
         # before save
+        helpers.cloudinary_init() # uploads happen in pre_save
         if self.public_id == "" or self.public_id is None:
             self.public_id = generate_public_id(self)
+        image_changed = has_field_changed(self, 'image')
+        if image_changed:
+            # the old image's placeholder goes out with this save, the new
+            # one is fetched from Cloudinary after commit, off the request
+            self.placeholder = ""
         super().save(*args, **kwargs)
         # after save
+        if image_changed:
+            generate_placeholder_later(self)
+        bump_catalog_version()
+        purge_course(self)
 
+    def get_placeholder(self):
+        # after save, so uploads are already on Cloudinary
+        return helpers.get_image_placeholder_data_uri(self, field_name='image')
+
+    def update_placeholder(self):
+        self.placeholder = self.get_placeholder()
+        Course.objects.filter(pk=self.pk).update(placeholder=self.placeholder)
 
     def get_display_name(self):
         return f"{self.title} - Course"
@@ -182,6 +239,13 @@ class Lesson(models.Model):
             resource_type='video',
             tags = ['video', 'lesson'],
             )
+    video_delivery = models.CharField(
+        max_length=12,
+        choices=VideoDelivery.choices,
+        default=VideoDelivery.PROGRESSIVE,
+        help_text="Adaptive streaming lets slow connections start at a low rendition."
+    )
+    placeholder = models.TextField(blank=True, default="", editable=False)
     can_preview = models.BooleanField(default=False, help_text="If user does not have access to course, can they see this?")
     status = models.CharField(
         max_length=10, 
@@ -191,15 +255,56 @@ class Lesson(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
     order = models.IntegerField(default=0)
+    # bit index in CourseProgress.completed, never reused within a course
+    progress_index = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    # written in bulk by courses.counters, never through save()
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
+    play_count = models.PositiveBigIntegerField(default=0, editable=False)
     class Meta:
         ordering = ['order', '-updated']
+        indexes = [
+            # the admin's lesson list order
+            models.Index(fields=['course', 'order'], name='lesson_course_order_idx'),
+        ]
+        constraints = [
+            # two lessons on one index would share a completion bit
+            models.UniqueConstraint(fields=['course', 'progress_index'], name='unique_lesson_progress_index'),
+        ]
+
+    def __str__(self):
+        return self.title
     
     def save(self, *args, **kwargs):
         # before save
+        helpers.cloudinary_init() # uploads happen in pre_save
         if self.public_id == "" or self.public_id is None:
             self.public_id = generate_public_id(self)
-        super().save(*args, **kwargs)
+        image_changed = has_field_changed(self, 'thumbnail') or has_field_changed(self, 'video')
+        if image_changed:
+            self.placeholder = ""
+        if self.progress_index is None:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                self.progress_index = get_next_progress_index(self.course_id)
+                super().save(*args, **kwargs)
+        else:
+            super().save(*args, **kwargs)
         # after save
+        if image_changed:
+            generate_placeholder_later(self)
+        bump_catalog_version()
+        purge_lesson(self)
+
+    def get_placeholder(self):
+        # thumbnail first, otherwise a frame of the video (same as get_thumbnail)
+        if self.thumbnail:
+            return helpers.get_image_placeholder_data_uri(self, field_name='thumbnail')
+        if self.video:
+            return helpers.get_image_placeholder_data_uri(self, field_name='video', format='jpg')
+        return ""
+
+    def update_placeholder(self):
+        self.placeholder = self.get_placeholder()
+        Lesson.objects.filter(pk=self.pk).update(placeholder=self.placeholder)
     
     def get_absolute_url(self):
         return self.path
@@ -251,7 +356,8 @@ class Lesson(models.Model):
         return helpers.get_responsive_image_srcset(
             self,
             field_name=field,
-            base_width=382
+            base_width=382,
+            format='jpg' if field == 'video' else None
         )
     
     def get_video_poster(self):
@@ -264,6 +370,18 @@ class Lesson(models.Model):
             time_offset=0
         )
     
+    def get_video_embed(self, width=1250):
+        """Returns the player embed using this lesson's delivery mode"""
+        if not self.video:
+            return None
+        return helpers.get_cloudinary_video_object(
+            self,
+            field_name='video',
+            as_html=True,
+            width=width,
+            delivery=self.video_delivery
+        )
+
     def get_mobile_video(self):
         """Returns mobile-optimized video player"""
         if not self.video:
@@ -272,4 +390,31 @@ class Lesson(models.Model):
             self,
             field_name='video',
             network_quality='auto'
-        )
\ No newline at end of file
+        )
+
+
+class CourseProgress(models.Model):
+    """
+    Completed lessons of one verified email in one course, as a bitmap
+    indexed by Lesson.progress_index (see courses.progress).
+    """
+    email = models.ForeignKey("emails.Email", on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    completed = models.BinaryField(default=b"")
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["email", "course"], name="unique_course_progress"),
+        ]
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+def catalog_post_delete(sender, instance, *args, **kwargs):
+    # signals also cover queryset and cascade deletes
+    bump_catalog_version()
+    if sender is Course:
+        purge_course(instance)
+    else:
+        purge_lesson(instance)
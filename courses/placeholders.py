@@ -0,0 +1,51 @@
+"""
+Blur-up placeholders fetched after the save that changed an image.
+
+Fetching one means a round trip to Cloudinary (up to
+PLACEHOLDER_FETCH_TIMEOUT seconds), so Course/Lesson saves only clear the
+old placeholder and leave the fetch to a daemon thread started once the
+transaction commits. A placeholder lost with its worker stays "" until
+`python manage.py generate_placeholders` fills in the missing ones.
+"""
+import logging
+import threading
+
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+
+from .catalog import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+
+def update_placeholder(model, pk):
+    # on the primary, a replica may not have the new image yet
+    obj = model.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).first()
+    if obj is None:
+        return
+    obj.update_placeholder()
+    # the cards are built from the catalog snapshot
+    bump_catalog_version()
+
+
+def _run_update_placeholder(model, pk):
+    try:
+        update_placeholder(model, pk)
+    except Exception:
+        logger.exception("Generating the placeholder for %s %s failed", model.__name__, pk)
+    finally:
+        # no request cycle closes this thread's connection
+        connection.close()
+
+
+def start_in_background(model, pk):
+    threading.Thread(
+        target=_run_update_placeholder,
+        args=(model, pk),
+        name="placeholder",
+        daemon=True,
+    ).start()
+
+
+def generate_placeholder_later(obj):
+    model, pk = type(obj), obj.pk
+    transaction.on_commit(lambda: start_in_background(model, pk))
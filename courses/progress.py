@@ -0,0 +1,29 @@
+"""
+Per-learner lesson completion stored as one bitmap per (email, course).
+
+Bit n is Lesson.progress_index n, which is assigned once when the lesson is
+created and never reused, so reordering lessons keeps everyone's progress.
+A course with 1000 lessons needs 125 bytes.
+"""
+
+
+def set_bit(bitmap, index):
+    bitmap = bytearray(bitmap or b"")
+    byte_index, bit = divmod(index, 8)
+    if len(bitmap) <= byte_index:
+        bitmap.extend(b"\x00" * (byte_index + 1 - len(bitmap)))
+    bitmap[byte_index] |= 1 << bit
+    return bytes(bitmap)
+
+
+def has_bit(bitmap, index):
+    if not bitmap or index is None:
+        return False
+    byte_index, bit = divmod(index, 8)
+    if byte_index >= len(bitmap):
+        return False
+    return bool(bitmap[byte_index] & (1 << bit))
+
+
+def count_bits(bitmap):
+    return sum(bin(byte).count("1") for byte in bytes(bitmap or b""))
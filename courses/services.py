@@ -1,46 +1,219 @@
 #from django.db.models import Q # no longer use Q to filter
-from .models import Course, Lesson, PublishStatus
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
 
+import helpers
+from . import cards
+from .catalog import COURSE_FIELDS, LESSON_FIELDS, get_catalog
+from .counters import get_course_popularity, lesson_counters
+from .models import Course, CourseProgress, Lesson, PublishStatus, VideoDelivery
+from .progress import has_bit, set_bit
 
-def get_publish_courses():
-    return Course.objects.filter(status=PublishStatus.PUBLISHED)
+COURSE_ORDERINGS = ("popular",)
+
+
+# the snapshot rows are shared by every thread, pages get their own instances
+def course_from_row(row):
+    return Course.from_db(DEFAULT_DB_ALIAS, COURSE_FIELDS, row[:len(COURSE_FIELDS)])
+
+
+def lesson_from_row(row, course_obj):
+    lesson = Lesson.from_db(DEFAULT_DB_ALIAS, LESSON_FIELDS, row[:len(LESSON_FIELDS)])
+    lesson.course = course_obj
+    return lesson
+
+
+def get_publish_courses(order=None):
+    courses = get_catalog().courses
+    if order == "popular":
+        popularity = get_course_popularity()
+        # sorted() is stable, ties keep the catalog order
+        courses = tuple(sorted(
+            courses,
+            key=lambda course: popularity.get(course.id, 0),
+            reverse=True
+        ))
+    return courses
+
+def get_course_cards(order=None):
+    return cards.get_course_cards(get_publish_courses(order=order))
 
 def get_course_detail(course_id=None):
     if course_id is None:
         return None
-    obj = None
-    try:
-        obj = Course.objects.get(
-            status=PublishStatus.PUBLISHED,
-            public_id=course_id
-        )
-    except:
-        pass
-    return obj
+    entry = get_catalog().courses_by_id.get(course_id)
+    if entry is None:
+        return None
+    return course_from_row(entry.course)
 
 def get_course_lessons(course_obj=None):
-    lessons = Lesson.objects.none()
+    lessons = ()
     if not isinstance(course_obj, Course):
         return lessons
-    lessons = course_obj.lesson_set.filter(
-        course__status=PublishStatus.PUBLISHED,
-        status__in=[PublishStatus.PUBLISHED, PublishStatus.COMING_SOON]
-    )
-    return lessons
+    entry = get_catalog().courses_by_id.get(course_obj.public_id)
+    if entry is None:
+        return lessons
+    return tuple(lesson_from_row(row, course_obj) for row in entry.lessons)
+
+
+def get_course_lesson_cards(course_obj=None):
+    if not isinstance(course_obj, Course):
+        return ()
+    return cards.get_lesson_cards(course_obj)
 
 
 def get_lesson_detail(course_id=None, lesson_id=None):
     if lesson_id is None and course_id is None:
         return None
-    obj = None
-    try:
-        obj = Lesson.objects.get(
-            course__public_id=course_id,
-            course__status=PublishStatus.PUBLISHED,
-            status__in=[PublishStatus.PUBLISHED, PublishStatus.COMING_SOON],
-            public_id=lesson_id
+    entry = get_catalog().courses_by_id.get(course_id)
+    if entry is None:
+        return None
+    row = entry.lessons_by_id.get(lesson_id)
+    if row is None:
+        return None
+    return lesson_from_row(row, course_from_row(entry.course))
+
+
+def get_lesson_neighbors(lesson_obj=None):
+    """
+    Returns (lessons, previous_lesson, next_lesson) from the course's ordered
+    lessons. Coming soon lessons are listed but skipped as neighbors.
+    """
+    if not isinstance(lesson_obj, Lesson):
+        return (), None, None
+    lessons = get_course_lessons(lesson_obj.course)
+    playable = [
+        lesson for lesson in lessons
+        if lesson.id == lesson_obj.id or not lesson.is_coming_soon
+    ]
+    previous_lesson = None
+    next_lesson = None
+    for index, lesson in enumerate(playable):
+        if lesson.id != lesson_obj.id:
+            continue
+        if index > 0:
+            previous_lesson = playable[index - 1]
+        if index + 1 < len(playable):
+            next_lesson = playable[index + 1]
+        break
+    return lessons, previous_lesson, next_lesson
+
+
+def get_lesson_poster_url(lesson_obj=None):
+    if not isinstance(lesson_obj, Lesson):
+        return None
+    return lesson_obj.get_video_poster() or lesson_obj.get_thumbnail()
+
+
+def get_lesson_link_hints(next_lesson=None, poster_url=None):
+    """
+    Link header values (also valid for 103 Early Hints) for the lesson page:
+    warm the Cloudinary connection and prefetch the next lesson and its poster.
+    """
+    hints = [
+        "<https://res.cloudinary.com>; rel=preconnect; crossorigin",
+    ]
+    if next_lesson is None:
+        return hints
+    hints.append(f"<{next_lesson.path}/>; rel=prefetch; as=document")
+    if poster_url:
+        hints.append(f"<{poster_url}>; rel=prefetch; as=image")
+    return hints
+
+
+def get_lesson_video_urls(course_obj=None, lesson_ids=None, width=1250):
+    """
+    Signed video urls for a course's playable lessons, keyed by lesson public_id.
+    Uses the same options as the lesson page embed so the two share cache entries.
+    """
+    if not isinstance(course_obj, Course):
+        return {}
+    lessons = [
+        lesson for lesson in get_course_lessons(course_obj)
+        if lesson.status == PublishStatus.PUBLISHED and lesson.video
+    ]
+    if lesson_ids is not None:
+        lessons = [lesson for lesson in lessons if lesson.public_id in lesson_ids]
+    progressive = []
+    urls = {}
+    for lesson in lessons:
+        if lesson.video_delivery == VideoDelivery.PROGRESSIVE:
+            progressive.append(lesson)
+            continue
+        urls[lesson.public_id] = helpers.get_cloudinary_video_manifest_url(
+            lesson,
+            field_name='video',
+            delivery=lesson.video_delivery
         )
-    except Exception as e:
-        print("lesson detail", e)
-        pass
-    return obj
\ No newline at end of file
+    urls.update(helpers.get_cloudinary_signed_video_urls(
+        progressive,
+        field_name='video',
+        width=width
+    ))
+    return urls
+
+
+def record_lesson_view(lesson_obj=None):
+    if isinstance(lesson_obj, Lesson):
+        lesson_counters.record_view(lesson_obj.id)
+
+
+def record_lesson_play(lesson_obj=None):
+    if isinstance(lesson_obj, Lesson) and lesson_obj.has_video:
+        lesson_counters.record_play(lesson_obj.id)
+
+
+def get_course_progress(email_id=None, course_obj=None):
+    """
+    Progress of a verified email through a course from its single bitmap row:
+    completed lesson ids, counts and the lesson to continue with.
+    """
+    if not email_id or not isinstance(course_obj, Course):
+        return None
+    bitmap = CourseProgress.objects.filter(
+        email_id=email_id,
+        course_id=course_obj.id
+    ).values_list('completed', flat=True).first()
+    bitmap = bytes(bitmap or b"")
+    playable = [
+        lesson for lesson in get_course_lessons(course_obj)
+        if not lesson.is_coming_soon
+    ]
+    completed_ids = {
+        lesson.id for lesson in playable
+        if has_bit(bitmap, lesson.progress_index)
+    }
+    continue_lesson = None
+    if completed_ids:
+        continue_lesson = next(
+            (lesson for lesson in playable if lesson.id not in completed_ids),
+            None
+        )
+    total = len(playable)
+    return {
+        "completed_ids": completed_ids,
+        "completed": len(completed_ids),
+        "total": total,
+        "percent": round(100 * len(completed_ids) / total) if total else 0,
+        "continue_lesson": continue_lesson,
+    }
+
+
+def mark_lesson_complete(email_id=None, lesson_obj=None):
+    if not email_id or not isinstance(lesson_obj, Lesson):
+        return False
+    if lesson_obj.progress_index is None or lesson_obj.is_coming_soon:
+        return False
+    try:
+        with transaction.atomic():
+            progress, _ = CourseProgress.objects.select_for_update().get_or_create(
+                email_id=email_id,
+                course_id=lesson_obj.course_id
+            )
+            completed = set_bit(bytes(progress.completed), lesson_obj.progress_index)
+            if completed != bytes(progress.completed):
+                progress.completed = completed
+                progress.save(update_fields=['completed', 'updated'])
+    except IntegrityError:
+        # email deleted since it was put in the session
+        return False
+    return True
@@ -0,0 +1,181 @@
+"""
+sitemap.xml (an index of shards) and RSS/Atom feeds of the published catalog.
+
+Everything is built from the catalog snapshot, so no SQL. Entries are split
+into shards once per catalog version and the rendered bytes are cached:
+shards by a digest of their entries, the index by the shard digests and
+feeds per catalog version. A catalog change therefore only re-renders the
+index and the shards whose urls or lastmod values actually changed.
+"""
+import hashlib
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+
+from .catalog import get_catalog
+from .models import PublishStatus
+
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_ITEMS = 50
+
+SitemapEntry = namedtuple('SitemapEntry', ['location', 'lastmod'])
+RenderedDocument = namedtuple('RenderedDocument', ['content', 'etag', 'last_modified'])
+
+
+def absolute_url(path):
+    if not path.endswith("/"):
+        path = f"{path}/"
+    return f"{settings.BASE_URL}{path}"
+
+
+def get_sitemap_entries():
+    """Courses then their published lessons, in catalog order."""
+    catalog = get_catalog()
+    entries = []
+    for course in catalog.courses:
+        lessons = [
+            lesson for lesson in catalog.courses_by_id[course.public_id].lessons
+            if lesson.status == PublishStatus.PUBLISHED
+        ]
+        # the course page lists its lessons, so it changes with them
+        lastmod = max([course.updated, *[lesson.updated for lesson in lessons]])
+        entries.append(SitemapEntry(absolute_url(course.path), lastmod))
+        entries.extend(
+            SitemapEntry(absolute_url(lesson.path), lesson.updated)
+            for lesson in lessons
+        )
+    return entries
+
+
+SitemapShard = namedtuple('SitemapShard', ['entries', 'digest', 'lastmod'])
+
+# (catalog version, shard size, shards) of the last build in this process
+_shards = None
+
+
+def get_sitemap_shards():
+    global _shards
+    version = get_catalog().version
+    size = settings.SITEMAP_SHARD_SIZE
+    built = _shards
+    if built is not None and built[:2] == (version, size):
+        return built[2]
+    entries = get_sitemap_entries()
+    shards = []
+    for start in range(0, max(len(entries), 1), size):
+        shard_entries = entries[start:start + size]
+        shards.append(SitemapShard(
+            entries=shard_entries,
+            digest=_digest(*(f"{entry.location} {entry.lastmod.isoformat()}" for entry in shard_entries)),
+            lastmod=max((entry.lastmod for entry in shard_entries), default=None),
+        ))
+    _shards = (version, size, shards)
+    return shards
+
+
+def _digest(*parts):
+    return hashlib.md5("\n".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+def _render_cached(key, etag, last_modified, render):
+    content = cache.get(key)
+    if content is None:
+        content = render()
+        cache.set(key, content, SITEMAP_CACHE_TIMEOUT)
+    return RenderedDocument(content, etag, last_modified)
+
+
+def render_urlset(entries):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for entry in entries:
+        lines.append(
+            f"<url><loc>{escape(entry.location)}</loc>"
+            f"<lastmod>{entry.lastmod.isoformat(timespec='seconds')}</lastmod></url>"
+        )
+    lines.append("</urlset>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def get_sitemap_shard(number):
+    """Shard number starts at 1, None past the last one."""
+    shards = get_sitemap_shards()
+    if not 1 <= number <= len(shards):
+        return None
+    shard = shards[number - 1]
+    return _render_cached(
+        f"sitemap:shard:{shard.digest}",
+        shard.digest,
+        shard.lastmod,
+        lambda: render_urlset(shard.entries),
+    )
+
+
+def get_sitemap_index():
+    shards = get_sitemap_shards()
+    digest = _digest(settings.BASE_URL, *(shard.digest for shard in shards))
+
+    def render():
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+        ]
+        for number, shard in enumerate(shards, start=1):
+            line = f"<sitemap><loc>{escape(settings.BASE_URL)}/sitemap-{number}.xml</loc>"
+            if shard.lastmod is not None:
+                line += f"<lastmod>{shard.lastmod.isoformat(timespec='seconds')}</lastmod>"
+            lines.append(f"{line}</sitemap>")
+        lines.append("</sitemapindex>")
+        return "\n".join(lines).encode("utf-8")
+
+    return _render_cached(
+        f"sitemap:index:{digest}",
+        digest,
+        max((shard.lastmod for shard in shards if shard.lastmod), default=None),
+        render,
+    )
+
+
+FEED_TYPES = {
+    "rss": Rss201rev2Feed,
+    "atom": Atom1Feed,
+}
+
+
+def get_course_feed(feed_type="rss"):
+    """Newest published courses, cached per catalog version."""
+    catalog = get_catalog()
+    feed_class = FEED_TYPES[feed_type]
+    courses = sorted(catalog.courses, key=lambda course: course.timestamp, reverse=True)[:FEED_ITEMS]
+    last_modified = max((course.updated for course in courses), default=None)
+
+    def render():
+        feed = feed_class(
+            title="CourseHub courses",
+            link=absolute_url("/courses/"),
+            description="New and updated courses on CourseHub",
+            feed_url=f"{settings.BASE_URL}/feeds/courses.{feed_type}",
+            language=settings.LANGUAGE_CODE,
+        )
+        for course in courses:
+            feed.add_item(
+                title=course.title,
+                link=absolute_url(course.path),
+                description=course.description or "",
+                unique_id=absolute_url(course.path),
+                pubdate=course.timestamp,
+                updateddate=course.updated,
+            )
+        return feed.writeString("utf-8").encode("utf-8")
+
+    return _render_cached(
+        f"feeds:courses:{feed_type}:{catalog.version}",
+        _digest(feed_type, catalog.version),
+        last_modified,
+        render,
+    )
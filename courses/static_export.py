@@ -0,0 +1,136 @@
+"""
+Static export of the anonymous course list and course detail pages.
+
+export_static_catalog renders courses/list.html to <root>/courses/index.html
+and each courses/detail.html to <root>/courses/<public_id>/index.html, for
+nginx to serve with try_files (see nginx/conf.d). A manifest next to the
+pages keeps a fingerprint of every exported course, so a rebuild only
+re-renders courses whose row or lessons changed, plus the list page when
+anything did. Every file is written to a temporary name and swapped in
+with os.replace, so nginx never serves a half-written page.
+
+Pages are what an anonymous visitor without a session gets: no progress,
+no CSRF token (nothing on them posts). nginx only serves them to plain GETs
+without a session cookie, query string or HX-Request header.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpRequest
+from django.template.loader import render_to_string
+
+from .cache_tags import SHARED_CONTEXT
+from .cards import get_course_cards, get_lesson_cards
+from .catalog import get_catalog
+from .services import course_from_row
+
+MANIFEST_NAME = ".manifest.json"
+PAGE_NAME = "index.html"
+
+ExportResult = namedtuple('ExportResult', ['rendered', 'unchanged', 'removed', 'list_rendered'])
+
+
+def get_course_fingerprint(entry):
+    """Changes whenever the detail page would: the course row or any of its lessons."""
+    parts = [entry.course.updated.isoformat()]
+    parts.extend(f"{lesson.id}:{lesson.updated.isoformat()}" for lesson in entry.lessons)
+    return hashlib.md5("\n".join(parts).encode()).hexdigest()
+
+
+def get_anonymous_request(path):
+    request = HttpRequest()
+    request.method = "GET"
+    request.path = request.path_info = path
+    request.session = {}
+    return request
+
+
+def render_page(template_name, context, path):
+    # no CSRF token, one baked into a shared file would be wrong for every
+    # visitor but one
+    return render_to_string(
+        template_name,
+        {**context, **SHARED_CONTEXT},
+        get_anonymous_request(path)
+    )
+
+
+def write_atomic(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            tmp.write(content)
+        # mkstemp creates 0600, nginx runs as another user
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_manifest(root):
+    try:
+        return json.loads((root / MANIFEST_NAME).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def get_course_page_path(root, public_id):
+    return root / "courses" / public_id / PAGE_NAME
+
+
+def export_static_catalog(root=None, force=False):
+    root = Path(root or settings.STATIC_CATALOG_ROOT)
+    catalog = get_catalog()
+    old_manifest = {} if force else read_manifest(root)
+    old_courses = old_manifest.get("courses", {})
+    courses = {}
+    rendered = unchanged = 0
+
+    for course in catalog.courses:
+        entry = catalog.courses_by_id[course.public_id]
+        fingerprint = get_course_fingerprint(entry)
+        courses[course.public_id] = fingerprint
+        page_path = get_course_page_path(root, course.public_id)
+        if old_courses.get(course.public_id) == fingerprint and page_path.exists():
+            unchanged += 1
+            continue
+        content = render_page(
+            "courses/detail.html",
+            {
+                "object": course_from_row(course),
+                "lessons_queryset": get_lesson_cards(course),
+                "progress": None,
+                "completed_lesson_ids": (),
+            },
+            path=f"{course.path}/"
+        )
+        write_atomic(page_path, content)
+        rendered += 1
+
+    # unpublished or deleted since the last export, fall back to Django (404)
+    removed = 0
+    for public_id in set(old_courses) - set(courses):
+        shutil.rmtree(get_course_page_path(root, public_id).parent, ignore_errors=True)
+        removed += 1
+
+    list_path = root / "courses" / PAGE_NAME
+    list_rendered = courses != old_courses or not list_path.exists()
+    if list_rendered:
+        content = render_page(
+            "courses/list.html",
+            {"object_list": get_course_cards(catalog.courses), "order": None},
+            path="/courses/"
+        )
+        write_atomic(list_path, content)
+
+    # last, so an interrupted export re-renders whatever it didn't finish
+    write_atomic(root / MANIFEST_NAME, json.dumps({"courses": courses}, indent=1, sort_keys=True))
+    return ExportResult(rendered, unchanged, removed, list_rendered)
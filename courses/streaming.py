@@ -0,0 +1,33 @@
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+
+STREAM_MARKER = "<!--stream-cards-->"
+CARD_TEMPLATE_NAME = "courses/snippets/card.html"
+
+
+def stream_list_display(request, template_name, context, object_list, chunk_size=24, card_context=None):
+    """
+    Renders template_name around an empty list-display, sends everything up
+    to the cards right away, then the cards in chunks and finally the rest
+    of the page. Peak memory stays at one chunk of cards.
+    card_context is passed to every card next to the object.
+    """
+    card_context = card_context or {}
+    context = {**context, "stream_marker": STREAM_MARKER}
+    page = render_to_string(template_name, context, request)
+    head, tail = page.split(STREAM_MARKER, 1)
+    card_template = get_template(CARD_TEMPLATE_NAME)
+
+    def render_cards():
+        yield head
+        chunk = []
+        for obj in object_list:
+            chunk.append(card_template.render({"object": obj, **card_context}))
+            if len(chunk) >= chunk_size:
+                yield "".join(chunk)
+                chunk = []
+        if chunk:
+            yield "".join(chunk)
+        yield tail
+
+    return StreamingHttpResponse(render_cards(), content_type="text/html; charset=utf-8")
@@ -0,0 +1,25 @@
+from django import template
+from django.template.backends.django import Template as DjangoTemplate
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def include_snippet(context, template_name, **kwargs):
+    """
+    {% include %} through the engine list instead of the Django engine
+    only, so with COURSES_JINJA2_TEMPLATES the Jinja2 card list renders
+    inside the Django list and detail pages.
+    {% include_snippet 'courses/snippets/list-display.html' queryset=object_list %}
+    """
+    snippet = get_template(template_name)
+    if isinstance(snippet, DjangoTemplate):
+        # what {% include ... with %} does
+        with context.push(**kwargs):
+            return snippet.template.render(context)
+    values = context.flatten()
+    values.update(kwargs)
+    # the Jinja2 backend returns a plain str
+    return mark_safe(snippet.render(values, context.get("request")))
@@ -0,0 +1,20 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag("courses/snippets/responsive-image.html")
+def responsive_image(image, alt="", sizes=None, css_class="", eager=False):
+    """
+    Renders a <picture> with AVIF/WebP sources from a
+    get_responsive_thumbnail() dict.
+    {% responsive_image object.get_responsive_thumbnail alt=object.title %}
+    """
+    image = image or {}
+    return {
+        "image": image,
+        "alt": alt,
+        "sizes": sizes or image.get("sizes", ""),
+        "css_class": css_class,
+        "eager": eager,
+    }
@@ -1,3 +1,1201 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import cloudinary
+from cloudinary import CloudinaryResource
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.template import Context, Template
+from django.template.backends.jinja2 import Template as Jinja2Template
+from django.template.loader import get_template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+import helpers
+from courses import api, services, sitemaps, static_export
+from courses.catalog import CATALOG_VERSION_KEY, check_shared_cache, get_catalog
+from courses import counters, placeholders
+from courses.counters import lesson_counters
+from courses.placeholders import start_in_background
+from courses.management.commands.profile_startup import parse_importtime
+from courses.models import AccessRequirement, Course, CourseProgress, Lesson, PublishStatus, VideoDelivery
+from courses.progress import count_bits, has_bit, set_bit
+from emails.models import Email
+from home.pagination import EstimatedCountPaginator
+from home.testing import AdminChangelistTestMixin
+from home.proxy_cache import LocMemPurger
+
+
+def make_stub_image(width=50, height=28, color=(200, 40, 40)):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class CloudinaryTestMixin:
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # placeholders are generated from a local stub instead of Cloudinary
+        patcher = mock.patch(
+            "helpers._cloudinary.placeholders.fetch_placeholder_source",
+            return_value=make_stub_image()
+        )
+        self.fetch_placeholder_source = patcher.start()
+        self.addCleanup(patcher.stop)
+        # and after commit in the test's thread instead of a background one
+        patcher = mock.patch(
+            "courses.placeholders.start_in_background",
+            side_effect=placeholders.update_placeholder
+        )
+        self.start_in_background = patcher.start()
+        self.addCleanup(patcher.stop)
+        # lesson views are flushed explicitly, no background thread in tests,
+        # and nothing is left buffered for the exit flush once the test
+        # database is gone
+        patcher = mock.patch.object(lesson_counters, "ensure_flusher")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        lesson_counters.drain()
+        self.addCleanup(lesson_counters.drain)
+        helpers.cloudinary_init()
+        cloudinary.config(
+            cloud_name="test-cloud",
+            api_key="test-key",
+            api_secret="test-secret",
+            secure=True
+        )
+        self.course = Course.objects.create(
+            title="Test Course",
+            status=PublishStatus.PUBLISHED
+        )
+
+    def make_video(self, public_id="courses/test-course/lessons/intro"):
+        return CloudinaryResource(
+            public_id,
+            format="mp4",
+            resource_type="video",
+            type="private"
+        )
+
+
+class AdaptiveVideoDeliveryTest(CloudinaryTestMixin, TestCase):
+    def test_progressive_is_default(self):
+        lesson = Lesson.objects.create(course=self.course, title="Intro")
+        self.assertEqual(lesson.video_delivery, VideoDelivery.PROGRESSIVE)
+        lesson.video = self.make_video()
+        url = helpers.get_cloudinary_video_object(lesson, delivery=lesson.video_delivery)
+        self.assertTrue(url.endswith(".mp4"))
+        self.assertIn("/s--", url)
+
+    def test_hls_manifest_is_signed(self):
+        lesson = Lesson(course=self.course, title="Intro", video=self.make_video())
+        url = helpers.get_cloudinary_video_manifest_url(lesson, delivery=VideoDelivery.HLS)
+        self.assertTrue(url.endswith(".m3u8"))
+        self.assertIn("sp_hd", url)
+        self.assertIn("/s--", url)
+
+    def test_dash_manifest(self):
+        lesson = Lesson(course=self.course, title="Intro", video=self.make_video())
+        url = helpers.get_cloudinary_video_manifest_url(lesson, delivery=VideoDelivery.DASH)
+        self.assertTrue(url.endswith(".mpd"))
+
+    def test_manifest_is_cached(self):
+        lesson = Lesson(course=self.course, title="Intro", video=self.make_video())
+        first = helpers.get_cloudinary_video_manifest_url(lesson, delivery="hls")
+        cloudinary.config(api_secret="rotated-secret")
+        second = helpers.get_cloudinary_video_manifest_url(lesson, delivery="hls")
+        self.assertEqual(first, second)
+
+    def test_embed_starts_low(self):
+        lesson = Lesson(
+            course=self.course,
+            title="Intro",
+            video=self.make_video(),
+            video_delivery=VideoDelivery.HLS
+        )
+        html = lesson.get_video_embed()
+        self.assertIn('data-delivery="hls"', html)
+        self.assertIn('data-initial-bandwidth="500000"', html)
+
+
+class SignedVideoUrlTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lessons = [
+            Lesson.objects.create(
+                course=self.course,
+                title=f"Lesson {i}",
+                video=self.make_video(f"courses/test-course/lessons/{i}"),
+                order=i
+            )
+            for i in range(3)
+        ]
+
+    def test_batch_signs_every_lesson(self):
+        urls = helpers.get_cloudinary_signed_video_urls(self.lessons, width=1250)
+        self.assertEqual(set(urls), {lesson.public_id for lesson in self.lessons})
+        for lesson in self.lessons:
+            self.assertEqual(urls[lesson.public_id], helpers.get_cloudinary_video_object(lesson, width=1250))
+
+    def test_batch_shares_cache_with_embed(self):
+        helpers.get_cloudinary_signed_video_urls(self.lessons, width=1250)
+        cloudinary.config(api_secret="rotated-secret")
+        lesson = self.lessons[0]
+        embed_url = helpers.get_cloudinary_video_object(lesson, width=1250)
+        urls = helpers.get_cloudinary_signed_video_urls([lesson], width=1250)
+        self.assertEqual(embed_url, urls[lesson.public_id])
+
+    def test_video_urls_endpoint_requires_email(self):
+        response = self.client.get(f"{self.course.path}/video-urls/")
+        self.assertEqual(response.status_code, 403)
+
+    def test_video_urls_endpoint(self):
+        session = self.client.session
+        session['email_id'] = "1"
+        session.save()
+        next_lesson = self.lessons[1]
+        response = self.client.get(
+            f"{self.course.path}/video-urls/",
+            {"lesson": next_lesson.public_id}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(list(data), [next_lesson.public_id])
+
+
+class LessonNeighborsTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = Lesson.objects.create(course=self.course, title="First", order=1)
+        self.soon = Lesson.objects.create(
+            course=self.course,
+            title="Soon",
+            order=2,
+            status=PublishStatus.COMING_SOON
+        )
+        self.last = Lesson.objects.create(
+            course=self.course,
+            title="Last",
+            order=3,
+            video=self.make_video()
+        )
+
+    def test_neighbors_skip_coming_soon(self):
+        lessons, previous_lesson, next_lesson = services.get_lesson_neighbors(self.first)
+        self.assertEqual(len(lessons), 3)
+        self.assertIsNone(previous_lesson)
+        self.assertEqual(next_lesson, self.last)
+
+    def test_neighbors_without_queries(self):
+        lesson = services.get_lesson_detail(
+            course_id=self.course.public_id,
+            lesson_id=self.last.public_id
+        )
+        with self.assertNumQueries(0):
+            lessons, previous_lesson, next_lesson = services.get_lesson_neighbors(lesson)
+            [item.path for item in lessons]
+        self.assertEqual(previous_lesson, self.first)
+        self.assertIsNone(next_lesson)
+
+    def test_lesson_page_link_hints(self):
+        self.course.access = "any"
+        self.course.save()
+        response = self.client.get(f"{self.first.path}/")
+        link = response['Link']
+        self.assertIn("rel=preconnect", link)
+        self.assertIn(f"<{self.last.path}/>; rel=prefetch", link)
+        self.assertIn("as=image", link)
+        self.assertContains(response, 'rel="prefetch"')
+
+
+class ResponsiveImageTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course.image = CloudinaryResource(
+            "courses/test-course",
+            format="png",
+            resource_type="image",
+            type="upload"
+        )
+        self.course.save()
+
+    def test_breakpoints_are_shared(self):
+        self.assertIs(
+            helpers.get_responsive_image_breakpoints(),
+            helpers.get_responsive_image_breakpoints()
+        )
+
+    def test_srcset_has_modern_sources(self):
+        image = self.course.get_responsive_thumbnail()
+        self.assertEqual(image['srcset'].count("w,"), 4)
+        self.assertEqual(
+            [source['type'] for source in image['sources']],
+            ["image/avif", "image/webp"]
+        )
+        self.assertIn("f_avif", image['sources'][0]['srcset'])
+
+    def test_srcset_is_cached(self):
+        first = self.course.get_responsive_thumbnail()
+        cloudinary.config(cloud_name="other-cloud")
+        self.assertEqual(first, self.course.get_responsive_thumbnail())
+
+    def test_course_list_renders_picture(self):
+        response = self.client.get("/courses/")
+        self.assertContains(response, "<picture>")
+        self.assertContains(response, 'type="image/avif"')
+        self.assertContains(response, 'sizes="(max-width: 640px) 100vw')
+
+
+class ImagePlaceholderTest(CloudinaryTestMixin, TestCase):
+    def make_image(self, public_id="courses/test-course"):
+        return CloudinaryResource(
+            public_id,
+            format="png",
+            resource_type="image",
+            type="upload"
+        )
+
+    def save_and_commit(self, obj):
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        obj.refresh_from_db()
+
+    def test_placeholder_is_tiny_data_uri(self):
+        self.course.image = self.make_image()
+        self.save_and_commit(self.course)
+        self.assertTrue(self.course.placeholder.startswith("data:image/jpeg;base64,"))
+        self.assertLess(len(self.course.placeholder), 1024)
+
+    def test_save_does_not_fetch(self):
+        self.course.image = self.make_image()
+        self.save_and_commit(self.course)
+        self.course.image = self.make_image("courses/new-image")
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.course.save()
+        # the old image's placeholder is gone, the new one comes after commit
+        self.assertEqual(self.fetch_placeholder_source.call_count, 1)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.placeholder, "")
+        for callback in callbacks:
+            callback()
+        self.start_in_background.assert_called_with(Course, self.course.pk)
+        self.assertEqual(self.fetch_placeholder_source.call_count, 2)
+
+    def test_fetch_runs_in_a_daemon_thread(self):
+        with mock.patch("courses.placeholders.threading.Thread") as thread:
+            start_in_background(Course, self.course.pk)
+        thread.assert_called_once_with(
+            target=placeholders._run_update_placeholder,
+            args=(Course, self.course.pk),
+            name="placeholder",
+            daemon=True,
+        )
+        thread.return_value.start.assert_called_once_with()
+
+    def test_placeholder_only_regenerated_on_image_change(self):
+        self.course.image = self.make_image()
+        self.save_and_commit(self.course)
+        self.course.title = "Renamed"
+        self.save_and_commit(self.course)
+        self.assertEqual(self.fetch_placeholder_source.call_count, 1)
+        self.assertTrue(self.course.placeholder)
+        self.course.image = self.make_image("courses/new-image")
+        self.save_and_commit(self.course)
+        self.assertEqual(self.fetch_placeholder_source.call_count, 2)
+
+    def test_lesson_placeholder_from_video(self):
+        lesson = Lesson(
+            course=self.course,
+            title="Intro",
+            video=self.make_video()
+        )
+        self.save_and_commit(lesson)
+        self.assertTrue(lesson.placeholder.startswith("data:image/jpeg;base64,"))
+        url = self.fetch_placeholder_source.call_args[0][0]
+        self.assertTrue(url.endswith(".jpg"))
+
+    def test_fetch_failure_keeps_save_working(self):
+        self.fetch_placeholder_source.side_effect = OSError("offline")
+        self.course.image = self.make_image()
+        with self.assertLogs("helpers._cloudinary.placeholders", "WARNING"):
+            self.save_and_commit(self.course)
+        self.assertEqual(self.course.placeholder, "")
+
+    def test_background_failure_is_logged(self):
+        with mock.patch.object(Course, "update_placeholder", side_effect=RuntimeError), \
+                mock.patch("courses.placeholders.connection") as connection, \
+                self.assertLogs("courses.placeholders", "ERROR"):
+            placeholders._run_update_placeholder(Course, self.course.pk)
+        connection.close.assert_called_once_with()
+
+    def test_card_inlines_placeholder(self):
+        self.course.image = self.make_image()
+        self.save_and_commit(self.course)
+        response = self.client.get("/courses/")
+        self.assertContains(response, 'src="data:image/jpeg;base64,')
+
+    def test_command_fills_in_missing_placeholders_in_batches(self):
+        courses = [self.course] + [Course(title=f"Course {i}", image=self.make_image()) for i in range(4)]
+        self.course.image = self.make_image()
+        self.course.save()
+        Course.objects.bulk_create(courses[1:])
+        Course.objects.filter(pk=courses[1].pk).update(placeholder="data:image/jpeg;base64,kept")
+        with CaptureQueriesContext(connection) as queries:
+            call_command("generate_placeholders", "--batch-size", "2", stdout=StringIO())
+        updates = [q for q in queries if q["sql"].startswith('UPDATE "courses_course"')]
+        # 4 missing in 2 batches
+        self.assertEqual(self.fetch_placeholder_source.call_count, 4)
+        self.assertEqual(len(updates), 2)
+        placeholders_by_title = dict(Course.objects.values_list("title", "placeholder"))
+        self.assertEqual(placeholders_by_title["Course 0"], "data:image/jpeg;base64,kept")
+        self.assertTrue(all(placeholders_by_title.values()))
+        call_command("generate_placeholders", stdout=StringIO())
+        self.assertEqual(self.fetch_placeholder_source.call_count, 4)
+        call_command("generate_placeholders", "--all", stdout=StringIO())
+        self.assertEqual(self.fetch_placeholder_source.call_count, 9)
+
+
+class CatalogSnapshotTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lesson = Lesson.objects.create(course=self.course, title="Intro")
+        Course.objects.create(title="Draft Course")
+
+    def test_services_answer_without_sql(self):
+        services.get_publish_courses()
+        with self.assertNumQueries(0):
+            courses = services.get_publish_courses()
+            course = services.get_course_detail(course_id=self.course.public_id)
+            lessons = services.get_course_lessons(course)
+            lesson = services.get_lesson_detail(
+                course_id=self.course.public_id,
+                lesson_id=self.lesson.public_id
+            )
+            lesson.path
+        self.assertEqual([row.id for row in courses], [self.course.id])
+        self.assertEqual(courses[0].lesson_count, 1)
+        self.assertEqual(course, self.course)
+        self.assertEqual(list(lessons), [self.lesson])
+        self.assertEqual(lesson.path, self.lesson.path)
+
+    def test_snapshot_holds_rows_and_pages_get_their_own_instances(self):
+        catalog = get_catalog()
+        entry = catalog.courses_by_id[self.course.public_id]
+        self.assertIsInstance(entry.course, tuple)
+        self.assertIsInstance(entry.lessons[0], tuple)
+        first = services.get_course_detail(course_id=self.course.public_id)
+        second = services.get_course_detail(course_id=self.course.public_id)
+        self.assertIsNot(first, second)
+        first.title = "Changed by one request"
+        self.assertEqual(second.title, "Test Course")
+        self.assertEqual(catalog.courses_by_id[self.course.public_id].course.title, "Test Course")
+
+    def test_multi_worker_servers_need_a_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_shared_cache()
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}):
+            check_shared_cache()
+
+    def test_save_reloads_snapshot(self):
+        services.get_publish_courses()
+        self.course.title = "Renamed"
+        self.course.save()
+        course = services.get_course_detail(course_id=self.course.public_id)
+        self.assertEqual(course.title, "Renamed")
+        Lesson.objects.create(course=self.course, title="Second", order=1)
+        self.assertEqual(len(services.get_course_lessons(course)), 2)
+
+    def test_unpublish_and_delete_reload_snapshot(self):
+        services.get_publish_courses()
+        self.lesson.delete()
+        course = services.get_course_detail(course_id=self.course.public_id)
+        self.assertEqual(services.get_course_lessons(course), ())
+        self.course.status = PublishStatus.DRAFT
+        self.course.save()
+        self.assertIsNone(services.get_course_detail(course_id=self.course.public_id))
+
+    def test_other_worker_bump_reloads(self):
+        catalog = get_catalog()
+        cache.set(CATALOG_VERSION_KEY, "bumped-elsewhere")
+        self.assertIsNot(get_catalog(), catalog)
+
+
+class StreamingListTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(30):
+            Course.objects.create(title=f"Course {i}", status=PublishStatus.PUBLISHED)
+
+    def test_streamed_page_matches_rendered_page(self):
+        rendered = self.client.get("/courses/")
+        with self.settings(COURSES_STREAM_LISTS=True):
+            streamed = self.client.get("/courses/")
+        self.assertTrue(streamed.streaming)
+        chunks = list(streamed.streaming_content)
+        self.assertGreater(len(chunks), 2)
+        self.assertIn(b"</head>", chunks[0])
+        self.assertNotIn(b"<article", chunks[0])
+        body = b"".join(chunks).decode()
+        self.assertEqual(body.count("<article"), 31)
+        self.assertEqual(body.count("<article"), rendered.content.decode().count("<article"))
+        self.assertIn("ripple-animation", body.split("<article")[-1])
+
+    def test_detail_streams_lessons(self):
+        Lesson.objects.create(course=self.course, title="Intro")
+        with self.settings(COURSES_STREAM_LISTS=True):
+            response = self.client.get(f"{self.course.path}/")
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn("Intro", body)
+        self.assertIn("1 lesson available", body)
+
+
+class LessonCounterTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course.access = AccessRequirement.ANYONE
+        self.course.save()
+        self.lesson = Lesson.objects.create(
+            course=self.course,
+            title="Intro",
+            video=self.make_video()
+        )
+        self.other = Lesson.objects.create(course=self.course, title="Second", order=1)
+
+    def test_views_are_buffered_without_writes(self):
+        self.client.get(f"{self.lesson.path}/")
+        with self.assertNumQueries(0):
+            services.record_lesson_view(self.lesson)
+            services.record_lesson_play(self.lesson)
+        views, plays = lesson_counters.pending()
+        self.assertEqual(views, {self.lesson.id: 2})
+        self.assertEqual(plays, {self.lesson.id: 1})
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.view_count, 0)
+
+    def test_prefetches_are_not_views(self):
+        self.client.get(f"{self.lesson.path}/", HTTP_SEC_PURPOSE="prefetch")
+        self.client.get(f"{self.lesson.path}/", HTTP_PURPOSE="prefetch")
+        self.assertEqual(lesson_counters.pending(), ({}, {}))
+        self.client.get(f"{self.lesson.path}/")
+        self.assertEqual(lesson_counters.pending()[0], {self.lesson.id: 1})
+
+    def test_flusher_logs_failures_and_closes_its_connection(self):
+        services.record_lesson_view(self.lesson)
+        with mock.patch("courses.counters.time.sleep", side_effect=[None, SystemExit]), \
+                mock.patch("courses.counters.flush_lesson_counts", side_effect=RuntimeError), \
+                mock.patch("courses.counters.connection") as connection, \
+                self.assertLogs("courses.counters", "ERROR"):
+            with self.assertRaises(SystemExit):
+                lesson_counters._run_flusher()
+        connection.close.assert_called_once_with()
+        self.assertEqual(lesson_counters.pending()[0], {self.lesson.id: 1})
+
+    def test_exit_flush_skips_an_unusable_database(self):
+        with self.assertNumQueries(0):
+            counters._flush_on_exit()
+        services.record_lesson_view(self.lesson)
+        with mock.patch("courses.counters.flush_lesson_counts", side_effect=OperationalError("no such table")), \
+                self.assertLogs("courses.counters", "WARNING") as logs:
+            counters._flush_on_exit()
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].levelname, "WARNING")
+        self.assertIsNone(logs.records[0].exc_info)
+
+    def test_flush_is_one_update_per_batch(self):
+        for _ in range(3):
+            services.record_lesson_view(self.lesson)
+        services.record_lesson_view(self.other)
+        services.record_lesson_play(self.lesson)
+        catalog = get_catalog()
+        with self.assertNumQueries(1):
+            self.assertEqual(lesson_counters.flush(), 2)
+        self.assertEqual(lesson_counters.pending(), ({}, {}))
+        self.lesson.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.lesson.view_count, self.lesson.play_count), (3, 1))
+        self.assertEqual((self.other.view_count, self.other.play_count), (1, 0))
+        # counters don't invalidate the catalog snapshot
+        self.assertIs(get_catalog(), catalog)
+
+    def test_failed_flush_keeps_counts(self):
+        services.record_lesson_view(self.lesson)
+        with mock.patch("courses.counters.flush_lesson_counts", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                lesson_counters.flush()
+        self.assertEqual(lesson_counters.pending()[0], {self.lesson.id: 1})
+
+    def test_play_endpoint(self):
+        response = self.client.get(f"{self.lesson.path}/play/")
+        self.assertEqual(response.status_code, 405)
+        response = self.client.post(f"{self.lesson.path}/play/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(lesson_counters.pending()[1], {self.lesson.id: 1})
+
+    def test_popular_ordering(self):
+        popular = Course.objects.create(title="Popular", status=PublishStatus.PUBLISHED)
+        popular_lesson = Lesson.objects.create(course=popular, title="Hit")
+        for _ in range(5):
+            services.record_lesson_view(popular_lesson)
+        services.record_lesson_view(self.lesson)
+        lesson_counters.flush()
+        courses = services.get_publish_courses(order="popular")
+        self.assertEqual([course.id for course in courses], [popular.id, self.course.id])
+        self.assertEqual([course.id for course in services.get_publish_courses()], [self.course.id, popular.id])
+        response = self.client.get("/courses/?order=popular")
+        body = response.content.decode()
+        self.assertLess(body.index("Popular"), body.index("Test Course"))
+
+
+class CourseProgressTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f"Lesson {i}", order=i)
+            for i in range(12)
+        ]
+        self.email = Email.objects.create(email="learner@example.com")
+        session = self.client.session
+        session['email_id'] = f"{self.email.id}"
+        session.save()
+
+    def test_bitmap_helpers(self):
+        bitmap = set_bit(set_bit(b"", 0), 9)
+        self.assertEqual(len(bitmap), 2)
+        self.assertTrue(has_bit(bitmap, 9))
+        self.assertFalse(has_bit(bitmap, 8))
+        self.assertFalse(has_bit(bitmap, 200))
+        self.assertEqual(count_bits(bitmap), 2)
+
+    def test_progress_index_is_stable(self):
+        self.assertEqual([lesson.progress_index for lesson in self.lessons], list(range(12)))
+        self.lessons[3].order = 99
+        self.lessons[3].save()
+        self.lessons[3].refresh_from_db()
+        self.assertEqual(self.lessons[3].progress_index, 3)
+
+    def test_progress_index_is_read_from_the_primary(self):
+        # a lagging replica would hand out an index already in use
+        with mock.patch("home.routers.ReplicaRouter.get_replica", return_value="replica_1"):
+            lesson = Lesson.objects.create(course=self.course, title="Lesson 12")
+        self.assertEqual(lesson.progress_index, 12)
+
+    def test_progress_index_collision_is_rejected(self):
+        # what a second lesson created at the same time would get without the lock
+        with mock.patch("courses.models.get_next_progress_index", return_value=11):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                Lesson.objects.create(course=self.course, title="Lesson 12")
+        self.assertEqual(Lesson.objects.filter(course=self.course).count(), 12)
+        self.assertEqual(Lesson.objects.create(course=self.course, title="Lesson 12").progress_index, 12)
+
+    def test_beacon_marks_lesson_complete(self):
+        for lesson in (self.lessons[0], self.lessons[10], self.lessons[10]):
+            response = self.client.post(f"{lesson.path}/complete/")
+            self.assertEqual(response.status_code, 204)
+        progress = CourseProgress.objects.get(email=self.email, course=self.course)
+        self.assertEqual(count_bits(progress.completed), 2)
+        self.assertEqual(len(bytes(progress.completed)), 2)
+
+    def test_beacon_without_email_is_ignored(self):
+        self.client.session.flush()
+        self.client.cookies.clear()
+        self.client.post(f"{self.lessons[0].path}/complete/")
+        self.assertFalse(CourseProgress.objects.exists())
+
+    def test_progress_is_one_row_read(self):
+        for lesson in self.lessons[:2]:
+            services.mark_lesson_complete(email_id=self.email.id, lesson_obj=lesson)
+        services.get_publish_courses()
+        with self.assertNumQueries(1):
+            progress = services.get_course_progress(
+                email_id=self.email.id,
+                course_obj=self.course
+            )
+        self.assertEqual(progress["completed"], 2)
+        self.assertEqual(progress["total"], 12)
+        self.assertEqual(progress["continue_lesson"], self.lessons[2])
+
+    def test_detail_renders_progress(self):
+        services.mark_lesson_complete(email_id=self.email.id, lesson_obj=self.lessons[0])
+        response = self.client.get(f"{self.course.path}/")
+        body = response.content.decode()
+        self.assertIn("1 of 12 completed", body)
+        self.assertIn("Continue: Lesson 1", body)
+        self.assertEqual(body.count("Completed\n"), 1)
+        with self.settings(COURSES_STREAM_LISTS=True):
+            response = self.client.get(f"{self.course.path}/")
+        self.assertEqual(b"".join(response.streaming_content).decode().count("Completed\n"), 1)
+
+
+class ProfileStartupTest(TestCase):
+    def test_parse_importtime_tree(self):
+        output = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       100 |        100 |     courses.catalog",
+            "import time:       200 |        300 |   courses.models",
+            "import time:        50 |        350 | courses",
+            "import time:        10 |         10 | json",
+        ])
+        roots = parse_importtime(output)
+        self.assertEqual([node.name for node in roots], ["courses", "json"])
+        models = roots[0].children[0]
+        self.assertEqual(models.name, "courses.models")
+        self.assertEqual(models.cumulative_us, 300)
+        self.assertEqual(models.children[0].name, "courses.catalog")
+
+
+class AdminChangelistTest(AdminChangelistTestMixin, TestCase):
+    # a few changelist pages; the query budget doesn't grow with the table
+    ROWS = 2_000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        courses = Course.objects.bulk_create([
+            Course(title=f"Course {i}", public_id=f"course-{i}", status=PublishStatus.PUBLISHED)
+            for i in range(cls.ROWS)
+        ])
+        Lesson.objects.bulk_create([
+            Lesson(course=courses[i % 100], title=f"Lesson {i}", public_id=f"lesson-{i}", order=i)
+            for i in range(cls.ROWS)
+        ])
+
+    def test_course_changelist(self):
+        response = self.assertChangelistQueries("/admin/courses/course/", 6)
+        self.assertContains(response, f"Course {self.ROWS - 1}")
+        response = self.assertChangelistQueries("/admin/courses/course/?o=-4", 6)
+        self.assertEqual(response.context["cl"].result_list[0].admin_lesson_count, self.ROWS // 100)
+        self.assertChangelistQueries("/admin/courses/course/?q=course-42", 6)
+        # title searches are prefix only
+        response = self.assertChangelistQueries("/admin/courses/course/?q=course+1999", 6)
+        self.assertEqual(response.context["cl"].result_count, 1)
+        response = self.assertChangelistQueries("/admin/courses/course/?q=1999", 6)
+        self.assertEqual(response.context["cl"].result_count, 0)
+
+    def test_lesson_changelist(self):
+        response = self.assertChangelistQueries("/admin/courses/lesson/", 6)
+        self.assertContains(response, "Course 0")
+        self.assertChangelistQueries("/admin/courses/lesson/?q=Lesson+7", 6)
+
+    def test_course_autocomplete(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                "/admin/autocomplete/",
+                {"app_label": "courses", "model_name": "lesson", "field_name": "course", "term": "Course 1999"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Course 1999", response.content.decode())
+        self.assertLessEqual(len(queries), 5)
+        self.assertFalse([q for q in queries if 'COUNT("courses_lesson"' in q["sql"]])
+
+    def test_lesson_counts_only_on_the_changelist(self):
+        course = Course.objects.get(public_id="course-1")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/admin/courses/course/{course.pk}/change/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.context["original"], "admin_lesson_count"))
+        self.assertFalse([q for q in queries if 'COUNT("courses_lesson"' in q["sql"]])
+
+    def test_estimated_count_paginator(self):
+        queryset = Lesson.objects.order_by('id')
+        with mock.patch("home.pagination.estimate_count", return_value=5_000_000):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 5_000_000)
+        # small estimates are counted exactly
+        with mock.patch("home.pagination.estimate_count", return_value=50):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, self.ROWS)
+
+    def test_changelist_shows_the_estimate_for_big_tables(self):
+        with mock.patch("home.pagination.estimate_count", return_value=5_000_000) as estimate:
+            response = self.assertChangelistQueries("/admin/courses/lesson/", 5)
+        estimate.assert_called_once()
+        self.assertEqual(response.context["cl"].result_count, 5_000_000)
+        self.assertContains(response, "50000")
+
+
+class SitemapFeedTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f"Lesson {i}", order=i)
+            for i in range(4)
+        ]
+        Lesson.objects.create(course=self.course, title="Soon", status=PublishStatus.COMING_SOON)
+        Course.objects.create(title="Draft Course")
+
+    def test_sitemap_index_and_shard(self):
+        response = self.client.get("/sitemap.xml")
+        self.assertEqual(response["Content-Type"], "application/xml")
+        self.assertContains(response, "/sitemap-1.xml</loc>")
+        self.assertNotContains(response, "/sitemap-2.xml")
+        shard = self.client.get("/sitemap-1.xml").content.decode()
+        self.assertEqual(shard.count("<url>"), 5)
+        self.assertIn(f"<loc>{settings.BASE_URL}{self.course.path}/</loc>", shard)
+        self.assertIn(f"<loc>{settings.BASE_URL}{self.lessons[0].path}/</loc>", shard)
+        self.assertNotIn("Soon", shard)
+        self.assertEqual(self.client.get("/sitemap-2.xml").status_code, 404)
+
+    def test_shards_for_large_catalogs(self):
+        with self.settings(SITEMAP_SHARD_SIZE=2):
+            index = self.client.get("/sitemap.xml").content.decode()
+            self.assertEqual(index.count("<sitemap>"), 3)
+            self.assertEqual(self.client.get("/sitemap-3.xml").content.decode().count("<url>"), 1)
+
+    def test_conditional_get_and_no_sql(self):
+        response = self.client.get("/sitemap-1.xml")
+        self.assertIn("max-age", response["Cache-Control"])
+        with self.assertNumQueries(0):
+            response = self.client.get("/sitemap-1.xml", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_only_changed_shards_rerender(self):
+        with self.settings(SITEMAP_SHARD_SIZE=2):
+            first = [self.client.get(f"/sitemap-{n}.xml")["ETag"] for n in (1, 2, 3)]
+            self.lessons[3].title = "Renamed"
+            self.lessons[3].save()
+            with mock.patch("courses.sitemaps.render_urlset", wraps=sitemaps.render_urlset) as render:
+                second = [self.client.get(f"/sitemap-{n}.xml")["ETag"] for n in (1, 2, 3)]
+        # course lastmod and the last lesson changed, the middle shard didn't
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(first[1], second[1])
+        self.assertNotEqual(first[2], second[2])
+
+    def test_feeds(self):
+        rss = self.client.get("/feeds/courses.rss")
+        self.assertEqual(rss["Content-Type"], "application/rss+xml; charset=utf-8")
+        self.assertContains(rss, "<title>Test Course</title>")
+        self.assertNotContains(rss, "Draft Course")
+        atom = self.client.get("/feeds/courses.atom")
+        self.assertContains(atom, 'xmlns="http://www.w3.org/2005/Atom"')
+        self.assertEqual(self.client.get("/feeds/courses.json").status_code, 404)
+
+
+class CatalogAPITest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course.image = CloudinaryResource("courses/test-course/cover", format="jpg", resource_type="image")
+        self.course.save()
+        self.lessons = [
+            Lesson.objects.create(course=self.course, title=f"Lesson {i}", order=i % 2, video=self.make_video(f"v{i}"))
+            for i in range(5)
+        ]
+        Lesson.objects.create(course=self.course, title="Draft", status=PublishStatus.DRAFT)
+        Course.objects.create(title="Draft Course")
+        self.courses = [self.course] + [
+            Course.objects.create(title=f"Course {i}", status=PublishStatus.PUBLISHED)
+            for i in range(4)
+        ]
+
+    def test_course_list_default_fields(self):
+        response = self.client.get("/api/courses/")
+        self.assertEqual(response["Content-Type"], "application/json")
+        body = response.json()
+        self.assertEqual([row["id"] for row in body["data"]], [course.public_id for course in self.courses])
+        first = body["data"][0]
+        self.assertEqual(set(first), set(api.COURSE_DEFAULT_FIELDS))
+        self.assertEqual(first["thumbnail"], self.course.get_thumbnail())
+        self.assertEqual(first["url"], f"{settings.BASE_URL}{self.course.path}/")
+        self.assertIsNone(body["data"][1]["thumbnail"])
+        self.assertIsNone(body["next_cursor"])
+
+    def test_field_selection_only_selects_needed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/courses/?fields=title,id")
+        self.assertEqual(set(response.json()["data"][0]), {"title", "id"})
+        sql = [query["sql"] for query in queries if "courses_course" in query["sql"]][-1]
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"image"', sql)
+        response = self.client.get("/api/courses/?fields=title,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("secret", response.json()["detail"])
+
+    def test_cursor_pagination(self):
+        seen, cursor = [], ""
+        while True:
+            body = self.client.get(f"/api/courses/?fields=id&limit=2&cursor={cursor}").json()
+            seen += [row["id"] for row in body["data"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, [course.public_id for course in self.courses])
+        self.assertEqual(self.client.get("/api/courses/?cursor=nope").status_code, 400)
+        self.assertEqual(self.client.get("/api/courses/?limit=1000").status_code, 400)
+
+    def test_lesson_pages_follow_order_then_id(self):
+        path = f"/api/courses/{self.course.public_id}/lessons/?fields=id,thumbnail&limit=2"
+        seen, cursor = [], ""
+        while cursor is not None:
+            body = self.client.get(f"{path}&cursor={cursor}").json()
+            seen += body["data"]
+            cursor = body["next_cursor"]
+        expected = sorted(self.lessons, key=lambda lesson: (lesson.order, lesson.id))
+        self.assertEqual([row["id"] for row in seen], [lesson.public_id for lesson in expected])
+        self.assertEqual(seen[0]["thumbnail"], expected[0].get_thumbnail())
+        self.assertEqual(self.client.get("/api/courses/missing/lessons/").status_code, 404)
+
+    def test_course_detail(self):
+        body = self.client.get(f"/api/courses/{self.course.public_id}/?fields=id,access").json()
+        self.assertEqual(body["data"], {"id": self.course.public_id, "access": self.course.access})
+        self.assertEqual(self.client.get("/api/courses/missing/").status_code, 404)
+
+    def test_etag_revalidation_runs_no_sql(self):
+        response = self.client.get("/api/courses/")
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/courses/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.courses[1].title = "Renamed"
+        self.courses[1].save()
+        response = self.client.get("/api/courses/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_rows_are_read_from_the_primary(self):
+        # the ETag names the catalog version, a lagging replica would serve older rows under it
+        with mock.patch("home.routers.ReplicaRouter.get_replica", return_value="replica_1"):
+            for path in (
+                "/api/courses/",
+                f"/api/courses/{self.course.public_id}/",
+                f"/api/courses/{self.course.public_id}/lessons/",
+            ):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_dumps_without_orjson(self):
+        payload = {"data": [{"title": "Café"}], "next_cursor": None}
+        with mock.patch.object(api, "orjson", None):
+            self.assertEqual(json.loads(api.dumps(payload)), payload)
+
+
+class StaticCatalogExportTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = Course.objects.create(title="Other Course", status=PublishStatus.PUBLISHED)
+        self.lesson = Lesson.objects.create(course=self.course, title="Intro Lesson")
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def export(self, **kwargs):
+        out = StringIO()
+        call_command("export_static_catalog", output=str(self.root), stdout=out, **kwargs)
+        return out.getvalue()
+
+    def read(self, *parts):
+        return self.root.joinpath("courses", *parts, "index.html").read_text()
+
+    def test_exports_list_and_detail_pages(self):
+        self.assertIn("2 course page(s) rendered", self.export())
+        listing = self.read()
+        self.assertIn("Test Course", listing)
+        self.assertIn("Other Course", listing)
+        detail = self.read(self.course.public_id)
+        self.assertIn("Intro Lesson", detail)
+        self.assertIn('"X-CSRFToken": ""', detail)
+        self.assertIn('href="/login"', detail)
+        self.assertEqual(
+            sorted(path.name for path in self.root.rglob("*") if path.is_file()),
+            [".manifest.json", "index.html", "index.html", "index.html"]
+        )
+
+    def test_rebuild_only_renders_changed_courses(self):
+        self.export()
+        self.assertIn(
+            "0 course page(s) rendered, 2 unchanged, 0 removed, list page unchanged",
+            self.export()
+        )
+        self.lesson.title = "Renamed Lesson"
+        self.lesson.save()
+        with mock.patch("courses.static_export.render_page", wraps=static_export.render_page) as render:
+            self.assertIn("1 course page(s) rendered, 1 unchanged", self.export())
+        self.assertEqual([c.args[0] for c in render.call_args_list], ["courses/detail.html", "courses/list.html"])
+        self.assertIn("Renamed Lesson", self.read(self.course.public_id))
+        self.assertIn("2 course page(s) rendered", self.export(force=True))
+
+    def test_unpublished_course_is_removed(self):
+        self.export()
+        self.other.status = PublishStatus.DRAFT
+        self.other.save()
+        self.assertIn("1 removed, list page rendered", self.export())
+        self.assertFalse(self.root.joinpath("courses", self.other.public_id).exists())
+        self.assertNotIn("Other Course", self.read())
+
+    def test_saves_and_deletes_re_export_after_commit(self):
+        self.export()
+        with self.settings(STATIC_CATALOG_EXPORT_ON_SAVE=True, STATIC_CATALOG_ROOT=str(self.root)):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.lesson.title = "Renamed Lesson"
+                self.lesson.save()
+            self.assertIn("Renamed Lesson", self.read(self.course.public_id))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.other.status = PublishStatus.DRAFT
+                self.other.save()
+            self.assertFalse(self.root.joinpath("courses", self.other.public_id).exists())
+            self.assertNotIn("Other Course", self.read())
+            with self.captureOnCommitCallbacks(execute=True):
+                self.lesson.delete()
+            self.assertNotIn("Renamed Lesson", self.read(self.course.public_id))
+
+    def test_failed_export_on_save_is_logged(self):
+        with self.settings(STATIC_CATALOG_EXPORT_ON_SAVE=True, STATIC_CATALOG_ROOT=str(self.root)), \
+                mock.patch("courses.static_export.export_static_catalog", side_effect=OSError("disk full")), \
+                self.assertLogs("courses.cache_tags", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.course.save()
+
+    def test_write_atomic_keeps_old_file_on_failure(self):
+        path = self.root / "page.html"
+        static_export.write_atomic(path, "old")
+        with mock.patch("courses.static_export.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                static_export.write_atomic(path, "new")
+        self.assertEqual(path.read_text(), "old")
+        self.assertEqual([p.name for p in self.root.iterdir()], ["page.html"])
+
+
+@override_settings(PROXY_CACHE_PURGER="home.proxy_cache.LocMemPurger", PROXY_CACHE_SECONDS=60)
+class ProxyCacheTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        LocMemPurger.purged.clear()
+        self.course.access = AccessRequirement.ANYONE
+        self.course.save()
+        self.lesson = Lesson.objects.create(course=self.course, title="Intro", video=self.make_video())
+        self.gated = Course.objects.create(
+            title="Gated", status=PublishStatus.PUBLISHED, access=AccessRequirement.EMAIL_REQUIRED
+        )
+        self.gated_lesson = Lesson.objects.create(course=self.gated, title="Gated Intro", video=self.make_video("v2"))
+
+    def login(self):
+        session = self.client.session
+        session["email_id"] = Email.objects.create(email="cached@example.com").id
+        session.save()
+
+    def test_anonymous_pages_are_shared_and_tagged(self):
+        response = self.client.get("/courses/")
+        self.assertEqual(response["Surrogate-Key"], "catalog")
+        self.assertIn("s-maxage=60", response["Cache-Control"])
+        self.assertIn("public", response["Cache-Control"])
+        self.assertIn("HX-Request", response["Vary"])
+        response = self.client.get(f"{self.course.path}/")
+        self.assertEqual(response["Surrogate-Key"], f"course:{self.course.public_id}")
+        # no per-visitor token or cookie in a shared page
+        self.assertContains(response, '"X-CSRFToken": ""')
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+
+    def test_lesson_pages_by_access(self):
+        response = self.client.get(f"{self.lesson.path}/")
+        self.assertEqual(
+            response["Surrogate-Key"],
+            f"course:{self.course.public_id} lesson:{self.lesson.public_id}"
+        )
+        # lesson pages are capped at LESSON_MAX_S_MAXAGE
+        self.assertIn("s-maxage=30", response["Cache-Control"])
+        response = self.client.get(f"{self.gated_lesson.path}/")
+        self.assertIn("private", response["Cache-Control"])
+        self.login()
+        response = self.client.get(f"{self.gated_lesson.path}/")
+        self.assertIn("private", response["Cache-Control"])
+        self.assertNotContains(response, '"X-CSRFToken": ""')
+
+    def test_verified_visitors_are_never_shared(self):
+        self.login()
+        for path in ("/courses/", f"{self.course.path}/", f"{self.lesson.path}/"):
+            response = self.client.get(path)
+            self.assertIn("private", response["Cache-Control"])
+            self.assertNotIn("s-maxage", response["Cache-Control"])
+
+    def test_play_beacon_works_without_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        with mock.patch.object(lesson_counters, "ensure_flusher"):
+            response = client.post(f"{self.lesson.path}/play/")
+        self.assertEqual(response.status_code, 204)
+
+    def test_saves_and_deletes_purge_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.course.title = "Renamed"
+            self.course.save()
+        keys, paths = LocMemPurger.purged[-1]
+        self.assertEqual(keys, ("catalog", f"course:{self.course.public_id}"))
+        self.assertIn("/courses/", paths)
+        self.assertIn(f"{self.lesson.path}/", paths)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.lesson.delete()
+        self.assertEqual(LocMemPurger.purged[-1][0][0], "catalog")
+        for callback in callbacks:
+            callback()
+        keys, paths = LocMemPurger.purged[-1]
+        self.assertEqual(keys, (f"course:{self.course.public_id}", f"lesson:{self.lesson.public_id}"))
+        self.assertIn(f"{self.course.path}/lessons/{self.lesson.public_id}/", paths)
+
+
+class CardTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course.description = "word " * 30
+        self.course.image = CloudinaryResource("courses/test-course/cover", format="jpg", resource_type="image")
+        self.course.save()
+        self.lesson = Lesson.objects.create(course=self.course, title="Intro", video=self.make_video())
+        Lesson.objects.create(course=self.course, title="Soon", status=PublishStatus.COMING_SOON)
+
+    def test_cards_match_the_models(self):
+        course = services.get_course_detail(course_id=self.course.public_id)
+        (card,) = services.get_course_cards()
+        self.assertFalse(hasattr(card, "__dict__"))
+        self.assertEqual(card.path, course.get_absolute_url())
+        self.assertEqual(card.image, course.get_responsive_thumbnail())
+        self.assertEqual(card.excerpt, Template("{{ d|truncatewords:20 }}").render(Context({"d": course.description})))
+        self.assertEqual(card.lesson_count, 2)
+        lesson_cards = {card.title: card for card in services.get_course_lesson_cards(course)}
+        lesson_card, soon_card = lesson_cards["Intro"], lesson_cards["Soon"]
+        lesson = services.get_lesson_detail(course_id=course.public_id, lesson_id=self.lesson.public_id)
+        self.assertEqual(lesson_card.image, lesson.get_responsive_thumbnail())
+        self.assertEqual(lesson_card.path, lesson.path)
+        self.assertTrue(soon_card.is_coming_soon)
+        self.assertIsNone(soon_card.image)
+
+    def test_cards_are_built_once_per_catalog_version(self):
+        first = services.get_course_cards()[0]
+        self.assertIs(services.get_course_cards()[0], first)
+        self.course.title = "Renamed"
+        self.course.save()
+        self.assertEqual(services.get_course_cards()[0].title, "Renamed")
+
+    def test_pages_render_cards_without_model_calls(self):
+        self.client.get("/courses/")
+        self.client.get(f"{self.course.path}/")
+        with mock.patch.object(Course, "get_responsive_thumbnail", side_effect=AssertionError), \
+                mock.patch.object(Lesson, "get_responsive_thumbnail", side_effect=AssertionError), \
+                self.assertNumQueries(0):
+            listing = self.client.get("/courses/")
+            detail = self.client.get(f"{self.course.path}/")
+        self.assertContains(listing, "courses/test-course/cover")
+        self.assertContains(listing, "2 lessons")
+        self.assertContains(detail, "Coming Soon")
+        self.assertContains(detail, f'href="{self.lesson.path}"')
+
+
+def normalize_html(html):
+    # the engines differ in whitespace around tags, not in content
+    return " ".join(html.replace(">", "> ").replace("<", " <").split())
+
+
+CARD_LIST_TEMPLATE = "courses/snippets/list-display.html"
+
+
+class JinjaTemplatesTest(CloudinaryTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.course.description = "word " * 40 + "\n\nsecond <paragraph>"
+        self.course.image = CloudinaryResource("courses/test-course/cover", format="jpg", resource_type="image")
+        self.course.access = AccessRequirement.ANYONE
+        self.course.save()
+        self.lesson = Lesson.objects.create(course=self.course, title="Intro", video=self.make_video())
+        Lesson.objects.create(course=self.course, title="Soon", status=PublishStatus.COMING_SOON)
+        bytecode_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(bytecode_dir.cleanup)
+        self.bytecode_dir = Path(bytecode_dir.name)
+        jinja_engine = {
+            **settings.CATALOG_JINJA2_ENGINE,
+            "OPTIONS": {**settings.CATALOG_JINJA2_ENGINE["OPTIONS"], "bytecode_cache_dir": str(self.bytecode_dir)},
+        }
+        self.jinja_templates = override_settings(TEMPLATES=[jinja_engine, *settings.TEMPLATES])
+
+    def get_both(self, path, **kwargs):
+        django_response = self.client.get(path, **kwargs)
+        with self.jinja_templates:
+            jinja_response = self.client.get(path, **kwargs)
+        return django_response, jinja_response
+
+    def assertSamePage(self, path, **kwargs):
+        django_response, jinja_response = self.get_both(path, **kwargs)
+        # Django templates send template_rendered, Jinja2 ones don't
+        self.assertIn(CARD_LIST_TEMPLATE, [t.name for t in django_response.templates])
+        self.assertNotIn(CARD_LIST_TEMPLATE, [t.name for t in jinja_response.templates])
+        self.assertEqual(normalize_html(jinja_response.content.decode()), normalize_html(django_response.content.decode()))
+        return jinja_response
+
+    def assertSameSnippet(self, template_name, context):
+        django_template = get_template(template_name)
+        with self.jinja_templates:
+            jinja_template = get_template(template_name)
+            self.assertIsInstance(jinja_template, Jinja2Template)
+            jinja_html = jinja_template.render(context)
+        self.assertEqual(normalize_html(jinja_html), normalize_html(django_template.render(context)))
+
+    def test_catalog_pages_match_django_templates(self):
+        for path in ("/courses/", "/courses/?order=popular", f"{self.course.path}/"):
+            with self.subTest(path=path):
+                response = self.assertSamePage(path)
+                self.assertContains(response, 'hx-headers=\'{"X-CSRFToken": ""}\'')
+        self.assertSamePage("/courses/", HTTP_HX_REQUEST="true")
+
+    def test_ported_snippets_match_django_templates(self):
+        course_card = services.get_course_cards()[0]
+        lesson_cards = services.get_course_lesson_cards(services.get_course_detail(course_id=self.course.public_id))
+        self.assertSameSnippet("courses/snippets/card.html", {"object": course_card})
+        for card in lesson_cards:
+            with self.subTest(card=card):
+                self.assertSameSnippet("courses/snippets/card.html", {"object": card})
+                self.assertSameSnippet(
+                    "courses/snippets/card.html",
+                    {"object": card, "completed_lesson_ids": {card.id}},
+                )
+        self.assertSameSnippet(CARD_LIST_TEMPLATE, {"queryset": lesson_cards})
+        self.assertSameSnippet(CARD_LIST_TEMPLATE, {"queryset": []})
+        self.assertSameSnippet(
+            "courses/snippets/responsive-image.html",
+            {"image": course_card.image, "alt": "Cover", "sizes": "100vw", "eager": True},
+        )
+
+    def test_only_the_snippets_are_ported(self):
+        ported = sorted(
+            str(path.relative_to(settings.TEMPLATE_DIR / "jinja2"))
+            for path in (settings.TEMPLATE_DIR / "jinja2").rglob("*.html")
+        )
+        self.assertEqual(ported, [
+            "courses/snippets/card.html",
+            "courses/snippets/list-display.html",
+            "courses/snippets/responsive-image.html",
+            "videos/snippets/embed.html",
+        ])
+
+    def test_verified_email_gets_a_csrf_token(self):
+        session = self.client.session
+        session["email_id"] = Email.objects.create(email="learner@example.com").id
+        session.save()
+        # masked tokens differ on every render
+        for response in self.get_both(f"{self.course.path}/"):
+            self.assertRegex(response.content.decode(), r'hx-headers=\'\{"X-CSRFToken": "\w{64}"\}\'')
+
+    @override_settings(COURSES_STREAM_LISTS=True)
+    def test_streamed_lists_match(self):
+        django_response, jinja_response = self.get_both(f"{self.course.path}/")
+        self.assertEqual(
+            normalize_html(b"".join(jinja_response.streaming_content).decode()),
+            normalize_html(b"".join(django_response.streaming_content).decode()),
+        )
+
+    def test_video_embed(self):
+        django_html = helpers.get_cloudinary_video_object(self.lesson, field_name="video", as_html=True)
+        with self.jinja_templates:
+            jinja_html = helpers.get_cloudinary_video_object(self.lesson, field_name="video", as_html=True)
+        self.assertEqual(normalize_html(jinja_html), normalize_html(django_html))
+        self.assertTrue(hasattr(jinja_html, "__html__"))
+
+    def test_other_templates_fall_through_to_django(self):
+        with self.jinja_templates:
+            response = self.client.get(f"{self.lesson.path}/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("courses/lesson.html", [t.name for t in response.templates])
+
+    def test_bytecode_is_cached_on_disk(self):
+        with self.jinja_templates:
+            self.client.get("/courses/")
+        self.assertTrue(list(self.bytecode_dir.glob("__jinja2_*.cache")))
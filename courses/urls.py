@@ -3,7 +3,10 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path("<slug:course_id>/lessons/<slug:lesson_id>/play/", views.lesson_play_view),
+    path("<slug:course_id>/lessons/<slug:lesson_id>/complete/", views.lesson_complete_view),
     path("<slug:course_id>/lessons/<slug:lesson_id>/", views.lesson_detail_view),
+    path("<slug:course_id>/video-urls/", views.lesson_video_urls_view),
     path("<slug:course_id>/", views.course_detail_view),
     path("", views.course_list_view),
 ]
\ No newline at end of file
@@ -1,33 +1,120 @@
 from django.shortcuts import render,redirect
 import helpers
-from django.http import Http404, JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from . import api, cache_tags, services, sitemaps
+from .models import AccessRequirement
+from .streaming import stream_list_display
+
+def is_prefetch_request(request):
+    # the next-lesson <link rel=prefetch> and Link header; Chrome sends
+    # Sec-Purpose, Firefox Purpose
+    purpose = request.headers.get("Sec-Purpose") or request.headers.get("Purpose") or ""
+    return "prefetch" in purpose
 
-from . import services
 
 def course_list_view(request):
-    queryset = services.get_publish_courses()
+    order = request.GET.get("order")
+    if order not in services.COURSE_ORDERINGS:
+        order = None
+    queryset = services.get_course_cards(order=order)
+    shared = cache_tags.is_shared_request(request)
     context = {
-        "object_list": queryset
+        "object_list": queryset,
+        "order": order,
+        **(cache_tags.SHARED_CONTEXT if shared else {}),
     }
     template_name = "courses/list.html"
     if request.htmx:
         template_name = "courses/snippets/list-display.html"
         context['queryset'] = queryset[:3]
-    return render(request, template_name, context)
+        response = render(request, template_name, context)
+    elif settings.COURSES_STREAM_LISTS and queryset:
+        response = stream_list_display(request, template_name, context, queryset)
+    else:
+        response = render(request, template_name, context)
+    return cache_tags.patch_catalog_response(request, response, (cache_tags.CATALOG_KEY,), shared)
 
 
 def course_detail_view(request, course_id=None, *args, **kwarg):
     course_obj = services.get_course_detail(course_id=course_id)
     if course_obj is None:
         raise Http404
-    lessons_queryset = services.get_course_lessons(course_obj)
+    lessons_queryset = services.get_course_lesson_cards(course_obj)
+    progress = services.get_course_progress(
+        email_id=request.session.get('email_id'),
+        course_obj=course_obj
+    )
+    shared = cache_tags.is_shared_request(request)
     context = {
         "object": course_obj,
         "lessons_queryset": lessons_queryset,
+        "progress": progress,
+        "completed_lesson_ids": progress["completed_ids"] if progress else (),
+        **(cache_tags.SHARED_CONTEXT if shared else {}),
     }
     #return JsonResponse({"data": course_obj.id, 'lesson_ids': [x.path for x in lessons_queryset] })
-    return render(request, "courses/detail.html", context)
+    if settings.COURSES_STREAM_LISTS and lessons_queryset:
+        response = stream_list_display(
+            request,
+            "courses/detail.html",
+            context,
+            lessons_queryset,
+            card_context={"completed_lesson_ids": context["completed_lesson_ids"]}
+        )
+    else:
+        response = render(request, "courses/detail.html", context)
+    keys = (cache_tags.course_key(course_obj.public_id),)
+    return cache_tags.patch_catalog_response(request, response, keys, shared)
+
+
+def lesson_video_urls_view(request, course_id=None, *args, **kwargs):
+    course_obj = services.get_course_detail(course_id=course_id)
+    if course_obj is None:
+        raise Http404
+    email_id_exists = request.session.get('email_id')
+    if course_obj.access == AccessRequirement.EMAIL_REQUIRED and not email_id_exists:
+        return JsonResponse({"detail": "Email required"}, status=403)
+    lesson_ids = request.GET.getlist('lesson') or None
+    urls = services.get_lesson_video_urls(course_obj, lesson_ids=lesson_ids)
+    return JsonResponse({"data": urls})
+
+
+# anonymous visitors get cached lesson pages without a CSRF token; a play
+# count carries no user state worth forging
+@csrf_exempt
+@require_POST
+def lesson_play_view(request, course_id=None, lesson_id=None, *args, **kwargs):
+    lesson_obj = services.get_lesson_detail(
+        course_id=course_id,
+        lesson_id=lesson_id
+    )
+    if lesson_obj is None:
+        raise Http404
+    services.record_lesson_play(lesson_obj)
+    return HttpResponse(status=204)
+
+
+@require_POST
+def lesson_complete_view(request, course_id=None, lesson_id=None, *args, **kwargs):
+    lesson_obj = services.get_lesson_detail(
+        course_id=course_id,
+        lesson_id=lesson_id
+    )
+    if lesson_obj is None:
+        raise Http404
+    email_id = request.session.get('email_id')
+    if not email_id:
+        # progress is only kept for verified emails
+        return HttpResponse(status=204)
+    services.mark_lesson_complete(email_id=email_id, lesson_obj=lesson_obj)
+    return HttpResponse(status=204)
 
 
 def lesson_detail_view(request, course_id=None, lesson_id=None, *args, **kwargs):
@@ -40,18 +127,36 @@ def lesson_detail_view(request, course_id=None, lesson_id=None, *args, **kwargs)
         raise Http404
     
     email_id_exists = request.session.get('email_id')
+    keys = (
+        cache_tags.course_key(lesson_obj.course.public_id),
+        cache_tags.lesson_key(lesson_obj.public_id),
+    )
     
     if lesson_obj.requires_email and not email_id_exists:
         print(request.path)
         request.session['next_url'] = request.path
-        return render(request, "courses/email-required.html", {})
+        response = render(request, "courses/email-required.html", {})
+        return cache_tags.patch_catalog_response(request, response, keys, shared=False)
+    shared = not lesson_obj.requires_email and cache_tags.is_shared_request(request)
     # template_name = "courses/purchase-required.html"
 
+    # buffered in memory, no database write on the request path; a prefetch
+    # isn't a view, the visitor may never open the lesson
+    if not is_prefetch_request(request):
+        services.record_lesson_view(lesson_obj)
+
     # is the video property has no video in there so it will be coming soon
     template_name = "courses/lesson-coming-soon.html"
     
+    lessons, previous_lesson, next_lesson = services.get_lesson_neighbors(lesson_obj)
+    next_poster_url = services.get_lesson_poster_url(next_lesson)
     context = {
-        "object": lesson_obj
+        "object": lesson_obj,
+        "lessons": lessons,
+        "previous_lesson": previous_lesson,
+        "next_lesson": next_lesson,
+        "next_poster_url": next_poster_url,
+        **(cache_tags.SHARED_CONTEXT if shared else {}),
     }
     if not lesson_obj.is_coming_soon and lesson_obj.has_video:
         """
@@ -60,11 +165,108 @@ def lesson_detail_view(request, course_id=None, lesson_id=None, *args, **kwargs)
         go forward
         """
         template_name = "courses/lesson.html" # if its acc has a video available
-        video_embed_html = helpers.get_cloudinary_video_object(
-            lesson_obj, 
-            field_name='video',
-            as_html=True,
-            width=1250
-        )
+        video_embed_html = lesson_obj.get_video_embed(width=1250)
         context['video_embed'] = video_embed_html
-    return render(request, template_name, context)
\ No newline at end of file
+    response = render(request, template_name, context)
+    response['Link'] = ", ".join(services.get_lesson_link_hints(
+        next_lesson,
+        poster_url=next_poster_url
+    ))
+    return cache_tags.patch_catalog_response(
+        request,
+        response,
+        keys,
+        shared,
+        s_maxage=min(settings.PROXY_CACHE_SECONDS, cache_tags.LESSON_MAX_S_MAXAGE)
+    )
+
+
+def cached_document_response(request, document, content_type):
+    """serves a sitemaps.RenderedDocument, 304 when the crawler has it already"""
+    if document is None:
+        raise Http404
+    etag = f'"{document.etag}"'
+    last_modified = int(document.last_modified.timestamp()) if document.last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(document.content, content_type=content_type)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.SITEMAP_CACHE_SECONDS)
+    return response
+
+
+@require_GET
+def sitemap_index_view(request):
+    return cached_document_response(request, sitemaps.get_sitemap_index(), "application/xml")
+
+
+@require_GET
+def sitemap_shard_view(request, number=None):
+    return cached_document_response(request, sitemaps.get_sitemap_shard(number), "application/xml")
+
+
+@require_GET
+def course_feed_view(request, feed_type="rss"):
+    if feed_type not in sitemaps.FEED_TYPES:
+        raise Http404
+    content_type = "application/rss+xml" if feed_type == "rss" else "application/atom+xml"
+    return cached_document_response(
+        request,
+        sitemaps.get_course_feed(feed_type),
+        f"{content_type}; charset=utf-8"
+    )
+
+
+def api_response(request, build):
+    """
+    JSON response for build(), or a 304 when the client's ETag still names
+    the current catalog version; bad parameters are a 400.
+    """
+    etag = f'"{api.get_etag(request.get_full_path())}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            payload = build()
+        except api.APIError as error:
+            return JsonResponse({"detail": str(error)}, status=400)
+        if payload is None:
+            return JsonResponse({"detail": "Not found"}, status=404)
+        response = HttpResponse(api.dumps(payload), content_type="application/json")
+    response['ETag'] = etag
+    # always revalidate, the ETag makes that a cheap 304
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+@require_GET
+def course_api_list_view(request):
+    return api_response(request, lambda: api.get_course_page(
+        fields=api.parse_fields(request.GET.get("fields"), api.COURSE_FIELDS, api.COURSE_DEFAULT_FIELDS),
+        cursor=request.GET.get("cursor"),
+        limit=api.parse_limit(request.GET.get("limit")),
+    ))
+
+
+@require_GET
+def course_api_detail_view(request, course_id=None):
+    return api_response(request, lambda: api.get_course_item(
+        course_id,
+        fields=api.parse_fields(request.GET.get("fields"), api.COURSE_FIELDS, api.COURSE_DEFAULT_FIELDS),
+    ))
+
+
+@require_GET
+def lesson_api_list_view(request, course_id=None):
+    def build():
+        course_obj = services.get_course_detail(course_id=course_id)
+        if course_obj is None:
+            return None
+        return api.get_lesson_page(
+            course_obj,
+            fields=api.parse_fields(request.GET.get("fields"), api.LESSON_FIELDS, api.LESSON_DEFAULT_FIELDS),
+            cursor=request.GET.get("cursor"),
+            limit=api.parse_limit(request.GET.get("limit")),
+        )
+    return api_response(request, build)
@@ -1,6 +1,70 @@
 from django.contrib import admin
 
-from .models import Email, EmailVerificationEvent
+from home.pagination import EstimatedCountPaginator
 
-admin.site.register(Email)
-admin.site.register(EmailVerificationEvent)
\ No newline at end of file
+from .identity import normalize_email
+from .models import Campaign, Email, EmailVerificationEvent
+
+
+class EmailPrefixSearchMixin:
+    """
+    Searches addresses by prefix with a case-sensitive startswith on the
+    normalized term, which PostgreSQL answers from the email column's
+    pattern-ops (_like) index; icontains would scan the table.
+    """
+    search_email_field = 'email'
+    search_help_text = "Starts with the email address"
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = normalize_email(search_term)
+        if not search_term:
+            return queryset, False
+        return queryset.filter(**{f"{self.search_email_field}__startswith": search_term}), False
+
+
+@admin.register(Email)
+class EmailAdmin(EmailPrefixSearchMixin, admin.ModelAdmin):
+    list_display = ['email', 'active', 'timestamp']
+    list_filter = ['active']
+    search_fields = ['email']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(EmailVerificationEvent)
+class EmailVerificationEventAdmin(EmailPrefixSearchMixin, admin.ModelAdmin):
+    list_display = ['email', 'attempts', 'expired', 'timestamp']
+    list_filter = ['expired']
+    search_fields = ['email']
+    raw_id_fields = ['parent']
+    readonly_fields = ['token']
+    # newest first by primary key, sorting by timestamp would need its own index
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'course', 'status', 'display_progress', 'sent_count', 'failed_count', 'display_throughput']
+    list_filter = ['status']
+    fields = [
+        'course', 'subject', 'status', 'total_recipients', 'sent_count', 'failed_count',
+        'last_email_id', 'started_at', 'finished_at', 'heartbeat_at', 'last_error',
+    ]
+    readonly_fields = [
+        'status', 'total_recipients', 'sent_count', 'failed_count',
+        'last_email_id', 'started_at', 'finished_at', 'heartbeat_at', 'last_error',
+    ]
+    raw_id_fields = ['course']
+
+    def display_progress(self, obj, *args, **kwargs):
+        return f"{obj.progress}%"
+
+    display_progress.short_description = "Progress"
+
+    def display_throughput(self, obj, *args, **kwargs):
+        return f"{obj.throughput:.1f} msg/s"
+
+    display_throughput.short_description = "Throughput"
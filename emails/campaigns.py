@@ -0,0 +1,220 @@
+"""
+Course announcement campaigns.
+
+run_campaign streams active, verified recipients ordered by id through a server-side
+cursor, renders the message once per batch and sends one message per
+recipient over a single reused SMTP connection, throttled to
+CAMPAIGN_SEND_RATE messages per second. After every batch the last
+recipient id and the counters are checkpointed, so a crashed run resumes
+where it stopped; at most the batch in flight is sent twice.
+
+Only one run sends a campaign at a time: claim_campaign takes it with a
+conditional UPDATE that writes a claim id and a heartbeat, every
+checkpoint renews the heartbeat only while the claim id is still there,
+and a "sending" campaign is taken over once its heartbeat is older than
+CAMPAIGN_LEASE_SECONDS, i.e. its run died.
+"""
+import logging
+import smtplib
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Campaign, CampaignStatus, Email
+
+logger = logging.getLogger(__name__)
+
+# "sending" campaigns are only claimable once their lease ran out
+RUNNABLE_STATUSES = (CampaignStatus.PENDING, CampaignStatus.FAILED)
+
+
+def get_recipient_queryset():
+    # not every address typed into the login form, only the ones that verified
+    return Email.objects.filter(active=True, verified_at__isnull=False)
+
+
+def create_course_campaign(course_obj, subject=None):
+    return Campaign.objects.create(
+        course=course_obj,
+        subject=subject or f"New course: {course_obj.title}",
+        total_recipients=get_recipient_queryset().count(),
+    )
+
+
+def iter_recipient_batches(after_id=0, batch_size=500):
+    """Yields lists of (email id, address), never more than one batch in memory."""
+    queryset = get_recipient_queryset().filter(
+        id__gt=after_id
+    ).order_by('id').values_list('id', 'email')
+    batch = []
+    # server-side cursor on PostgreSQL, fetched chunk_size rows at a time
+    for row in queryset.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def render_campaign_message(campaign):
+    """(subject, text body, html body), the same for every recipient"""
+    context = {
+        "course": campaign.course,
+        "course_url": f"{settings.BASE_URL}{campaign.course.get_absolute_url()}/",
+    }
+    return (
+        campaign.subject,
+        render_to_string("emails/campaigns/course_announcement.txt", context),
+        render_to_string("emails/campaigns/course_announcement.html", context),
+    )
+
+
+class Throttle:
+    """Spaces calls to wait() at least 1/rate seconds apart; rate 0 disables it."""
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1 / rate if rate else 0
+        self.clock = clock
+        self.sleep = sleep
+        self._next_at = None
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = self.clock()
+        if self._next_at is not None and now < self._next_at:
+            self.sleep(self._next_at - now)
+            now = self._next_at
+        self._next_at = now + self.interval
+
+
+def send_with_reconnect(connection, message):
+    """Sends over the open connection, reopening it once if the server hung up."""
+    try:
+        return connection.send_messages([message])
+    except smtplib.SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        return connection.send_messages([message])
+
+
+def claim_campaign(campaign):
+    """
+    Returns a claim id when this run got the campaign, None when it's done
+    or another run holds a live lease on it.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.CAMPAIGN_LEASE_SECONDS)
+    claim_id = uuid.uuid4().hex
+    claimed = Campaign.objects.filter(
+        Q(status__in=RUNNABLE_STATUSES) |
+        Q(status=CampaignStatus.SENDING, heartbeat_at__isnull=True) |
+        Q(status=CampaignStatus.SENDING, heartbeat_at__lt=stale),
+        pk=campaign.pk,
+    ).update(
+        status=CampaignStatus.SENDING,
+        claimed_by=claim_id,
+        heartbeat_at=now,
+        started_at=Coalesce(F('started_at'), now),
+        last_error=None,
+    )
+    return claim_id if claimed else None
+
+
+def release_campaign(campaign, claim_id, **fields):
+    """Ends this run's claim, with the final status fields if any."""
+    return Campaign.objects.filter(pk=campaign.pk, claimed_by=claim_id).update(
+        claimed_by="",
+        heartbeat_at=None,
+        **fields
+    )
+
+
+def run_campaign(campaign, batch_size=None, send_rate=None, max_batches=None, connection=None):
+    """
+    Sends the rest of the campaign, returns it refreshed. max_batches stops
+    early (the campaign stays resumable), mostly for tests and dry runs.
+    """
+    claim_id = claim_campaign(campaign)
+    if claim_id is None:
+        campaign.refresh_from_db()
+        return campaign
+    campaign.refresh_from_db()
+    batch_size = batch_size or settings.CAMPAIGN_BATCH_SIZE
+    if send_rate is None:
+        send_rate = settings.CAMPAIGN_SEND_RATE
+    throttle = Throttle(send_rate)
+    connection = connection or get_connection()
+    from_email = settings.EMAIL_ADDRESS or settings.DEFAULT_FROM_EMAIL
+
+    try:
+        connection.open()
+        batches = iter_recipient_batches(campaign.last_email_id, batch_size=batch_size)
+        for batch_number, batch in enumerate(batches, start=1):
+            subject, text_body, html_body = render_campaign_message(campaign)
+            sent = failed = 0
+            for email_id, address in batch:
+                throttle.wait()
+                message = EmailMultiAlternatives(
+                    subject=subject,
+                    body=text_body,
+                    from_email=from_email,
+                    to=[address],
+                    connection=connection,
+                )
+                message.attach_alternative(html_body, "text/html")
+                try:
+                    sent += send_with_reconnect(connection, message)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as error:
+                    failed += 1
+                    logger.warning("campaign %s: %s refused: %s", campaign.pk, address, error)
+            # checkpoint, and the heartbeat that keeps the claim
+            now = timezone.now()
+            checkpointed = Campaign.objects.filter(pk=campaign.pk, claimed_by=claim_id).update(
+                last_email_id=batch[-1][0],
+                sent_count=F('sent_count') + sent,
+                failed_count=F('failed_count') + failed,
+                heartbeat_at=now,
+                updated=now,
+            )
+            campaign.refresh_from_db()
+            if not checkpointed:
+                # the lease ran out and another run took over from the last checkpoint
+                logger.warning("campaign %s: claim lost, stopping", campaign.pk)
+                return campaign
+            logger.info(
+                "campaign %s: %s%% (%s sent, %s failed, %.1f msg/s)",
+                campaign.pk, campaign.progress, campaign.sent_count,
+                campaign.failed_count, campaign.throughput,
+            )
+            if max_batches is not None and batch_number >= max_batches:
+                # still "sending", resumable right away
+                release_campaign(campaign, claim_id)
+                campaign.refresh_from_db()
+                return campaign
+    except Exception as error:
+        release_campaign(
+            campaign, claim_id,
+            status=CampaignStatus.FAILED,
+            last_error=str(error),
+        )
+        logger.exception("campaign %s failed", campaign.pk)
+        campaign.refresh_from_db()
+        return campaign
+    finally:
+        connection.close()
+
+    release_campaign(
+        campaign, claim_id,
+        status=CampaignStatus.DONE,
+        finished_at=timezone.now(),
+    )
+    campaign.refresh_from_db()
+    return campaign
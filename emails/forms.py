@@ -1,6 +1,7 @@
 from django import forms 
 from .models import Email
 from . import css, services
+from .identity import normalize_email
 
 class EmailForm(forms.Form):
     email = forms.EmailField(
@@ -16,7 +17,7 @@ class EmailForm(forms.Form):
     #     model = EmailVerificationEvent
     #     fields = ['email']
     def clean_email(self):
-        email = self.cleaned_data.get("email")
+        email = normalize_email(self.cleaned_data.get("email"))
         verified = services.verify_email(email)
         if verified:
             raise forms.ValidationError("inactive email. plz try again")
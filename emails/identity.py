@@ -0,0 +1,50 @@
+"""
+Normalized email identity and a short-lived cache of its status.
+
+Addresses are compared case-insensitively: they are stored lowercased and
+a functional unique index on Lower(email) keeps differently cased rows
+out. The login form and verification flow read {id, active} for an
+address from the cache; Email saves and deletes drop the entry.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db import transaction
+
+EMAIL_STATUS_CACHE_TIMEOUT = 300
+
+
+def normalize_email(email):
+    if email is None:
+        return None
+    return email.strip().lower()
+
+
+def get_email_status_cache_key(email):
+    digest = hashlib.sha1(normalize_email(email).encode("utf-8")).hexdigest()
+    return f"emails:status:{digest}"
+
+
+def get_email_status(email):
+    """
+    {"id": ..., "active": ...} for a known address, None for an unknown one.
+    Misses are cached too, as None can't be told apart from a cache miss.
+    """
+    from .models import Email
+
+    key = get_email_status_cache_key(email)
+    status = cache.get(key)
+    if status is not None:
+        return status or None
+    row = Email.objects.filter(
+        email=normalize_email(email)
+    ).values("id", "active").first()
+    cache.set(key, row or {}, EMAIL_STATUS_CACHE_TIMEOUT)
+    return row
+
+
+def invalidate_email_status(email):
+    key = get_email_status_cache_key(email)
+    cache.delete(key)
+    # again after commit, a read in between may have cached the old row
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from emails.campaigns import run_campaign
+from emails.models import Campaign, CampaignStatus
+
+
+class Command(BaseCommand):
+    help = "Send pending course announcement campaigns, resuming interrupted ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--campaign",
+            type=int,
+            help="Only this campaign id (also retries a failed one)",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Messages per second, 0 for no limit (default CAMPAIGN_SEND_RATE)",
+        )
+
+    def handle(self, *args, **options):
+        if options["campaign"]:
+            campaigns = Campaign.objects.filter(pk=options["campaign"])
+            if not campaigns.exists():
+                raise CommandError(f"Campaign {options['campaign']} does not exist")
+        else:
+            # a "sending" campaign is resumed from its checkpoint once its run's
+            # lease ran out; while another run still holds it, it's skipped
+            campaigns = Campaign.objects.filter(
+                status__in=[CampaignStatus.PENDING, CampaignStatus.SENDING]
+            ).order_by('id')
+        for campaign in campaigns:
+            campaign = run_campaign(
+                campaign,
+                batch_size=options["batch_size"],
+                send_rate=options["rate"],
+            )
+            self.stdout.write(
+                f"{campaign}: {campaign.get_status_display()}, {campaign.sent_count} sent, "
+                f"{campaign.failed_count} failed, {campaign.throughput:.1f} msg/s"
+            )
+            if campaign.last_error:
+                self.stderr.write(f"  {campaign.last_error}")
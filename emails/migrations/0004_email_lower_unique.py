@@ -0,0 +1,68 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def merge_duplicate_emails(apps, schema_editor):
+    """
+    Keep the oldest row per lowercased address, move verification events
+    and course progress onto it and lowercase the stored addresses.
+    """
+    Email = apps.get_model('emails', 'Email')
+    EmailVerificationEvent = apps.get_model('emails', 'EmailVerificationEvent')
+    CourseProgress = apps.get_model('courses', 'CourseProgress')
+
+    by_address = {}
+    for email_obj in Email.objects.order_by('id'):
+        by_address.setdefault(email_obj.email.strip().lower(), []).append(email_obj)
+
+    for address, email_objs in by_address.items():
+        keeper, duplicates = email_objs[0], email_objs[1:]
+        duplicate_ids = [email_obj.id for email_obj in duplicates]
+        if duplicate_ids:
+            EmailVerificationEvent.objects.filter(parent_id__in=duplicate_ids).update(parent_id=keeper.id)
+            kept_progress = {
+                progress.course_id: progress
+                for progress in CourseProgress.objects.filter(email_id=keeper.id)
+            }
+            for progress in CourseProgress.objects.filter(email_id__in=duplicate_ids).order_by('id'):
+                existing = kept_progress.get(progress.course_id)
+                if existing is None:
+                    progress.email_id = keeper.id
+                    progress.save(update_fields=['email'])
+                    kept_progress[progress.course_id] = progress
+                    continue
+                # union of the completed lesson bitmaps
+                left, right = bytes(existing.completed), bytes(progress.completed)
+                size = max(len(left), len(right))
+                left, right = left.ljust(size, b"\x00"), right.ljust(size, b"\x00")
+                existing.completed = bytes(a | b for a, b in zip(left, right))
+                existing.save(update_fields=['completed'])
+                progress.delete()
+            keeper.active = keeper.active and all(email_obj.active for email_obj in duplicates)
+            Email.objects.filter(id__in=duplicate_ids).delete()
+        if keeper.email != address or duplicate_ids:
+            keeper.email = address
+            keeper.save(update_fields=['email', 'active'])
+
+    for event in EmailVerificationEvent.objects.only('id', 'email'):
+        address = event.email.strip().lower()
+        if event.email != address:
+            EmailVerificationEvent.objects.filter(id=event.id).update(email=address)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0003_emailverificationevent_otp'),
+        ('courses', '0006_course_progress'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='email',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), name='unique_email_lower'),
+        ),
+    ]
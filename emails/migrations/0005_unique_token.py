@@ -0,0 +1,19 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:16
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0004_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailverificationevent',
+            name='token',
+            field=models.UUIDField(default=uuid.uuid1, unique=True),
+        ),
+    ]
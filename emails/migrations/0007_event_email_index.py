@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0006_campaign'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailverificationevent',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:06
+
+from django.db import migrations, models
+from django.db.models import Min, Q
+from django.db.models.functions import Coalesce
+
+# services.verify_token/verify_otp default
+MAX_ATTEMPTS = 5
+
+
+def backfill_verified_at(apps, schema_editor):
+    # verification wasn't recorded before, the events are the history: a
+    # code that worked expired every event of the address with fewer than
+    # MAX_ATTEMPTS attempts (too many wrong codes leave attempts at the max),
+    # a magic link that worked counted an attempt without expiring the event
+    # (so does a wrong code, which can't be told apart from a click)
+    Email = apps.get_model('emails', 'Email')
+    EmailVerificationEvent = apps.get_model('emails', 'EmailVerificationEvent')
+    verified_events = EmailVerificationEvent.objects.filter(
+        parent__isnull=False,
+        attempts__lt=MAX_ATTEMPTS,
+    ).filter(
+        Q(expired=True, expired_at__isnull=False) |
+        Q(expired=False, attempts__gt=0, last_attempt_at__isnull=False)
+    )
+    first_verified = verified_events.values('parent_id').annotate(
+        at=Min(Coalesce('expired_at', 'last_attempt_at'))
+    ).order_by()
+    for row in first_verified.iterator():
+        Email.objects.filter(pk=row['parent_id'], verified_at__isnull=True).update(verified_at=row['at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0007_event_email_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='email',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_verified_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-19 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('emails', '0008_email_verified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,20 +1,41 @@
 import uuid
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Lower
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .identity import invalidate_email_status, normalize_email
 
 # Create your models here.
 class Email(models.Model):
     email = models.EmailField(unique=True)
     active = models.BooleanField(default=True)
+    # first successful OTP or magic link; rows are created on the first login attempt
+    verified_at = models.DateTimeField(blank=True, null=True, editable=False)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # also covers rows written with queryset.update()/bulk_create()
+            models.UniqueConstraint(Lower('email'), name='unique_email_lower'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # before save
+        self.email = normalize_email(self.email)
+        super().save(*args, **kwargs)
+        # after save
+        invalidate_email_status(self.email)
+
 
 
 class EmailVerificationEvent(models.Model):
     parent = models.ForeignKey(Email, on_delete=models.SET_NULL, null=True)
-    email = models.EmailField() # for better user interface in the future
+    email = models.EmailField(db_index=True) # for better user interface in the future
     #  token
-    token = models.UUIDField(default=uuid.uuid1)
+    token = models.UUIDField(default=uuid.uuid1, unique=True)
     otp = models.CharField(max_length=6, blank=True, null=True)
     attempts = models.IntegerField(default=0)
     last_attempt_at = models.DateTimeField(
@@ -32,4 +53,65 @@ class EmailVerificationEvent(models.Model):
     )
     timestamp = models.DateTimeField(auto_now_add=True)
     def get_link(self):
-        return f"{settings.BASE_URL}/verify-email/{self.token}/"
\ No newline at end of file
+        return f"{settings.BASE_URL}/verify-email/{self.token}/"
+
+
+class CampaignStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    SENDING = "sending", "Sending"
+    DONE = "done", "Done"
+    FAILED = "failed", "Failed"
+
+
+class Campaign(models.Model):
+    """
+    A course announcement sent to every active, verified Email. emails.campaigns sends
+    it in batches of recipients ordered by id; last_email_id is the
+    checkpoint a crashed run resumes from. A run holds the campaign through
+    claimed_by and renews heartbeat_at at every checkpoint; another run only
+    takes a "sending" campaign over once the heartbeat is CAMPAIGN_LEASE_SECONDS old.
+    """
+    course = models.ForeignKey("courses.Course", on_delete=models.CASCADE)
+    subject = models.CharField(max_length=200)
+    status = models.CharField(
+        max_length=10,
+        choices=CampaignStatus.choices,
+        default=CampaignStatus.PENDING
+    )
+    last_email_id = models.BigIntegerField(default=0, editable=False)
+    total_recipients = models.PositiveIntegerField(default=0, editable=False)
+    sent_count = models.PositiveIntegerField(default=0, editable=False)
+    failed_count = models.PositiveIntegerField(default=0, editable=False)
+    last_error = models.TextField(blank=True, null=True, editable=False)
+    claimed_by = models.CharField(max_length=32, blank=True, default="", editable=False)
+    heartbeat_at = models.DateTimeField(blank=True, null=True, editable=False)
+    started_at = models.DateTimeField(blank=True, null=True, editable=False)
+    finished_at = models.DateTimeField(blank=True, null=True, editable=False)
+    timestamp = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.subject
+
+    @property
+    def progress(self):
+        if not self.total_recipients:
+            return 100 if self.status == CampaignStatus.DONE else 0
+        done = self.sent_count + self.failed_count
+        return min(100, round(100 * done / self.total_recipients))
+
+    @property
+    def throughput(self):
+        """messages per second since the campaign started"""
+        if self.started_at is None:
+            return 0
+        end = self.finished_at or timezone.now()
+        seconds = (end - self.started_at).total_seconds()
+        if seconds <= 0:
+            return 0
+        return (self.sent_count + self.failed_count) / seconds
+
+
+@receiver(post_delete, sender=Email)
+def email_post_delete(sender, instance, *args, **kwargs):
+    invalidate_email_status(instance.email)
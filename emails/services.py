@@ -1,9 +1,11 @@
 import random
 import string
 from django.utils import timezone
+from .identity import get_email_status, normalize_email
 from .models import Email, EmailVerificationEvent
 from django.conf import settings
-from django.db.models import Q
+from django.db import connection
+from django.db.models import F, Q
 from django.core.mail import send_mail
 EMAILL_HOST_USER = settings.EMAIL_HOST_USER
 from django.template.loader import render_to_string
@@ -13,13 +15,14 @@ def check_rate_limit(email):
     # Limit: 5 attempts per hour
     one_hour_ago = timezone.now() - timedelta(hours=1)
     count = EmailVerificationEvent.objects.filter(
-        email=email,
+        email=normalize_email(email),
         timestamp__gte=one_hour_ago
     ).count()
     return count < 5
 def verify_email(email):
-    qs = Email.objects.filter(email=email, active=False)
-    return qs.exists()
+    # True for a known but deactivated address, from the status cache
+    status = get_email_status(email)
+    return status is not None and not status["active"]
 
 def get_verification_email_message(verification_instance, as_html=False):
     if not isinstance(verification_instance, EmailVerificationEvent):
@@ -36,14 +39,20 @@ def get_verification_email_message(verification_instance, as_html=False):
     
     
 def start_verification_event(email):
+    email = normalize_email(email)
     # Check rate limit
     if not check_rate_limit(email):
         return None, False
 
-    email_obj , created = Email.objects.get_or_create(email=email)
+    status = get_email_status(email)
+    if status is not None:
+        email_id = status["id"]
+    else:
+        email_obj , created = Email.objects.get_or_create(email=email)
+        email_id = email_obj.id
     otp = "".join(random.choices(string.digits, k=6))
     obj = EmailVerificationEvent.objects.create(
-        parent = email_obj,
+        parent_id = email_id,
         email=email,
         otp=otp
     )
@@ -65,37 +74,81 @@ def send_verification_email(verify_obj_id):
         fail_silently = False,
         html_message = text_message_html)
 
-def verify_token(token,max_attempts=5):
-    qs  = EmailVerificationEvent.objects.filter(token=token)
-    if not qs.exists() and not qs.count() == 1:
+# backends with UPDATE ... RETURNING, sqlite only from 3.35
+UPDATE_RETURNING_VENDORS = ("postgresql", "sqlite")
+SQLITE_UPDATE_RETURNING_VERSION = (3, 35)
+
+
+def has_update_returning():
+    # by vendor: Django's can_return_columns_from_insert only describes INSERT
+    if connection.vendor not in UPDATE_RETURNING_VENDORS:
+        return False
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= SQLITE_UPDATE_RETURNING_VERSION
+    return True
+
+
+def claim_token_attempt(token, max_attempts=5):
+    """
+    Checks and counts one use of a magic link in a single UPDATE on the
+    unique token index. Concurrent clicks on the same link serialize on the
+    row lock, so attempts are never lost or let past max_attempts.
+    Returns (matched, parent_id).
+    """
+    if has_update_returning():
+        opts = EmailVerificationEvent._meta
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {quote(opts.db_table)} "
+                f"SET attempts = attempts + 1, last_attempt_at = %s "
+                f"WHERE token = %s AND expired = %s AND attempts < %s "
+                f"RETURNING parent_id",
+                [
+                    opts.get_field('last_attempt_at').get_db_prep_value(timezone.now(), connection),
+                    opts.get_field('token').get_db_prep_value(token, connection),
+                    False,
+                    max_attempts,
+                ],
+            )
+            row = cursor.fetchone()
+        return row is not None, row[0] if row else None
+    # no UPDATE ... RETURNING (MySQL): same conditional update, then read the parent
+    updated = EmailVerificationEvent.objects.filter(
+        token=token,
+        expired=False,
+        attempts__lt=max_attempts,
+    ).update(attempts=F('attempts') + 1, last_attempt_at=timezone.now())
+    if not updated:
+        return False, None
+    parent_id = EmailVerificationEvent.objects.filter(token=token).values_list('parent_id', flat=True).first()
+    return True, parent_id
+
+
+def mark_email_verified(email_id):
+    # only the first verification writes
+    Email.objects.filter(pk=email_id, verified_at__isnull=True).update(verified_at=timezone.now())
+
+
+def verify_token(token, max_attempts=5):
+    matched, parent_id = claim_token_attempt(token, max_attempts=max_attempts)
+    if matched:
+        if parent_id is None:
+            return False, "Invalid token", None
+        # the claim returned the id, the other fields load on access
+        email_obj = Email.from_db(connection.alias, ['id'], [parent_id])
+        mark_email_verified(email_obj.id)
+        return True , "Welcome!" , email_obj
+    # only failures pay for a second lookup to explain why
+    event = EmailVerificationEvent.objects.filter(token=token).values('expired', 'attempts').first()
+    if event is None:
         return False, "Invalid token", None
-    has_email_expired = qs.filter(expired=True)
-    """ token expired"""
-    if has_email_expired.exists():
-        return False, "Token expired",None
-    """Has token, not expired"""
-    max_attempts_reached = qs.filter(attempts__gte=max_attempts)
-    if max_attempts_reached.exists():
-        """
-        update max attempts ++ :)
-        max_tempts_reached.update()
-        """
-        return False, "Max attempts reached",None
-    """ valid token 
-        update attempts, expire token if attemps  > max
-    """     
-    obj = qs.first()
-    obj.attempts += 1
-    obj.last_attempt_at = timezone.now()
-    if obj.attempts > max_attempts:
-        """invalidate process"""
-        obj.expired = True
-        obj.expired_at = timezone.now()
-    obj.save()
-    email_obj = obj.parent
-    return True , "Welcome!" , email_obj
+    if event['expired']:
+        return False, "Token expired", None
+    return False, "Max attempts reached", None
 
 def verify_otp(email, otp, max_attempts=5):
+    email = normalize_email(email)
     qs = EmailVerificationEvent.objects.filter(
         email=email, 
         otp=otp, 
@@ -113,6 +166,8 @@ def verify_otp(email, otp, max_attempts=5):
         EmailVerificationEvent.objects.filter(email=email).update(expired=True, expired_at=timezone.now())
         
         email_obj = event.parent
+        if email_obj is not None:
+            mark_email_verified(email_obj.id)
         return True, "Welcome!", email_obj
     
     expired_match = EmailVerificationEvent.objects.filter(email=email, otp=otp).filter(
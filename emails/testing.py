@@ -0,0 +1,109 @@
+"""
+A local SMTP sink for tests and manual campaign runs. Stdlib only.
+
+    python -m emails.testing 1025
+
+then point EMAIL_HOST=127.0.0.1 EMAIL_PORT=1025 EMAIL_USE_TLS=False at it.
+Every message is accepted (except recipients listed in refuse) and kept
+in memory; connections are counted so tests can check reuse.
+"""
+import socketserver
+import sys
+import threading
+from collections import namedtuple
+
+SinkMessage = namedtuple("SinkMessage", ["mail_from", "rcpt_tos", "data"])
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.reply("220 sink ESMTP")
+        mail_from, rcpt_tos = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode("utf-8", "replace").strip().partition(" ")
+            command = command.upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 sink")
+            elif command == "MAIL":
+                mail_from, rcpt_tos = argument.partition(":")[2].strip("<> "), []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                address = argument.partition(":")[2].strip("<> ")
+                if address in sink.refuse:
+                    self.reply("550 No such user")
+                else:
+                    rcpt_tos.append(address)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line)
+                with sink.lock:
+                    sink.messages.append(SinkMessage(mail_from, rcpt_tos, b"".join(data)))
+                self.reply("250 OK")
+            elif command in ("RSET", "NOOP"):
+                mail_from, rcpt_tos = None, []
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, host="127.0.0.1", port=0, refuse=()):
+        self.refuse = set(refuse)
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self._server = _Server((host, port), _SMTPHandler)
+        self._server.sink = self
+        self.host, self.port = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 1025
+    sink = SMTPSink(port=port)
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        sink._server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{len(sink.messages)} message(s) over {sink.connections} connection(s)")
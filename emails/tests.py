@@ -1,6 +1,26 @@
-from django.test import TestCase
-from emails.models import Email, EmailVerificationEvent
+import uuid
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from courses.models import AccessRequirement, Course, PublishStatus
+from emails import campaigns
+from emails.campaigns import Throttle, create_course_campaign, run_campaign
+from emails.identity import get_email_status
+from emails.models import Campaign, CampaignStatus, Email, EmailVerificationEvent
 from emails import services
+from emails.testing import SMTPSink
+from home.testing import AdminChangelistTestMixin
 
 class OTPVerificationTest(TestCase):
     def setUp(self):
@@ -18,6 +38,8 @@ class OTPVerificationTest(TestCase):
         success, msg, email_obj = services.verify_otp(self.email, obj.otp)
         self.assertTrue(success)
         self.assertEqual(email_obj, self.email_obj)
+        self.email_obj.refresh_from_db()
+        self.assertIsNotNone(self.email_obj.verified_at)
         
         # Check if expired
         obj.refresh_from_db()
@@ -72,3 +94,374 @@ class OTPVerificationTest(TestCase):
         obj2.refresh_from_db()
         self.assertTrue(obj1.expired)
         self.assertTrue(obj2.expired)
+
+
+class EmailIdentityTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_addresses_are_normalized(self):
+        email_obj = Email.objects.create(email="  Learner@Example.COM ")
+        self.assertEqual(email_obj.email, "learner@example.com")
+        obj, sent = services.start_verification_event("LEARNER@example.com")
+        self.assertEqual(obj.parent_id, email_obj.id)
+        self.assertEqual(Email.objects.count(), 1)
+        success, msg, verified = services.verify_otp("Learner@example.com", obj.otp)
+        self.assertTrue(success)
+        self.assertEqual(verified, email_obj)
+
+    def test_lowercase_unique_index(self):
+        Email.objects.create(email="learner@example.com")
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Email.objects.bulk_create([Email(email="Learner@Example.com")])
+
+    def test_status_is_cached_and_invalidated(self):
+        email_obj = Email.objects.create(email="learner@example.com")
+        self.assertFalse(services.verify_email("learner@example.com"))
+        with self.assertNumQueries(0):
+            self.assertFalse(services.verify_email("LEARNER@example.com"))
+            self.assertFalse(services.verify_email("learner@example.com"))
+        email_obj.active = False
+        email_obj.save()
+        self.assertTrue(services.verify_email("learner@example.com"))
+        self.assertIsNone(get_email_status("new@example.com"))
+        with self.assertNumQueries(0):
+            self.assertIsNone(get_email_status("new@example.com"))
+        Email.objects.create(email="new@example.com")
+        self.assertIsNotNone(get_email_status("new@example.com"))
+
+    def test_login_for_known_address_skips_lookup(self):
+        Email.objects.create(email="learner@example.com")
+        services.verify_email("learner@example.com")
+        # rate limit count, event insert and the sender's reload of the event
+        with self.assertNumQueries(3):
+            services.start_verification_event("learner@example.com")
+
+
+class MergeDuplicateEmailsMigrationTest(TransactionTestCase):
+    migrate_from = [("emails", "0003_emailverificationevent_otp"), ("courses", "0006_course_progress")]
+    migrate_to = [("emails", "0004_email_lower_unique")]
+
+    def test_duplicates_are_merged(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldEmail = apps.get_model("emails", "Email")
+        OldEvent = apps.get_model("emails", "EmailVerificationEvent")
+        OldCourse = apps.get_model("courses", "Course")
+        OldProgress = apps.get_model("courses", "CourseProgress")
+        first = OldEmail.objects.create(email="Learner@Example.com")
+        second = OldEmail.objects.create(email="learner@example.com", active=False)
+        OldEvent.objects.create(parent=second, email="learner@example.com")
+        course = OldCourse.objects.create(title="Course")
+        OldProgress.objects.create(email=first, course=course, completed=b"\x01")
+        OldProgress.objects.create(email=second, course=course, completed=b"\x02\x01")
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        NewEmail = apps.get_model("emails", "Email")
+        NewProgress = apps.get_model("courses", "CourseProgress")
+        merged = NewEmail.objects.get()
+        self.assertEqual((merged.id, merged.email, merged.active), (first.id, "learner@example.com", False))
+        self.assertEqual(apps.get_model("emails", "EmailVerificationEvent").objects.get().parent_id, first.id)
+        self.assertEqual(bytes(NewProgress.objects.get().completed), b"\x03\x01")
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+
+class BackfillVerifiedAtMigrationTest(TransactionTestCase):
+    migrate_from = [("emails", "0007_event_email_index")]
+    migrate_to = [("emails", "0008_email_verified_at")]
+
+    def test_verified_before_the_field_existed(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldEmail = apps.get_model("emails", "Email")
+        OldEvent = apps.get_model("emails", "EmailVerificationEvent")
+        earlier = timezone.now() - timedelta(days=30)
+        later = timezone.now() - timedelta(days=2)
+        by_code = OldEmail.objects.create(email="code@example.com")
+        OldEvent.objects.create(parent=by_code, email=by_code.email, expired=True, expired_at=later)
+        OldEvent.objects.create(parent=by_code, email=by_code.email, expired=True, expired_at=earlier)
+        by_link = OldEmail.objects.create(email="link@example.com")
+        OldEvent.objects.create(parent=by_link, email=by_link.email, attempts=1, last_attempt_at=later)
+        locked_out = OldEmail.objects.create(email="locked@example.com")
+        OldEvent.objects.create(
+            parent=locked_out, email=locked_out.email, attempts=5, expired=True, expired_at=later
+        )
+        never_used = OldEmail.objects.create(email="typed@example.com")
+        OldEvent.objects.create(parent=never_used, email=never_used.email)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        verified_at = dict(apps.get_model("emails", "Email").objects.values_list("email", "verified_at"))
+        self.assertEqual(verified_at, {
+            "code@example.com": earlier,
+            "link@example.com": later,
+            "locked@example.com": None,
+            "typed@example.com": None,
+        })
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        self.assertEqual(campaigns.get_recipient_queryset().count(), 2)
+
+
+class TokenVerificationTest(TestCase):
+    def setUp(self):
+        self.email_obj = Email.objects.create(email="learner@example.com")
+        self.event = EmailVerificationEvent.objects.create(
+            parent=self.email_obj,
+            email=self.email_obj.email
+        )
+
+    def test_token_is_unique(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                EmailVerificationEvent.objects.create(
+                    parent=self.email_obj,
+                    email=self.email_obj.email,
+                    token=self.event.token
+                )
+
+    def test_success_is_the_claim_and_the_verified_mark(self):
+        # the claim returns the email id, no fetch
+        with self.assertNumQueries(2):
+            success, msg, email_obj = services.verify_token(self.event.token)
+        self.assertTrue(success)
+        self.assertEqual(email_obj, self.email_obj)
+        self.email_obj.refresh_from_db()
+        self.assertIsNotNone(self.email_obj.verified_at)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attempts, 1)
+        self.assertIsNotNone(self.event.last_attempt_at)
+
+    def test_repeated_clicks_stop_at_max_attempts(self):
+        results = [services.verify_token(self.event.token, max_attempts=3)[:2] for _ in range(4)]
+        self.assertEqual(results, [(True, "Welcome!")] * 3 + [(False, "Max attempts reached")])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attempts, 3)
+
+    def test_expired_and_unknown_tokens(self):
+        EmailVerificationEvent.objects.filter(pk=self.event.pk).update(expired=True)
+        self.assertEqual(services.verify_token(self.event.token)[:2], (False, "Token expired"))
+        self.assertEqual(services.verify_token(uuid.uuid4())[:2], (False, "Invalid token"))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.attempts, 0)
+
+    def test_fallback_without_update_returning(self):
+        with mock.patch.object(services, "UPDATE_RETURNING_VENDORS", ()):
+            success, msg, email_obj = services.verify_token(self.event.token)
+        self.assertTrue(success)
+        self.assertEqual(email_obj, self.email_obj)
+
+    def test_update_returning_needs_sqlite_3_35(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("sqlite only")
+        with mock.patch.object(connection.Database, "sqlite_version_info", (3, 34, 1)):
+            self.assertFalse(services.has_update_returning())
+            self.assertTrue(services.verify_token(self.event.token)[0])
+
+    def test_deleted_email_is_an_invalid_token(self):
+        self.email_obj.delete()
+        self.assertEqual(services.verify_token(self.event.token)[:2], (False, "Invalid token"))
+
+    def test_verify_email_view(self):
+        response = self.client.get(f"/verify-email/{self.event.token}/")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.session["email_id"], f"{self.email_obj.id}")
+        response = self.client.get(f"/verify-email/{uuid.uuid4()}/")
+        self.assertRedirects(response, "/login/", fetch_redirect_response=False)
+        self.assertNotIn("email_id", self.client.session)
+
+
+class CampaignTest(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(
+            title="Intro to Django",
+            status=PublishStatus.PUBLISHED,
+            access=AccessRequirement.ANYONE
+        )
+        self.addresses = [f"learner{i}@example.com" for i in range(7)]
+        for address in self.addresses:
+            Email.objects.create(email=address, verified_at=timezone.now())
+        Email.objects.create(email="inactive@example.com", active=False, verified_at=timezone.now())
+        # typed into the login form, never verified
+        Email.objects.create(email="unverified@example.com")
+        self.sink = SMTPSink(refuse=["learner3@example.com"]).start()
+        self.addCleanup(self.sink.stop)
+
+    def get_connection(self):
+        return get_connection(
+            "django.core.mail.backends.smtp.EmailBackend",
+            host=self.sink.host,
+            port=self.sink.port,
+            username="",
+            password="",
+            use_tls=False,
+            timeout=5,
+        )
+
+    def test_admin_action_queues_campaign(self):
+        User.objects.create_superuser("admin", "admin@example.com", "password")
+        self.client.login(username="admin", password="password")
+        draft = Course.objects.create(title="Draft")
+        response = self.client.post("/admin/courses/course/", {
+            "action": "announce_course",
+            "_selected_action": [self.course.pk, draft.pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        campaign = Campaign.objects.get()
+        self.assertEqual(campaign.course, self.course)
+        self.assertEqual(campaign.total_recipients, 7)
+        self.assertEqual(campaign.status, CampaignStatus.PENDING)
+
+    def test_sends_over_one_connection(self):
+        campaign = create_course_campaign(self.course)
+        with mock.patch(
+            "emails.campaigns.render_campaign_message",
+            wraps=campaigns.render_campaign_message
+        ) as render, self.assertLogs("emails.campaigns", "WARNING"):
+            campaign = run_campaign(campaign, batch_size=3, send_rate=0, connection=self.get_connection())
+        self.assertEqual(render.call_count, 3)
+        self.assertEqual(campaign.status, CampaignStatus.DONE)
+        self.assertEqual((campaign.sent_count, campaign.failed_count), (6, 1))
+        self.assertEqual(campaign.progress, 100)
+        self.assertGreater(campaign.throughput, 0)
+        self.assertEqual(self.sink.connections, 1)
+        recipients = [message.rcpt_tos for message in self.sink.messages]
+        self.assertEqual(recipients, [[address] for address in self.addresses if address != "learner3@example.com"])
+        self.assertIn(b"Intro to Django", self.sink.messages[0].data)
+
+    def test_resumes_from_checkpoint(self):
+        campaign = create_course_campaign(self.course)
+        campaign = run_campaign(campaign, batch_size=3, send_rate=0, max_batches=1, connection=self.get_connection())
+        self.assertEqual(campaign.status, CampaignStatus.SENDING)
+        self.assertEqual(campaign.sent_count, 3)
+        self.assertEqual(campaign.last_email_id, Email.objects.get(email="learner2@example.com").id)
+        call_command("send_campaigns", "--rate", "0", stdout=StringIO())
+        # the management command uses the configured backend (locmem in tests)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, CampaignStatus.DONE)
+        self.assertEqual(len(self.sink.messages) + len(mail.outbox), 7)
+        self.assertNotIn(["learner0@example.com"], [message.to for message in mail.outbox])
+
+    def test_only_one_of_two_racing_claims_wins(self):
+        campaign = create_course_campaign(self.course)
+        # both runs loaded the campaign while it was pending
+        first, second = Campaign.objects.get(pk=campaign.pk), Campaign.objects.get(pk=campaign.pk)
+        claim_id = campaigns.claim_campaign(first)
+        self.assertIsNotNone(claim_id)
+        self.assertIsNone(campaigns.claim_campaign(second))
+        # an overlapping run sends nothing while the lease is live
+        second = run_campaign(second, send_rate=0, connection=self.get_connection())
+        self.assertEqual(second.claimed_by, claim_id)
+        self.assertEqual((second.sent_count, len(self.sink.messages)), (0, 0))
+
+    def test_stale_claim_is_taken_over(self):
+        campaign = create_course_campaign(self.course)
+        campaigns.claim_campaign(campaign)
+        with self.settings(CAMPAIGN_LEASE_SECONDS=60):
+            Campaign.objects.filter(pk=campaign.pk).update(
+                heartbeat_at=timezone.now() - timedelta(seconds=59)
+            )
+            self.assertIsNone(campaigns.claim_campaign(campaign))
+            Campaign.objects.filter(pk=campaign.pk).update(
+                heartbeat_at=timezone.now() - timedelta(seconds=61)
+            )
+            with self.assertLogs("emails.campaigns", "WARNING"):
+                campaign = run_campaign(campaign, send_rate=0, connection=self.get_connection())
+        self.assertEqual(campaign.status, CampaignStatus.DONE)
+        self.assertEqual((campaign.claimed_by, campaign.heartbeat_at), ("", None))
+        self.assertEqual(len(self.sink.messages), 6)
+
+    def test_lost_claim_stops_the_run(self):
+        campaign = create_course_campaign(self.course)
+        render_campaign_message = campaigns.render_campaign_message
+
+        def take_over(campaign):
+            # another run takes the campaign over while this batch is sent
+            Campaign.objects.filter(pk=campaign.pk).update(claimed_by="other")
+            return render_campaign_message(campaign)
+
+        with mock.patch(
+            "emails.campaigns.render_campaign_message",
+            side_effect=take_over,
+        ), self.assertLogs("emails.campaigns", "WARNING") as logs:
+            campaign = run_campaign(campaign, batch_size=3, send_rate=0, connection=self.get_connection())
+        self.assertIn("claim lost", "\n".join(logs.output))
+        self.assertEqual(len(self.sink.messages), 3)
+        # the other run owns the checkpoint
+        self.assertEqual((campaign.status, campaign.claimed_by, campaign.last_email_id), (CampaignStatus.SENDING, "other", 0))
+
+    def test_connection_failure_marks_campaign_failed(self):
+        campaign = create_course_campaign(self.course)
+        connection = self.get_connection()
+        connection.port = 1  # nothing listens there
+        with self.assertLogs("emails.campaigns", "ERROR"):
+            campaign = run_campaign(campaign, send_rate=0, connection=connection)
+        self.assertEqual(campaign.status, CampaignStatus.FAILED)
+        self.assertTrue(campaign.last_error)
+        self.assertEqual(campaign.sent_count, 0)
+
+    def test_throttle_spaces_messages(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        throttle = Throttle(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            throttle.wait()
+        self.assertEqual(sleeps, [0.25, 0.25])
+        Throttle(0, sleep=sleep).wait()
+        self.assertEqual(len(sleeps), 2)
+
+
+class AdminChangelistTest(AdminChangelistTestMixin, TestCase):
+    # a few changelist pages; the query budget doesn't grow with the table
+    ROWS = 2_000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        email_objs = Email.objects.bulk_create([
+            Email(email=f"learner{i}@example.com") for i in range(cls.ROWS)
+        ])
+        EmailVerificationEvent.objects.bulk_create([
+            EmailVerificationEvent(parent=email_objs[i], email=email_objs[i].email, token=uuid.uuid4())
+            for i in range(cls.ROWS)
+        ])
+
+    def test_email_changelist(self):
+        response = self.assertChangelistQueries("/admin/emails/email/", 6)
+        self.assertContains(response, f"learner{self.ROWS - 1}@example.com")
+        response = self.assertChangelistQueries("/admin/emails/email/?q=Learner1242@", 6)
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+    def test_event_changelist(self):
+        response = self.assertChangelistQueries("/admin/emails/emailverificationevent/", 6)
+        # parent is a raw id widget, never joined or rendered as a select
+        self.assertContains(response, f"learner{self.ROWS - 1}@example.com")
+        # learner19, learner190-199 and learner1900-1999
+        response = self.assertChangelistQueries("/admin/emails/emailverificationevent/?q=learner19", 6)
+        self.assertEqual(response.context["cl"].result_count, 111)
+
+    def test_event_change_form_uses_raw_id(self):
+        event = EmailVerificationEvent.objects.first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/admin/emails/emailverificationevent/{event.pk}/change/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'class="vForeignKeyRawIdAdminField"')
+        self.assertLessEqual(len(queries), 8)
@@ -0,0 +1,73 @@
+"""
+Gunicorn runtime profiles, picked with GUNICORN_PROFILE.
+
+    sync     one request per worker, 2 * CPU + 1 workers
+    gthread  threaded workers for I/O-bound views (PostgreSQL, SMTP); the default
+    uvicorn  ASGI workers through home.asgi (uvicorn-worker)
+
+Every value can be overridden with a GUNICORN_* environment variable.
+Run with `gunicorn -c gunicorn.conf.py`.
+"""
+import multiprocessing
+
+# `config` is itself a gunicorn setting name, so decouple's is aliased
+from decouple import config as env
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+PROFILES = {
+    "sync": {
+        "worker_class": "sync",
+        "workers": CPU_COUNT * 2 + 1,
+        "threads": 1,
+        "wsgi_app": "home.wsgi:create_application()",
+    },
+    "gthread": {
+        "worker_class": "gthread",
+        "workers": CPU_COUNT + 1,
+        "threads": 4,
+        "wsgi_app": "home.wsgi:create_application()",
+    },
+    "uvicorn": {
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "workers": CPU_COUNT + 1,
+        "threads": 1,
+        "wsgi_app": "home.asgi:application",
+    },
+}
+
+_profile_name = env("GUNICORN_PROFILE", default="gthread")
+if _profile_name not in PROFILES:
+    raise ValueError(f"Unknown GUNICORN_PROFILE {_profile_name!r}, use one of {', '.join(PROFILES)}")
+_profile = PROFILES[_profile_name]
+
+wsgi_app = env("GUNICORN_APP", default=_profile["wsgi_app"])
+worker_class = _profile["worker_class"]
+workers = env("GUNICORN_WORKERS", default=_profile["workers"], cast=int)
+threads = env("GUNICORN_THREADS", default=_profile["threads"], cast=int)
+bind = env("GUNICORN_BIND", default="0.0.0.0:8000")
+
+timeout = env("GUNICORN_TIMEOUT", default=60, cast=int)
+graceful_timeout = env("GUNICORN_GRACEFUL_TIMEOUT", default=30, cast=int)
+keepalive = env("GUNICORN_KEEPALIVE", default=5, cast=int)
+
+# recycle workers now and then so slow memory growth can't pile up,
+# jittered so they don't all restart at once
+max_requests = env("GUNICORN_MAX_REQUESTS", default=1000, cast=int)
+max_requests_jitter = env("GUNICORN_MAX_REQUESTS_JITTER", default=100, cast=int)
+
+# import and warm the app once in the master, workers share it copy-on-write
+preload_app = env("GUNICORN_PRELOAD", default=True, cast=bool)
+
+# empty GUNICORN_ACCESSLOG turns access logging off
+accesslog = env("GUNICORN_ACCESSLOG", default="-") or None
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    # the catalog version lives in the default cache, a per-process one
+    # would keep the other workers on their old snapshot
+    if worker.cfg.workers > 1:
+        from courses.catalog import check_shared_cache
+
+        check_shared_cache()
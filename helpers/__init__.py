@@ -1,10 +1,26 @@
 from ._cloudinary import (
     cloudinary_init,
+    requires_cloudinary,
     get_cloudinary_image_object,
-    get_cloudinary_video_object
+    get_cloudinary_video_object,
+    get_cloudinary_video_object_mobile,
+    get_cloudinary_video_manifest_url,
+    get_cloudinary_signed_video_urls,
+    get_image_placeholder_data_uri,
+    get_responsive_image_breakpoints,
+    get_responsive_image_srcset,
+    get_video_poster_image,
 )
 __all__ = [
     'cloudinary_init',
+    'requires_cloudinary',
     'get_cloudinary_image_object',
-    get_cloudinary_video_object
+    'get_cloudinary_video_object',
+    'get_cloudinary_video_object_mobile',
+    'get_cloudinary_video_manifest_url',
+    'get_cloudinary_signed_video_urls',
+    'get_image_placeholder_data_uri',
+    'get_responsive_image_breakpoints',
+    'get_responsive_image_srcset',
+    'get_video_poster_image',
 ]
\ No newline at end of file
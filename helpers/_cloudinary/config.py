@@ -1,12 +1,31 @@
+import functools
+
 import cloudinary
 from django.conf import settings
-CLOUDINARY_CLOUD_NAME = settings.CLOUDINARY_CLOUD_NAME
-CLOUDINARY_PUBLIC_API_KEY = settings.CLOUDINARY_PUBLIC_API_KEY
-CLOUDINARY_SECRET_API_KEY= settings.CLOUDINARY_SECRET_API_KEY
-def cloudinary_init():
+
+_configured = False
+
+
+def cloudinary_init(force=False):
+    """
+    Configures the Cloudinary SDK from settings on first use.
+    Safe to call on every helper call; only the first one does any work.
+    """
+    global _configured
+    if _configured and not force:
+        return
     cloudinary.config(
-        cloud_name = CLOUDINARY_CLOUD_NAME,
-        api_key = CLOUDINARY_PUBLIC_API_KEY,
-        api_secret = CLOUDINARY_SECRET_API_KEY,
+        cloud_name = settings.CLOUDINARY_CLOUD_NAME,
+        api_key = settings.CLOUDINARY_PUBLIC_API_KEY,
+        api_secret = settings.CLOUDINARY_SECRET_API_KEY,
         secure = True
-    )
\ No newline at end of file
+    )
+    _configured = True
+
+
+def requires_cloudinary(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cloudinary_init()
+        return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,48 @@
+import base64
+import logging
+from io import BytesIO
+from urllib.request import urlopen
+
+from .services import get_image_placeholder
+
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+PLACEHOLDER_FETCH_TIMEOUT = 5
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_placeholder_source(url):
+    with urlopen(url, timeout=PLACEHOLDER_FETCH_TIMEOUT) as response:
+        return response.read()
+
+
+def build_placeholder_data_uri(image_bytes, width=PLACEHOLDER_WIDTH):
+    """
+    Shrinks an image to a few pixels wide and returns it as an inline
+    base64 JPEG data uri, small enough to ship in every card.
+    """
+    # Pillow is only needed when an image changes, not at worker boot
+    from PIL import Image
+
+    with Image.open(BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        height = max(round(img.height * width / img.width), 1)
+        img = img.resize((width, height), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=PLACEHOLDER_QUALITY, optimize=True)
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return f"data:image/jpeg;base64,{encoded}"
+
+
+def get_image_placeholder_data_uri(instance, field_name="image", format=None):
+    url = get_image_placeholder(instance, field_name=field_name, format=format)
+    if not url:
+        return ""
+    try:
+        image_bytes = fetch_placeholder_source(url)
+        return build_placeholder_data_uri(image_bytes)
+    except Exception as e:
+        # the card just goes without a placeholder
+        logger.warning("image placeholder for %s failed: %s", url, e)
+        return ""
@@ -1,5 +1,27 @@
-from django.template.loader import get_template
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+import hashlib
+from collections import namedtuple
+
+from .config import requires_cloudinary
+
+# delivery mode -> manifest extension understood by Cloudinary
+VIDEO_STREAMING_FORMATS = {
+    'hls': 'm3u8',
+    'dash': 'mpd',
+}
+
+
+def get_signed_url_cache_timeout():
+    # sign_url signatures never expire, the ttl only bounds how long a
+    # built url is reused before it is signed again
+    return max(getattr(settings, 'CLOUDINARY_SIGNED_URL_TTL', 3600), 1)
+
+
+def get_signed_url_cache_key(resource_object, options):
+    options_key = hashlib.md5(repr(sorted(options.items())).encode()).hexdigest()
+    return f"cloudinary:signed:{resource_object.public_id}:{options_key}"
 
 def get_responsive_video_breakpoints():
     return {
@@ -10,15 +32,28 @@ def get_responsive_video_breakpoints():
         'desktop_hd': {'width': 1920, 'quality': 'auto:best', 'bitrate': '6m'},
     }
 
+ImageBreakpoint = namedtuple('ImageBreakpoint', ['width', 'dpr'])
+
+# shared by every srcset, never rebuilt per call
+RESPONSIVE_IMAGE_BREAKPOINTS = (
+    ImageBreakpoint(320, 1),
+    ImageBreakpoint(640, 1),
+    ImageBreakpoint(960, 1),
+    ImageBreakpoint(1280, 1),
+    ImageBreakpoint(1920, 1),
+)
+# modern formats offered as <picture> sources, best first
+RESPONSIVE_IMAGE_FORMATS = (
+    ('avif', 'image/avif'),
+    ('webp', 'image/webp'),
+)
+RESPONSIVE_IMAGE_SIZES = "(max-width: 640px) 100vw, (max-width: 1024px) 50vw, 33vw"
+RESPONSIVE_IMAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
 def get_responsive_image_breakpoints():
-    return [
-        {'width': 320, 'dpr': 1},
-        {'width': 640, 'dpr': 1},
-        {'width': 960, 'dpr': 1},
-        {'width': 1280, 'dpr': 1},
-        {'width': 1920, 'dpr': 1},
-    ]
+    return RESPONSIVE_IMAGE_BREAKPOINTS
 
+@requires_cloudinary
 def get_cloudinary_image_object(instance, 
                                 field_name="image",
                                 as_html=False,
@@ -54,29 +89,42 @@ def get_cloudinary_image_object(instance,
     return image_object.build_url(**image_options)
 
 
-def get_responsive_image_srcset(instance, field_name="image", base_width=1200):
-    if not hasattr(instance, field_name):
-        return {"src": "", "srcset": "", "sizes": ""}
-    
-    image_object = getattr(instance, field_name)
-    if not image_object:
-        return {"src": "", "srcset": "", "sizes": ""}
-    
-    breakpoints = get_responsive_image_breakpoints()
+def build_image_srcset(image_object, fetch_format="auto", format=None):
     srcset_parts = []
-    
-    for bp in breakpoints:
+    for bp in RESPONSIVE_IMAGE_BREAKPOINTS:
         options = {
-            "width": bp['width'],
+            "width": bp.width,
             "crop": "fill",
             "gravity": "auto",
-            "fetch_format": "auto",
+            "fetch_format": fetch_format,
             "quality": "auto:best",
-            "dpr": bp['dpr'],
+            "dpr": bp.dpr,
         }
+        if format is not None:
+            options['format'] = format
         url = image_object.build_url(**options)
-        srcset_parts.append(f"{url} {bp['width']}w")
+        srcset_parts.append(f"{url} {bp.width}w")
+    return ", ".join(srcset_parts)
+
+
+@requires_cloudinary
+def get_responsive_image_srcset(instance, field_name="image", base_width=1200, format=None):
+    """
+    Returns src, srcset and sizes plus AVIF/WebP <picture> sources.
+    Cached per resource, the public_id changes whenever the image does.
+    """
+    if not hasattr(instance, field_name):
+        return {"src": "", "srcset": "", "sizes": "", "sources": []}
     
+    image_object = getattr(instance, field_name)
+    if not image_object:
+        return {"src": "", "srcset": "", "sizes": "", "sources": []}
+
+    cache_key = f"cloudinary:srcset:{image_object.public_id}:{base_width}:{format}"
+    srcset = cache.get(cache_key)
+    if srcset is not None:
+        return srcset
+
     default_options = {
         "width": base_width,
         "crop": "fill",
@@ -84,16 +132,28 @@ def get_responsive_image_srcset(instance, field_name="image", base_width=1200):
         "fetch_format": "auto",
         "quality": "auto:best",
     }
+    if format is not None:
+        default_options['format'] = format
     default_src = image_object.build_url(**default_options)
-    
-    return {
+
+    srcset = {
         "src": default_src,
-        "srcset": ", ".join(srcset_parts),
-        "sizes": "(max-width: 640px) 100vw, (max-width: 1024px) 50vw, 33vw"
+        "srcset": build_image_srcset(image_object, format=format),
+        "sizes": RESPONSIVE_IMAGE_SIZES,
+        "sources": [
+            {
+                "type": mime_type,
+                "srcset": build_image_srcset(image_object, fetch_format=fetch_format, format=format),
+            }
+            for fetch_format, mime_type in RESPONSIVE_IMAGE_FORMATS
+        ],
     }
+    cache.set(cache_key, srcset, RESPONSIVE_IMAGE_CACHE_TIMEOUT)
+    return srcset
 
 
-def get_image_placeholder(instance, field_name="image"):
+@requires_cloudinary
+def get_image_placeholder(instance, field_name="image", format=None):
     """
     Generate low-quality placeholder for blur-up effect.
     """
@@ -110,30 +170,66 @@ def get_image_placeholder(instance, field_name="image"):
         "effect": "blur:1000",
         "fetch_format": "auto",
     }
+    if format is not None:
+        placeholder_options['format'] = format
     
     return image_object.build_url(**placeholder_options)
 
 
 
-def get_cloudinary_video_object(instance, 
-                                field_name="video",
-                                as_html=False,
-                                width=None,
-                                height=None,
-                                sign_url=True,
-                                fetch_format="auto",
-                                quality="auto:good",
-                                controls=True,
-                                autoplay=False,
-                                streaming_profile="hd",
-                                adaptive=True):
+def get_video_initial_bandwidth():
+    """
+    Bandwidth estimate (bits/s) the player starts with, so adaptive
+    playback begins at the lowest rendition and ramps up from there.
+    """
+    breakpoints = get_responsive_video_breakpoints()
+    bitrates = []
+    for config in breakpoints.values():
+        bitrate = config['bitrate']
+        multiplier = {'k': 1_000, 'm': 1_000_000}.get(bitrate[-1], 1)
+        bitrates.append(int(bitrate.rstrip('km')) * multiplier)
+    return min(bitrates)
+
+
+@requires_cloudinary
+def get_cloudinary_video_manifest_url(instance,
+                                      field_name="video",
+                                      delivery="hls",
+                                      streaming_profile="hd",
+                                      sign_url=True):
+    """
+    Signed HLS (.m3u8) or DASH (.mpd) manifest URL for a video field.
+    Cached per resource/mode, the public_id changes whenever the video does.
+    """
     if not hasattr(instance, field_name):
         return ""
-    
+
     video_object = getattr(instance, field_name)
     if not video_object:
         return ""
-    
+
+    streaming_format = VIDEO_STREAMING_FORMATS.get(delivery)
+    if streaming_format is None:
+        return ""
+
+    manifest_options = {
+        "sign_url": sign_url,
+        "format": streaming_format,
+        "streaming_profile": streaming_profile,
+    }
+    cache_key = get_signed_url_cache_key(video_object, manifest_options)
+    url = cache.get(cache_key)
+    if url is None:
+        url = video_object.build_url(**manifest_options)
+        cache.set(cache_key, url, get_signed_url_cache_timeout())
+    return url
+
+
+def get_video_options(width=None,
+                      height=None,
+                      sign_url=True,
+                      controls=True,
+                      autoplay=False):
     video_options = {
         "sign_url": sign_url,
         "fetch_format": "auto",  # Smart progressive (WebM/AV1/MP4)
@@ -149,13 +245,89 @@ def get_cloudinary_video_object(instance,
         
     if height is not None:
         video_options['height'] = height
-        
-    # NOTE: Adaptive streaming (streaming_profile) removed in favor of 
-    # robust progressive download (f_auto, q_auto) for mobile stability.
+    return video_options
+
+
+@requires_cloudinary
+def get_cloudinary_signed_video_urls(instances, field_name="video", **kwargs):
+    """
+    Signs progressive video urls for many instances at once.
+    Returns {instance.public_id: url}; cache hits skip signing entirely
+    and misses are written back in a single set_many.
+    """
+    video_options = get_video_options(**kwargs)
+    keys = {}
+    for instance in instances:
+        video_object = getattr(instance, field_name, None)
+        if not video_object:
+            continue
+        keys[get_signed_url_cache_key(video_object, video_options)] = (instance, video_object)
+    if not keys:
+        return {}
+
+    cached = cache.get_many(keys.keys())
+    missing = {}
+    urls = {}
+    for cache_key, (instance, video_object) in keys.items():
+        url = cached.get(cache_key)
+        if url is None:
+            url = video_object.build_url(**video_options)
+            missing[cache_key] = url
+        urls[instance.public_id] = url
+    if missing:
+        cache.set_many(missing, get_signed_url_cache_timeout())
+    return urls
+
+
+@requires_cloudinary
+def get_cloudinary_video_object(instance, 
+                                field_name="video",
+                                as_html=False,
+                                width=None,
+                                height=None,
+                                sign_url=True,
+                                fetch_format="auto",
+                                quality="auto:good",
+                                controls=True,
+                                autoplay=False,
+                                streaming_profile="hd",
+                                adaptive=True,
+                                delivery="progressive"):
+    if not hasattr(instance, field_name):
+        return ""
+    
+    video_object = getattr(instance, field_name)
+    if not video_object:
+        return ""
     
-    url = video_object.build_url(**video_options)
+    # Adaptive streaming (HLS/DASH) is opt-in per lesson, progressive
+    # download (f_auto, q_auto) stays the default for mobile stability.
+    if delivery in VIDEO_STREAMING_FORMATS:
+        url = get_cloudinary_video_manifest_url(
+            instance,
+            field_name=field_name,
+            delivery=delivery,
+            streaming_profile=streaming_profile,
+            sign_url=sign_url,
+        )
+    else:
+        delivery = "progressive"
+        video_options = get_video_options(
+            width=width,
+            height=height,
+            sign_url=sign_url,
+            controls=controls,
+            autoplay=autoplay,
+        )
+        cache_key = get_signed_url_cache_key(video_object, video_options)
+        url = cache.get(cache_key)
+        if url is None:
+            url = video_object.build_url(**video_options)
+            cache.set(cache_key, url, get_signed_url_cache_timeout())
     
     if as_html:
+        # imported here so worker boot doesn't pull in the template engine
+        from django.template.loader import get_template
         template_name = "videos/snippets/embed.html"
         tmpl = get_template(template_name)
         cloud_name = settings.CLOUDINARY_CLOUD_NAME
@@ -170,9 +342,12 @@ def get_cloudinary_video_object(instance,
             'poster_url': poster_url,
             'adaptive': adaptive,
             'quality': quality,
+            'delivery': delivery,
+            'initial_bandwidth': get_video_initial_bandwidth(),
         }
         
-        return tmpl.render(context)
+        # a Jinja2 template (COURSES_JINJA2_TEMPLATES) renders a plain str
+        return mark_safe(tmpl.render(context))
     
     return url
 
@@ -198,6 +373,7 @@ def get_cloudinary_video_object_mobile(instance,
     )
 
 
+@requires_cloudinary
 def get_video_poster_image(instance, field_name="video", time_offset=0):
     if not hasattr(instance, field_name):
         return ""
@@ -217,38 +393,3 @@ def get_video_poster_image(instance, field_name="video", time_offset=0):
     }
     
     return video_object.build_url(**poster_options)
-
-
-def get_video_adaptive_sources(instance, field_name="video"):
-    """
-    Generate multiple video sources for adaptive streaming.
-    Returns list of video URLs with different quality levels.
-    """
-    if not hasattr(instance, field_name):
-        return []
-    
-    video_object = getattr(instance, field_name)
-    if not video_object:
-        return []
-    
-    breakpoints = get_responsive_video_breakpoints()
-    sources = []
-    
-    for key, config in breakpoints.items():
-        options = {
-            "sign_url": True,
-            "fetch_format": "auto",
-            "quality": config['quality'],
-            "width": config['width'],
-            "streaming_profile": "hd",
-        }
-        
-        url = video_object.build_url(**options)
-        sources.append({
-            'url': url,
-            'quality': key,
-            'width': config['width'],
-            'bitrate': config['bitrate'],
-        })
-    
-    return sources
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+/healthz and /readyz for container probes.
+
+HealthCheckMiddleware sits at the top of MIDDLEWARE and answers these paths
+before sessions, CSRF, htmx or any view code runs.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+
+HEALTH_PATH = "/healthz"
+READY_PATH = "/readyz"
+READINESS_CACHE_KEY = "home:readyz"
+
+logger = logging.getLogger(__name__)
+
+_readiness = {"checked_at": 0.0, "result": None}
+_readiness_lock = threading.Lock()
+_migrations_applied = False
+
+
+def check_database():
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    return True
+
+
+def check_migrations():
+    # once applied they stay applied for the life of the process
+    global _migrations_applied
+    if _migrations_applied:
+        return True
+    executor = MigrationExecutor(connections[DEFAULT_DB_ALIAS])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    _migrations_applied = not plan
+    return _migrations_applied
+
+
+def check_cache():
+    cache.set(READINESS_CACHE_KEY, "ok", 30)
+    return cache.get(READINESS_CACHE_KEY) == "ok"
+
+
+READINESS_CHECKS = {
+    "database": check_database,
+    "migrations": check_migrations,
+    "cache": check_cache,
+}
+
+
+def run_readiness_checks():
+    checks = {}
+    for name, check in READINESS_CHECKS.items():
+        try:
+            checks[name] = bool(check())
+        except Exception as e:
+            logger.warning("readiness check %s failed: %s", name, e)
+            checks[name] = False
+    return all(checks.values()), checks
+
+
+def get_readiness():
+    """Runs the checks at most once per READINESS_CACHE_SECONDS per process."""
+    now = time.monotonic()
+    with _readiness_lock:
+        if (
+            _readiness["result"] is not None
+            and now - _readiness["checked_at"] < settings.READINESS_CACHE_SECONDS
+        ):
+            return _readiness["result"]
+        result = run_readiness_checks()
+        _readiness["result"] = result
+        _readiness["checked_at"] = now
+        return result
+
+
+def reset_readiness():
+    global _migrations_applied
+    with _readiness_lock:
+        _readiness["result"] = None
+        _readiness["checked_at"] = 0.0
+        _migrations_applied = False
+
+
+class HealthCheckMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        path = request.path_info.rstrip("/")
+        if path == HEALTH_PATH:
+            return JsonResponse({"status": "ok"})
+        if path == READY_PATH:
+            ready, checks = get_readiness()
+            return JsonResponse(
+                {"status": "ok" if ready else "unavailable", "checks": checks},
+                status=200 if ready else 503,
+            )
+        return self.get_response(request)
@@ -0,0 +1,29 @@
+"""
+Container health probe using only the standard library.
+
+    python -m home.healthcheck            # liveness, /healthz
+    python -m home.healthcheck readyz     # readiness, /readyz
+"""
+import os
+import sys
+from urllib.error import URLError
+from urllib.request import urlopen
+
+BASE_URL = os.environ.get("HEALTHCHECK_URL", "http://127.0.0.1:8000")
+TIMEOUT = float(os.environ.get("HEALTHCHECK_TIMEOUT", "5"))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    endpoint = argv[0] if argv else "healthz"
+    url = f"{BASE_URL.rstrip('/')}/{endpoint.strip('/')}"
+    try:
+        with urlopen(url, timeout=TIMEOUT) as response:
+            return 0 if response.status == 200 else 1
+    except (URLError, OSError) as e:
+        print(f"{url}: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Jinja2 environment for the catalog snippets in templates/jinja2.
+
+Enabled with COURSES_JINJA2_TEMPLATES: the Jinja2 engine goes first in
+TEMPLATES, so the card list (also the HTMX fragment), the cards and the
+video embed render through Jinja2 and every other template falls through
+to the Django engine. The Django list and detail pages pull the card list
+in with {% include_snippet %} (courses.templatetags.catalog_templates).
+
+Compiled templates stay in the environment's cache, and their bytecode is
+written to bytecode_cache_dir (Jinja2's per-user temp dir when empty), so
+restarted workers load it instead of compiling again.
+"""
+import os
+
+import jinja2
+from markupsafe import Markup
+
+RESPONSIVE_IMAGE_TEMPLATE = "courses/snippets/responsive-image.html"
+
+
+def environment(bytecode_cache_dir=None, **options):
+    from courses.templatetags import course_images
+
+    # Django's backend picks DebugUndefined with DEBUG, which prints
+    # "{{ name }}" for missing variables; the Django templates print nothing
+    options["undefined"] = jinja2.Undefined
+    if bytecode_cache_dir:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+    options["bytecode_cache"] = jinja2.FileSystemBytecodeCache(bytecode_cache_dir or None)
+    env = jinja2.Environment(**options)
+
+    def responsive_image(image, **kwargs):
+        """{% responsive_image %}, same arguments."""
+        context = course_images.responsive_image(image, **kwargs)
+        return Markup(env.get_template(RESPONSIVE_IMAGE_TEMPLATE).render(context))
+
+    env.globals.update({
+        "responsive_image": responsive_image,
+    })
+    return env
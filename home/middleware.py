@@ -0,0 +1,141 @@
+import gzip
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional, falls back to gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, falls back to gzip
+    zstandard = None
+
+COMPRESSION_MIN_LENGTH = 200
+COMPRESSIBLE_CONTENT_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/rss+xml",
+    "application/atom+xml",
+    "image/svg+xml",
+)
+
+
+def gzip_compress(data):
+    return gzip.compress(data, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def gzip_compress_sequence(sequence):
+    compressor = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in sequence:
+        data = compressor.compress(chunk)
+        # flush per chunk so streamed html reaches the browser right away
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def get_encoders():
+    """encoding -> compress function, in server preference order"""
+    encoders = {}
+    if brotli is not None:
+        encoders["br"] = lambda data: brotli.compress(
+            data, quality=settings.COMPRESSION_BROTLI_QUALITY
+        )
+    if zstandard is not None:
+        encoders["zstd"] = lambda data: zstandard.ZstdCompressor(
+            level=settings.COMPRESSION_ZSTD_LEVEL
+        ).compress(data)
+    encoders["gzip"] = gzip_compress
+    return encoders
+
+
+def parse_accept_encoding(header):
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate_encoding(header, encodings):
+    accepted = parse_accept_encoding(header or "")
+    wildcard = accepted.get("*", 0.0)
+    best = None
+    best_quality = 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best = encoding
+            best_quality = quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Negotiates br/zstd/gzip (whichever are installed) from Accept-Encoding
+    and compresses text responses once, so nginx can pass them through.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encoders = get_encoders()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.compress_response(request, response)
+
+    def should_compress(self, response):
+        if response.status_code != 200 or response.has_header("Content-Encoding"):
+            return False
+        content_type = response.get("Content-Type", "").split(";")[0].strip()
+        if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+            return False
+        if not response.streaming and len(response.content) < COMPRESSION_MIN_LENGTH:
+            return False
+        return True
+
+    def compress_response(self, request, response):
+        if not self.should_compress(response):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if response.streaming:
+            # only gzip can be flushed chunk by chunk with the stdlib
+            if negotiate_encoding(accept_encoding, ("gzip",)) is None:
+                return response
+            response.streaming_content = gzip_compress_sequence(response.streaming_content)
+            del response["Content-Length"]
+            encoding = "gzip"
+        else:
+            encoding = negotiate_encoding(accept_encoding, self.encoders)
+            if encoding is None:
+                return response
+            compressed = self.encoders[encoding](response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            # a compressed body is a different representation
+            response["ETag"] = f'W/{etag}'
+        response["Content-Encoding"] = encoding
+        return response
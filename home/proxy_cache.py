@@ -0,0 +1,141 @@
+"""
+Reverse-proxy cache headers and purging.
+
+Cacheable responses carry a Surrogate-Key header (space separated keys)
+and Cache-Control with s-maxage, so the proxy keeps them while browsers
+revalidate. When content changes, purge() hands the keys (and, for proxies
+that purge by url, the paths) to the purger named by PROXY_CACHE_PURGER,
+once the transaction commits:
+
+- NullPurger: no proxy cache, the default.
+- LocMemPurger: records purges in memory, for tests.
+- NginxCachePurger: a PURGE request per path (ngx_cache_purge).
+- SurrogateKeyPurger: one PURGE request with a Surrogate-Key header
+  (Varnish xkey and most CDNs).
+
+Purge failures are logged, never raised: at worst a page stays stale for
+s-maxage seconds.
+"""
+import functools
+import logging
+import urllib.request
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SURROGATE_KEY_HEADER = "Surrogate-Key"
+PURGE_TIMEOUT = 2
+
+
+def patch_proxy_cache(response, keys, s_maxage=None):
+    """Shared by every anonymous visitor: the proxy keeps it, browsers revalidate."""
+    if s_maxage is None:
+        s_maxage = settings.PROXY_CACHE_SECONDS
+    response[SURROGATE_KEY_HEADER] = " ".join(keys)
+    patch_cache_control(response, public=True, max_age=0, s_maxage=s_maxage)
+    # nginx goes by this one (and strips it), other proxies by s-maxage
+    response["X-Accel-Expires"] = str(s_maxage)
+    return response
+
+
+def patch_private(response, keys=()):
+    if keys:
+        response[SURROGATE_KEY_HEADER] = " ".join(keys)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class BasePurger:
+    # whether purge() needs the paths, they can cost a query to collect
+    needs_paths = False
+
+    def purge(self, keys, paths):
+        raise NotImplementedError
+
+
+class NullPurger(BasePurger):
+    def purge(self, keys, paths):
+        pass
+
+
+class LocMemPurger(BasePurger):
+    needs_paths = True
+    # (keys, paths) tuples, shared by every instance like locmem mail.outbox
+    purged = []
+
+    def purge(self, keys, paths):
+        LocMemPurger.purged.append((tuple(keys), tuple(paths)))
+
+
+class HTTPPurger(BasePurger):
+    def __init__(self, url=None, host=None):
+        self.url = (url or settings.PROXY_CACHE_PURGE_URL).rstrip("/")
+        # the proxy keys its cache on the public host, not the purge url's
+        self.host = host or urlsplit(settings.BASE_URL).netloc
+
+    def send(self, path, headers=None):
+        request = urllib.request.Request(
+            f"{self.url}{path}",
+            method="PURGE",
+            headers={"Host": self.host, **(headers or {})},
+        )
+        with urllib.request.urlopen(request, timeout=PURGE_TIMEOUT) as response:
+            return response.status
+
+
+class NginxCachePurger(HTTPPurger):
+    needs_paths = True
+
+    def purge(self, keys, paths):
+        for path in paths:
+            try:
+                self.send(path)
+            except OSError as error:
+                # 404 is "wasn't cached", anything else is worth a log line
+                if getattr(error, "code", None) != 404:
+                    logger.warning("proxy purge of %s failed: %s", path, error)
+
+
+class SurrogateKeyPurger(HTTPPurger):
+    def purge(self, keys, paths):
+        try:
+            self.send("/", headers={SURROGATE_KEY_HEADER: " ".join(keys)})
+        except OSError as error:
+            logger.warning("proxy purge of %s failed: %s", " ".join(keys), error)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_purger(path):
+    return import_string(path)()
+
+
+def get_purger():
+    return _load_purger(settings.PROXY_CACHE_PURGER)
+
+
+def is_enabled():
+    return not isinstance(get_purger(), NullPurger)
+
+
+def purge(keys, get_paths=None):
+    """
+    Purges keys once the current transaction commits. get_paths is only
+    called for purgers that purge by url, it runs before the commit so it
+    still sees rows that are being deleted.
+    """
+    purger = get_purger()
+    paths = tuple(get_paths()) if purger.needs_paths and get_paths else ()
+    keys = tuple(keys)
+
+    def run():
+        try:
+            purger.purge(keys, paths)
+        except Exception:
+            logger.exception("proxy purge of %s failed", " ".join(keys))
+
+    transaction.on_commit(run)
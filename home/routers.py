@@ -0,0 +1,126 @@
+"""
+Read replica routing.
+
+Reads for the catalog apps go round robin to the healthy ``replica_*``
+aliases; every write, and every read of other apps, stays on ``default``.
+Once a request writes catalog rows, ReplicaPinningMiddleware keeps that
+client's catalog reads on the primary for REPLICA_PIN_SECONDS so they see
+their own writes despite replication lag.
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+PIN_COOKIE_NAME = "db_primary_pin"
+REPLICA_HEALTH_CHECK_INTERVAL = 5
+REPLICA_DOWN_SECONDS = 30
+
+_pinned_to_primary = ContextVar("pinned_to_primary", default=False)
+# None outside ReplicaPinningMiddleware: writes are only tracked per request
+_wrote_to_primary = ContextVar("wrote_to_primary", default=None)
+
+
+def get_replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+class ReplicaRouter:
+    route_app_labels = {"courses"}
+
+    def __init__(self, replicas=None):
+        self.replicas = get_replica_aliases() if replicas is None else list(replicas)
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._checked_at = {}
+        self._down_until = {}
+
+    def check_replica(self, alias):
+        connections[alias].ensure_connection()
+        return connections[alias].is_usable()
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            if self._down_until.get(alias, 0) > now:
+                return False
+            if now - self._checked_at.get(alias, 0) < REPLICA_HEALTH_CHECK_INTERVAL:
+                return True
+            self._checked_at[alias] = now
+        try:
+            healthy = self.check_replica(alias)
+        except DatabaseError:
+            healthy = False
+        if not healthy:
+            self.mark_down(alias)
+        return healthy
+
+    def mark_down(self, alias):
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + REPLICA_DOWN_SECONDS
+
+    def get_replica(self):
+        if not self.replicas:
+            return None
+        start = next(self._counter)
+        for offset in range(len(self.replicas)):
+            alias = self.replicas[(start + offset) % len(self.replicas)]
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.route_app_labels:
+            return DEFAULT_DB_ALIAS
+        if _pinned_to_primary.get() or _wrote_to_primary.get():
+            return DEFAULT_DB_ALIAS
+        return self.get_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if (
+            model._meta.app_label in self.route_app_labels
+            and _wrote_to_primary.get() is not None
+        ):
+            _wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned_until = request.COOKIES.get(PIN_COOKIE_NAME)
+        try:
+            pinned = float(pinned_until) > time.time()
+        except (TypeError, ValueError):
+            pinned = False
+        pinned_token = _pinned_to_primary.set(pinned)
+        wrote_token = _wrote_to_primary.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote_to_primary.get():
+                pin_seconds = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    PIN_COOKIE_NAME,
+                    str(time.time() + pin_seconds),
+                    max_age=pin_seconds,
+                    httponly=True,
+                    samesite="Lax",
+                )
+            return response
+        finally:
+            _pinned_to_primary.reset(pinned_token)
+            _wrote_to_primary.reset(wrote_token)
@@ -64,8 +64,11 @@ INSTALLED_APPS = [
     """
 
 MIDDLEWARE = [
+    'home.health.HealthCheckMiddleware',  # /healthz, /readyz skip everything below
     'django.middleware.security.SecurityMiddleware',
+    'home.routers.ReplicaPinningMiddleware',  # read-your-writes after catalog writes
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files efficiently
+    'home.middleware.CompressionMiddleware',  # br/zstd/gzip for html and json
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -75,6 +78,14 @@ MIDDLEWARE = [
     'django_htmx.middleware.HtmxMiddleware',
 ]
 
+# response compression (brotli/zstandard are used when installed)
+COMPRESSION_GZIP_LEVEL = config("COMPRESSION_GZIP_LEVEL", default=5, cast=int)
+COMPRESSION_BROTLI_QUALITY = config("COMPRESSION_BROTLI_QUALITY", default=4, cast=int)
+COMPRESSION_ZSTD_LEVEL = config("COMPRESSION_ZSTD_LEVEL", default=3, cast=int)
+
+# seconds a /readyz result is reused before the checks run again
+READINESS_CACHE_SECONDS = config("READINESS_CACHE_SECONDS", default=5, cast=int)
+
 ROOT_URLCONF = 'home.urls'
 
 TEMPLATES = [
@@ -110,6 +121,37 @@ DATABASES = {
     }
 }
 
+# Read replicas: DB_REPLICA_HOSTS=replica1:5432,replica2 adds replica_1, replica_2, ...
+# with the primary's credentials. Catalog reads are spread across them.
+DB_REPLICA_HOSTS = [
+    host.strip()
+    for host in config('DB_REPLICA_HOSTS', default='').split(',')
+    if host.strip()
+]
+for index, replica_host in enumerate(DB_REPLICA_HOSTS, start=1):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['home.routers.ReplicaRouter']
+# seconds a client's catalog reads stay on the primary after it wrote
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+
+# Cache
+# The catalog snapshot version and signed urls live here. With several
+# gunicorn workers use a cache they all share (file based, redis, memcached)
+# so a catalog change reaches every worker.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='coursehub'),
+    }
+}
 
 
 # Password validation
@@ -170,4 +212,55 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # cloudinary video config
 CLOUDINARY_CLOUD_NAME = config("CLOUDINARY_CLOUD_NAME", default="")
 CLOUDINARY_PUBLIC_API_KEY = config("CLOUDINARY_PUBLIC_API_KEY", default="")
-CLOUDINARY_SECRET_API_KEY= config("CLOUDINARY_SECRET_API_KEY")
\ No newline at end of file
+CLOUDINARY_SECRET_API_KEY= config("CLOUDINARY_SECRET_API_KEY")
+# stream the course and lesson card lists instead of rendering them in one string
+COURSES_STREAM_LISTS = config("COURSES_STREAM_LISTS", default=False, cast=bool)
+
+# seconds a signed video url is cached; Cloudinary's sign_url signatures
+# don't expire, so this is only a cache lifetime
+CLOUDINARY_SIGNED_URL_TTL = config("CLOUDINARY_SIGNED_URL_TTL", default=3600, cast=int)
+
+# buffered lesson view/play counts are written to the database this often
+LESSON_COUNTER_FLUSH_SECONDS = config("LESSON_COUNTER_FLUSH_SECONDS", default=30, cast=int)
+
+# course announcement campaigns (python manage.py send_campaigns)
+CAMPAIGN_BATCH_SIZE = config("CAMPAIGN_BATCH_SIZE", default=500, cast=int)
+# messages per second over the one SMTP connection, 0 for no limit
+CAMPAIGN_SEND_RATE = config("CAMPAIGN_SEND_RATE", default=10, cast=float)
+# a run renews its claim after every batch, so this must outlast one batch at that rate
+CAMPAIGN_LEASE_SECONDS = config("CAMPAIGN_LEASE_SECONDS", default=300, cast=int)
+
+# sitemap.xml is an index of shards of at most this many urls (50,000 is the protocol limit)
+SITEMAP_SHARD_SIZE = config("SITEMAP_SHARD_SIZE", default=50000, cast=int)
+# browser/CDN cache lifetime for sitemaps and feeds, they revalidate with ETag after that
+SITEMAP_CACHE_SECONDS = config("SITEMAP_CACHE_SECONDS", default=3600, cast=int)
+
+# python manage.py export_static_catalog writes the anonymous course pages here for nginx
+STATIC_CATALOG_ROOT = config("STATIC_CATALOG_ROOT", default=str(BASE_DIR / "static_catalog"))
+# re-export the changed pages after every course/lesson save or delete, so
+# edits and unpublishes don't leave stale files for nginx to serve
+STATIC_CATALOG_EXPORT_ON_SAVE = config("STATIC_CATALOG_EXPORT_ON_SAVE", default=False, cast=bool)
+
+# reverse-proxy cache: s-maxage of the anonymous course/lesson pages and who
+# to tell when they change (home.proxy_cache.NginxCachePurger, SurrogateKeyPurger)
+PROXY_CACHE_SECONDS = config("PROXY_CACHE_SECONDS", default=60, cast=int)
+PROXY_CACHE_PURGER = config("PROXY_CACHE_PURGER", default="home.proxy_cache.NullPurger")
+PROXY_CACHE_PURGE_URL = config("PROXY_CACHE_PURGE_URL", default="http://nginx:8080")
+
+# render the card list, cards and video embed with Jinja2 (templates/jinja2,
+# needs jinja2 installed), the pages around them stay on Django
+COURSES_JINJA2_TEMPLATES = config("COURSES_JINJA2_TEMPLATES", default=False, cast=bool)
+# compiled Jinja2 templates are kept here across worker restarts, empty for a per-user temp dir
+JINJA2_BYTECODE_CACHE_DIR = config("JINJA2_BYTECODE_CACHE_DIR", default="")
+CATALOG_JINJA2_ENGINE = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [TEMPLATE_DIR / "jinja2"],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'home.jinja2.environment',
+        'bytecode_cache_dir': JINJA2_BYTECODE_CACHE_DIR,
+    },
+}
+if COURSES_JINJA2_TEMPLATES:
+    # first, so templates it has win and the rest fall through to Django
+    TEMPLATES = [CATALOG_JINJA2_ENGINE, *TEMPLATES]
\ No newline at end of file
@@ -0,0 +1,31 @@
+"""
+Test helpers shared by the apps' admin tests.
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class AdminChangelistTestMixin:
+    """
+    Logs a superuser in and checks that a changelist stays within a query
+    budget with at most one COUNT (the admins use EstimatedCountPaginator
+    and show_full_result_count=False, so no second unfiltered COUNT).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        super().setUp()
+        self.client.login(username="admin", password="password")
+
+    def assertChangelistQueries(self, path, max_queries):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), max_queries, [q["sql"] for q in queries])
+        counts = [q for q in queries if "COUNT(*)" in q["sql"].upper()]
+        self.assertLessEqual(len(counts), 1)
+        return response
@@ -0,0 +1,205 @@
+import gzip
+from unittest import mock
+
+from django.db import OperationalError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from courses.models import Course
+from emails.models import Email
+from home.health import READINESS_CHECKS, reset_readiness
+from home.middleware import (
+    CompressionMiddleware,
+    negotiate_encoding,
+)
+from home.pagination import EstimatedCountPaginator, estimate_count
+from home.proxy_cache import NginxCachePurger, SurrogateKeyPurger
+from home.routers import PIN_COOKIE_NAME, ReplicaPinningMiddleware, ReplicaRouter
+
+BODY = ("<p>" + "course card " * 200 + "</p>").encode()
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def get_response(self, response, accept_encoding="gzip"):
+        middleware = CompressionMiddleware(lambda request: response)
+        request = self.factory.get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        return middleware(request)
+
+    def test_negotiation_respects_quality(self):
+        self.assertEqual(negotiate_encoding("gzip;q=0.5, br", ("br", "gzip")), "br")
+        self.assertEqual(negotiate_encoding("br;q=0, gzip", ("br", "gzip")), "gzip")
+        self.assertEqual(negotiate_encoding("*", ("br", "gzip")), "br")
+        self.assertIsNone(negotiate_encoding("identity", ("br", "gzip")))
+
+    def test_gzip_response(self):
+        response = self.get_response(HttpResponse(BODY))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+
+    def test_identity_keeps_vary(self):
+        response = self.get_response(HttpResponse(BODY), accept_encoding="")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_skips_small_and_binary(self):
+        response = self.get_response(HttpResponse(b"tiny"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        response = self.get_response(HttpResponse(BODY, content_type="image/png"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming_response(self):
+        response = self.get_response(StreamingHttpResponse(iter([BODY, BODY])))
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), BODY + BODY)
+
+
+class HealthCheckTest(TestCase):
+    def setUp(self):
+        reset_readiness()
+
+    def test_healthz_skips_middleware_stack(self):
+        with self.assertNumQueries(0):
+            response = self.client.get("/healthz", HTTP_HOST="not-an-allowed-host")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("sessionid", response.cookies)
+        self.assertNotIn("Vary", response)
+
+    def test_readyz(self):
+        response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["checks"],
+            {"database": True, "migrations": True, "cache": True}
+        )
+
+    def test_readyz_result_is_cached(self):
+        self.client.get("/readyz")
+        with self.assertNumQueries(0):
+            self.client.get("/readyz/")
+
+    def test_readyz_reports_failure(self):
+        with mock.patch.dict(READINESS_CHECKS, {"cache": lambda: False}):
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["checks"]["cache"])
+
+    def test_readyz_logs_check_errors(self):
+        with mock.patch.dict(READINESS_CHECKS, {"cache": mock.Mock(side_effect=OSError("down"))}), \
+                self.assertLogs("home.health", "WARNING") as logs:
+            response = self.client.get("/readyz")
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("readiness check cache failed: down", logs.output[0])
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter(replicas=["replica_1", "replica_2"])
+        self.router.check_replica = mock.Mock(return_value=True)
+
+    def test_catalog_reads_round_robin(self):
+        reads = [self.router.db_for_read(Course) for _ in range(4)]
+        self.assertEqual(reads, ["replica_1", "replica_2", "replica_1", "replica_2"])
+
+    def test_other_apps_and_writes_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Email), "default")
+        self.assertEqual(self.router.db_for_write(Email), "default")
+        self.assertFalse(self.router.allow_migrate("replica_1", "courses"))
+
+    def test_unhealthy_replica_skipped(self):
+        self.router.check_replica = mock.Mock(side_effect=lambda alias: alias != "replica_1")
+        reads = {self.router.db_for_read(Course) for _ in range(4)}
+        self.assertEqual(reads, {"replica_2"})
+
+    def test_all_replicas_down_falls_back_to_primary(self):
+        self.router.check_replica = mock.Mock(side_effect=OperationalError)
+        self.assertEqual(self.router.db_for_read(Course), "default")
+
+    def test_write_pins_client_to_primary(self):
+        router = self.router
+        factory = RequestFactory()
+
+        def write_view(request):
+            router.db_for_write(Course)
+            return HttpResponse(router.db_for_read(Course))
+
+        response = ReplicaPinningMiddleware(write_view)(factory.post("/"))
+        self.assertEqual(response.content, b"default")
+        pin = response.cookies[PIN_COOKIE_NAME].value
+
+        read_view = lambda request: HttpResponse(router.db_for_read(Course))
+        request = factory.get("/")
+        request.COOKIES[PIN_COOKIE_NAME] = pin
+        self.assertEqual(ReplicaPinningMiddleware(read_view)(request).content, b"default")
+        self.assertTrue(
+            ReplicaPinningMiddleware(read_view)(factory.get("/")).content.startswith(b"replica")
+        )
+
+
+class EstimateCountTest(SimpleTestCase):
+    """The PostgreSQL branches, with the connection and EXPLAIN faked."""
+    def setUp(self):
+        self.cursor = mock.MagicMock()
+        postgresql = mock.MagicMock(vendor="postgresql")
+        postgresql.cursor.return_value.__enter__.return_value = self.cursor
+        patcher = mock.patch("home.pagination.connections", {"default": postgresql})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            "django.db.models.query.QuerySet.explain",
+            return_value='[{"Plan": {"Plan Rows": 1234}}]',
+        )
+        self.explain = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unfiltered_table_reads_reltuples(self):
+        self.cursor.fetchone.return_value = (2_500_000,)
+        self.assertEqual(estimate_count(Course.objects.all()), 2_500_000)
+        self.assertIn("pg_class", self.cursor.execute.call_args.args[0])
+        self.explain.assert_not_called()
+
+    def test_unanalyzed_table_uses_the_plan(self):
+        self.cursor.fetchone.return_value = (-1,)
+        self.assertEqual(estimate_count(Course.objects.all()), 1234)
+
+    def test_filtered_queryset_uses_the_plan(self):
+        self.assertEqual(estimate_count(Course.objects.filter(title__istartswith="Django")), 1234)
+        self.cursor.execute.assert_not_called()
+        self.explain.assert_called_once_with(format="json")
+
+    def test_paginator_keeps_big_estimates(self):
+        self.cursor.fetchone.return_value = (2_500_000,)
+        paginator = EstimatedCountPaginator(Course.objects.order_by("id"), 100)
+        self.assertEqual((paginator.count, paginator.num_pages), (2_500_000, 25_000))
+
+    def test_other_backends_are_counted(self):
+        with mock.patch("home.pagination.connections", {"default": mock.Mock(vendor="sqlite")}):
+            self.assertIsNone(estimate_count(Course.objects.all()))
+
+
+class ProxyCachePurgerTest(SimpleTestCase):
+    def test_nginx_purger_sends_purge_per_path_with_public_host(self):
+        purger = NginxCachePurger(url="http://nginx/", host="example.com")
+        with mock.patch("home.proxy_cache.urllib.request.urlopen") as urlopen:
+            purger.purge(("catalog",), ("/courses/", "/courses/abc/"))
+        requests = [call.args[0] for call in urlopen.call_args_list]
+        self.assertEqual([r.full_url for r in requests], ["http://nginx/courses/", "http://nginx/courses/abc/"])
+        self.assertEqual({r.get_method() for r in requests}, {"PURGE"})
+        self.assertEqual(requests[0].get_header("Host"), "example.com")
+
+    def test_surrogate_key_purger_sends_one_request(self):
+        purger = SurrogateKeyPurger(url="http://varnish", host="example.com")
+        with mock.patch("home.proxy_cache.urllib.request.urlopen") as urlopen:
+            purger.purge(("catalog", "course:abc"), ())
+        request = urlopen.call_args.args[0]
+        self.assertEqual(request.get_header("Surrogate-key"), "catalog course:abc")
+
+    def test_failures_are_logged_not_raised(self):
+        purger = NginxCachePurger(url="http://nginx", host="example.com")
+        with mock.patch("home.proxy_cache.urllib.request.urlopen", side_effect=OSError("refused")):
+            with self.assertLogs("home.proxy_cache", "WARNING"):
+                purger.purge(("catalog",), ("/courses/",))
@@ -3,6 +3,8 @@ from django.contrib import admin
 from django.urls import path,include
 from django.conf.urls.static import static
 from . import views
+from courses.views import course_feed_view, sitemap_index_view, sitemap_shard_view
+from courses.views import course_api_detail_view, course_api_list_view, lesson_api_list_view
 from emails.views import verify_email_token_view, email_token_login_view, logout_btn_hx_view, verify_otp_view, resend_otp_view
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,6 +17,12 @@ urlpatterns = [
     path("hx/logout/", logout_btn_hx_view,),
     path("login/", views.login_logout_template_view,),
     path("logout/", views.login_logout_template_view,),
+    path("sitemap.xml", sitemap_index_view),
+    path("sitemap-<int:number>.xml", sitemap_shard_view),
+    path("feeds/courses.<str:feed_type>", course_feed_view),
+    path("api/courses/", course_api_list_view),
+    path("api/courses/<slug:course_id>/", course_api_detail_view),
+    path("api/courses/<slug:course_id>/lessons/", lesson_api_list_view),
 ]
 
 if settings.DEBUG:
@@ -3,6 +3,10 @@ WSGI config for home project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+``create_application`` is the same app built through a factory, for
+``gunicorn --preload "home.wsgi:create_application()"``: the master imports
+and warms everything once and forked workers share it copy-on-write.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
@@ -13,4 +17,38 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'home.settings')
 
-application = get_wsgi_application()
+# templates rendered on nearly every request, compiled before forking
+PRELOAD_TEMPLATES = [
+    "base.html",
+    "courses/list.html",
+    "courses/detail.html",
+    "courses/lesson.html",
+    "courses/snippets/list-display.html",
+    "courses/snippets/card.html",
+]
+
+
+def warm_up():
+    from django.db import connections
+    from django.template import TemplateDoesNotExist
+    from django.template.loader import get_template
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    for template_name in PRELOAD_TEMPLATES:
+        try:
+            get_template(template_name)
+        except TemplateDoesNotExist:
+            pass
+    # never hand a connection opened in the master to forked workers
+    connections.close_all()
+
+
+def create_application(warm=True):
+    wsgi_application = get_wsgi_application()
+    if warm:
+        warm_up()
+    return wsgi_application
+
+
+application = create_application(warm=False)